@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import networkx as nx
+import numpy as np
+
+from src.graph import prepare_graph
+from src.parallel import RouteHashPool
+from src.route_optimizer import RouteOptimizer
+from src.select_landmarks import LandmarkPriority
+from src.snapping import NodeSnapper
+from src.synthetic import HIGHWAY_SPEEDS, graph_bounds, synthetic_buildings, synthetic_graph, synthetic_landmarks
+
+# Constants
+REPORT_FILE = Path("./data/benchmark_report.json")
+# Grid side, buildings, landmarks and routed pairs of every scale
+SCALES = {
+    "small": {"grid_size": 30, "buildings": 1000, "landmarks": 300, "routes": 50},
+    "medium": {"grid_size": 80, "buildings": 10000, "landmarks": 2000, "routes": 200},
+    "large": {"grid_size": 150, "buildings": 50000, "landmarks": 8000, "routes": 200},
+}
+DEFAULT_MAX_SLOWDOWN = 1.25
+# Differences below this many seconds are treated as noise
+DEFAULT_MIN_DELTA = 0.01
+
+
+def _time(fn, repeat: int):
+    """
+    Run fn repeat times and return its last result and the duration of every run.
+    """
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        durations.append(time.perf_counter() - started)
+    return result, durations
+
+
+def _route_all(optimizer, pairs):
+    """
+    Route every (origin, destination) pair one by one, with None for unreachable pairs.
+    """
+    paths = []
+    for orig, dest in pairs:
+        try:
+            paths.append(optimizer.get_shortest_path(orig, dest))
+        except nx.NetworkXNoPath:
+            paths.append(None)
+    return paths
+
+
+def run_scale(params: dict, repeat: int, seed: int = 0, processes=(1,)) -> dict:
+    """
+    Generate the synthetic city of one scale and time every pipeline stage on it.
+
+    Routing and hashing every building with a RouteHashPool is timed once per worker
+    count in processes, as route_hash_pool_<n>p, to measure how the pool scales; the
+    pool is started before the clock runs.
+
+    Returns:
+        dict: Per stage, the best and mean duration in seconds, the number of items
+        processed and the best time per item.
+    """
+    G = prepare_graph(synthetic_graph(params["grid_size"], seed=seed), hwy_speeds=HIGHWAY_SPEEDS)
+    bounds = graph_bounds(G)
+    buildings = synthetic_buildings(bounds, params["buildings"], seed=seed)
+    landmarks = synthetic_landmarks(bounds, params["landmarks"], seed=seed)
+
+    timings = {}
+
+    def record(stage, fn, items):
+        result, durations = _time(fn, repeat)
+        timings[stage] = {
+            "seconds": min(durations),
+            "mean_seconds": float(np.mean(durations)),
+            "items": items,
+            "ms_per_item": min(durations) * 1000 / max(items, 1),
+        }
+        print(f"  {stage:<22} {min(durations):8.3f}s  ({timings[stage]['ms_per_item']:.3f} ms/item)")
+        return result
+
+    # A fresh selector per run, so the per-cell cache does not carry over between runs
+    assigned = record(
+        "assign_landmarks",
+        lambda: LandmarkPriority().assign_priority_landmarks(buildings, landmarks),
+        len(buildings),
+    )
+    record(
+        "assign_landmarks_grid",
+        lambda: LandmarkPriority(backend="grid").assign_priority_landmarks(buildings, landmarks),
+        len(buildings),
+    )
+    building_nodes, _ = record(
+        "snap_buildings",
+        lambda: NodeSnapper(G).snap(buildings["latitude"], buildings["longitude"]),
+        len(buildings),
+    )
+
+    # Route from each building's landmark to the building, as the hash stage does
+    snapper = NodeSnapper(G)
+    routed = [i for i, landmark in enumerate(assigned) if landmark is not None][:params["routes"]]
+    landmark_nodes, _ = snapper.snap([assigned[i]["lat"] for i in routed], [assigned[i]["lon"] for i in routed])
+    pairs = list(zip(landmark_nodes.tolist(), building_nodes[routed].tolist()))
+
+    networkx_optimizer = RouteOptimizer(G, snapper=snapper)
+    csr_optimizer = RouteOptimizer(G, snapper=snapper, backend="csr")
+    # Build the engine's lookup structures up front; they are cached for the whole pipeline run
+    csr_optimizer.engine.radians()
+    csr_optimizer.engine.segment_arrays()
+
+    paths = record("route_networkx", lambda: _route_all(networkx_optimizer, pairs), len(pairs))
+    record("route_csr", lambda: _route_all(csr_optimizer, pairs), len(pairs))
+    record("route_batch", lambda: csr_optimizer.get_shortest_paths(pairs), len(pairs))
+
+    found = [(f"Landmark_{i}", path) for i, path in zip(routed, paths) if path is not None]
+    record("hash", lambda: [networkx_optimizer.generate_hash(name, path) for name, path in found], len(found))
+    record("hash_batch", lambda: csr_optimizer.generate_hashes(*zip(*found)) if found else [], len(found))
+
+    pooled = [i for i, landmark in enumerate(assigned) if landmark is not None]
+    landmark_nodes, _ = snapper.snap([assigned[i]["lat"] for i in pooled], [assigned[i]["lon"] for i in pooled])
+    pool_pairs = list(zip(landmark_nodes.tolist(), building_nodes[pooled].tolist()))
+    pool_names = [f"Landmark_{i}" for i in pooled]
+    for count in processes:
+        with RouteHashPool(csr_optimizer.engine, processes=count) as pool:
+            record(f"route_hash_pool_{count}p", lambda: pool.route_and_hash(pool_pairs, pool_names), len(pool_pairs))
+    if len(processes) > 1:
+        single = timings[f"route_hash_pool_{processes[0]}p"]["seconds"]
+        for count in processes[1:]:
+            speedup = single / timings[f"route_hash_pool_{count}p"]["seconds"]
+            print(f"  pool speedup {processes[0]}p -> {count}p: {speedup:.2f}x "
+                  f"({speedup * processes[0] / count:.0%} of linear)")
+    return timings
+
+
+def compare(report: dict, baseline: dict, max_slowdown: float, min_delta: float):
+    """
+    Compare a report with a baseline report.
+
+    Returns:
+        List[str]: A description of every stage that got slower than max_slowdown
+        times its baseline by more than min_delta seconds.
+    """
+    regressions = []
+    for scale, stages in report["scales"].items():
+        for stage, timing in stages.items():
+            reference = baseline.get("scales", {}).get(scale, {}).get(stage)
+            if reference is None:
+                continue
+            ratio = timing["seconds"] / reference["seconds"] if reference["seconds"] else float("inf")
+            if ratio > max_slowdown and timing["seconds"] - reference["seconds"] > min_delta:
+                regressions.append(
+                    f"{scale}/{stage}: {timing['seconds']:.3f}s vs {reference['seconds']:.3f}s baseline ({ratio:.2f}x)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on synthetic cities, without network access.")
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=["small", "medium"])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the fastest is reported.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1],
+                        help="Worker counts for the route hash pool stage, e.g. 1 2 4 to measure its scaling.")
+    parser.add_argument("--output", type=Path, default=REPORT_FILE, help="JSON report to write.")
+    parser.add_argument("--baseline", type=Path, help="Earlier report to check for regressions.")
+    parser.add_argument("--max-slowdown", type=float, default=DEFAULT_MAX_SLOWDOWN,
+                        help="Fail when a stage takes longer than this multiple of its baseline time.")
+    parser.add_argument("--min-delta", type=float, default=DEFAULT_MIN_DELTA,
+                        help="Ignore slowdowns smaller than this many seconds.")
+    args = parser.parse_args()
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "processes": args.processes,
+        "cpu_count": os.cpu_count(),
+        "params": {scale: SCALES[scale] for scale in args.scales},
+        "scales": {},
+    }
+    for scale in args.scales:
+        print(f"Scale '{scale}': {SCALES[scale]}")
+        report["scales"][scale] = run_scale(SCALES[scale], args.repeat, seed=args.seed, processes=args.processes)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to '{args.output}'.")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.max_slowdown, args.min_delta)
+        if regressions:
+            print("Regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"No stage slower than {args.max_slowdown}x its baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import random
+import time
+from pathlib import Path
+
+import networkx as nx
+import numpy as np
+
+from src.graph import prepare_graph
+from src.routing_engine import CSRGraph
+from src.synthetic import HIGHWAY_SPEEDS, synthetic_graph
+
+
+def _timed(search, source, target):
+    """
+    Run one search, returning the path (None if there is none) and its duration.
+    """
+    started = time.perf_counter()
+    try:
+        path = search(source, target)
+    except nx.NetworkXNoPath:
+        path = None
+    return path, time.perf_counter() - started
+
+
+def _summary(name: str, values: np.ndarray) -> str:
+    """
+    Format the mean and percentiles of a list of durations in milliseconds.
+    """
+    if not len(values):
+        return f"    {name:<4} no queries"
+    return (f"    {name:<4} mean={values.mean():.2f}ms p50={np.percentile(values, 50):.2f}ms "
+            f"p99={np.percentile(values, 99):.2f}ms")
+
+
+def run_benchmark(graph: CSRGraph, queries: int, anchors: int, seed: int = 0):
+    """
+    Compare ALT against the great-circle A* on the same random queries and check
+    ALT's travel times against Dijkstra.
+
+    Reachable and unreachable pairs are reported apart: most unreachable pairs are
+    settled by the component labels before either search runs, which would
+    otherwise blur the comparison of the searches themselves.
+    """
+    started = time.perf_counter()
+    graph.build_alt(anchors, seed=seed)
+    print(f"Graph: {graph.num_nodes} nodes, {graph.num_edges} edges. "
+          f"Built {anchors} ALT anchors in {time.perf_counter() - started:.2f}s "
+          f"({(graph.alt_from.nbytes + graph.alt_to.nbytes) / 2**20:.1f} MiB).")
+
+    rng = random.Random(seed)
+    pairs = [(rng.randrange(graph.num_nodes), rng.randrange(graph.num_nodes)) for _ in range(queries)]
+
+    times = {True: ([], []), False: ([], [])}
+    mismatches = astar_longer = 0
+    for source, target in pairs:
+        astar, astar_time = _timed(graph.astar_path, source, target)
+        alt, alt_time = _timed(graph.alt_path, source, target)
+
+        distances, _ = graph.shortest_path_tree(source)
+        reachable = not np.isinf(distances[target])
+        times[reachable][0].append(astar_time)
+        times[reachable][1].append(alt_time)
+        if not reachable:
+            mismatches += alt is not None
+            continue
+        if alt is None or not np.isclose(graph.path_travel_time(alt), distances[target], rtol=0, atol=1e-6):
+            mismatches += 1
+        if graph.path_travel_time(astar) > distances[target] + 1e-6:
+            astar_longer += 1
+
+    for reachable, label in ((True, "reachable"), (False, "unreachable")):
+        astar_times, alt_times = (np.array(values) * 1000 for values in times[reachable])
+        print(f"  {len(astar_times)} {label} pairs")
+        print(_summary("A*", astar_times))
+        print(_summary("ALT", alt_times))
+        if len(astar_times) and alt_times.sum() > 0 and astar_times.sum() > 0:
+            ratio = alt_times.sum() / astar_times.sum()
+            print(f"    ALT is {ratio:.2f}x slower than A*" if ratio > 1 else f"    ALT is {1 / ratio:.2f}x faster than A*")
+
+    reachable = len(times[True][0])
+    print(f"  ALT paths not matching the Dijkstra travel time: {mismatches}")
+    print(f"  A* paths longer than the shortest travel time: {astar_longer} of {reachable} reachable pairs")
+    print("  ALT does not speed routing up: its gain is exactness. Its paths are shortest travel-time paths, "
+          "while the great-circle A* is not admissible and trades optimality for speed.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ALT routing against the great-circle A*.")
+    parser.add_argument("--graph", type=Path, help="Cached graph (.npz) from src.graph_cache; a synthetic grid is used if omitted.")
+    parser.add_argument("--size", type=int, default=150, help="Side length of the synthetic grid.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--anchors", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.graph:
+        graph = CSRGraph.load(args.graph)
+    else:
+        graph = CSRGraph.from_networkx(prepare_graph(synthetic_graph(args.size, seed=args.seed), hwy_speeds=HIGHWAY_SPEEDS))
+    run_benchmark(graph, args.queries, args.anchors, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
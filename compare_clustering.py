@@ -0,0 +1,47 @@
+import argparse
+from pathlib import Path
+
+from src.select_landmarks import compare_clustering_backends
+from src.synthetic import synthetic_buildings, synthetic_landmarks
+from src.utils import load_buildings, load_landmarks
+
+# Constants
+SYNTHETIC_BOUNDS = (27.66, 85.28, 27.80, 85.43)  # (south, west, north, east)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the whole-set grid landmark clustering with the per-query DBSCAN clustering."
+    )
+    parser.add_argument("--landmarks", type=Path, help="Processed landmarks file; synthetic landmarks are used if omitted.")
+    parser.add_argument("--buildings", type=Path, help="Buildings file; synthetic buildings are used if omitted.")
+    parser.add_argument("--limit", type=int, help="Compare on the first buildings only.")
+    parser.add_argument("--synthetic-landmarks", type=int, default=3000)
+    parser.add_argument("--synthetic-buildings", type=int, default=10000)
+    parser.add_argument("--eps-meters", type=float, default=500.0)
+    parser.add_argument("--min-samples", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.landmarks:
+        landmarks = load_landmarks(args.landmarks)
+    else:
+        landmarks = synthetic_landmarks(SYNTHETIC_BOUNDS, args.synthetic_landmarks, seed=args.seed)
+    if args.buildings:
+        buildings = load_buildings(args.buildings, columns=["latitude", "longitude"])
+    else:
+        buildings = synthetic_buildings(SYNTHETIC_BOUNDS, args.synthetic_buildings, seed=args.seed)
+    if args.limit is not None:
+        buildings = buildings.head(args.limit)
+
+    report = compare_clustering_backends(buildings, landmarks, eps_meters=args.eps_meters, min_samples=args.min_samples)
+    print(f"{report['buildings']} buildings in {report['cells']} cells, {len(landmarks)} landmarks "
+          f"({report['clusters']} grid clusters, {report['noise']} noise)")
+    print(f"  Same landmark: {report['same_landmark']:.1%} of buildings, {report['same_landmark_cells']:.1%} of cells")
+    print(f"  Mean adjusted Rand index of the candidate clusterings: {report['mean_adjusted_rand']:.3f}")
+    print(f"  Assignment time: dbscan {report['dbscan_seconds']:.3f}s, grid {report['grid_seconds']:.3f}s "
+          f"({report['dbscan_seconds'] / max(report['grid_seconds'], 1e-9):.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import h3
+import numpy as np
+import pandas as pd
+
+from src.hash_service import DEFAULT_CELL_RESOLUTION, HASHES_FILE, HashIndex, HashService
+
+
+def synthetic_buildings(count: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Generate a building hash dataset spread over Kathmandu, for running without pipeline output.
+    """
+    rng = np.random.default_rng(seed)
+    directions = np.array(["N", "E", "S", "W"])
+    return pd.DataFrame({
+        "osmid": np.arange(1, count + 1),
+        "latitude": 27.66 + rng.random(count) * 0.1,
+        "longitude": 85.28 + rng.random(count) * 0.1,
+        "name": [f"Building {i}" if i % 5 == 0 else None for i in range(count)],
+        "route_hashes": [
+            f"Landmark_{i % 500}|" + "|".join(f"{d}_{l:.2f}" for d, l in zip(rng.choice(directions, 6), rng.random(6) * 300))
+            for i in range(count)
+        ],
+    })
+
+
+async def _client(host, port, requests, latencies, errors):
+    """
+    Send requests over one keep-alive connection and record each round-trip time.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for endpoint, target in requests:
+            started = time.perf_counter()
+            writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("latin-1"))
+            await writer.drain()
+
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+
+            latencies[endpoint].append(time.perf_counter() - started)
+            if status != 200:
+                errors[endpoint] += 1
+    finally:
+        writer.close()
+
+
+def _make_requests(index: HashIndex, count: int, seed: int):
+    """
+    Build a random mix of building, nearest and cell lookups.
+    """
+    rnd = random.Random(seed)
+    requests = []
+    for _ in range(count):
+        position = rnd.randrange(len(index))
+        lat, lon = float(index.latitude[position]), float(index.longitude[position])
+        kind = rnd.random()
+        if kind < 0.4:
+            requests.append(("building", f"/buildings/{index.ids[position]}"))
+        elif kind < 0.8:
+            requests.append(("nearest", f"/nearest?lat={lat + rnd.uniform(-1e-3, 1e-3):.6f}&lon={lon + rnd.uniform(-1e-3, 1e-3):.6f}"))
+        else:
+            requests.append(("cell", f"/cells/{h3.geo_to_h3(lat, lon, index.cell_resolution)}"))
+    return requests
+
+
+async def run_load_test(index: HashIndex, requests: int, concurrency: int, host: str = None, port: int = None,
+                        seed: int = 0):
+    """
+    Run the load test against a running service, or against one started in this process.
+    """
+    service = None
+    if host is None:
+        service = HashService(index, port=0)
+        await service.start()
+        host, port = service.host, service.port
+
+    plan = _make_requests(index, requests, seed)
+    latencies, errors = defaultdict(list), defaultdict(int)
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _client(host, port, plan[worker::concurrency], latencies, errors) for worker in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+
+    print(f"{requests} requests over {concurrency} connections in {elapsed:.2f}s ({requests / elapsed:.0f} req/s)")
+    for endpoint, values in sorted(latencies.items()):
+        values = np.array(values) * 1000
+        print(f"  {endpoint:<9} n={len(values):<6} errors={errors[endpoint]:<4} "
+              f"p50={np.percentile(values, 50):.2f}ms p90={np.percentile(values, 90):.2f}ms "
+              f"p99={np.percentile(values, 99):.2f}ms max={values.max():.2f}ms")
+
+    if service is not None:
+        print("Server counters:", json.dumps(service.stats.snapshot(), indent=2))
+        await service.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the route hash lookup service locally.")
+    parser.add_argument("--data", type=Path, default=HASHES_FILE, help="Hash dataset; synthetic data is used if it is missing.")
+    parser.add_argument("--synthetic", type=int, default=200000, help="Number of synthetic buildings.")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--host", help="Host of a running service; a service is started in-process if omitted.")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    if args.data.exists():
+        index = HashIndex.load(args.data)
+    else:
+        print(f"{args.data} not found; using {args.synthetic} synthetic buildings.")
+        index = HashIndex(synthetic_buildings(args.synthetic), cell_resolution=DEFAULT_CELL_RESOLUTION)
+    print(f"Indexed {len(index)} buildings in {index.nbytes / 2**20:.1f} MiB of arrays.")
+
+    asyncio.run(run_load_test(index, args.requests, args.concurrency,
+                              host=args.host, port=args.port if args.host else None))
+
+
+if __name__ == "__main__":
+    main()
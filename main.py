@@ -1,93 +1,248 @@
 # Import the crawl_buildings_data function from the appropriate module
+from pathlib import Path
 from src.crawl.get_buildings import crawl_buildings_data
-from src.crawl.get_landmarks import crawl_landmarks_data
-from src.preprocess import crawl_and_process_landmarks_data
+from src.crawl.get_landmarks import crawl_landmarks_data, construct_bbox, AMENITIES, LANDMARKS_DIR
+from src.preprocess import crawl_and_process_landmarks_data, REQUIRED_COLUMNS, OUTPUT_FILE
 import pandas as pd
-from tqdm import tqdm
 from src.select_landmarks import LandmarkPriority
 from src.utils import load_landmarks, load_buildings, preprocess_landmark_tag, preprocess_landmarks
-import osmnx as ox
 from src.route_optimizer import RouteOptimizer
-
-from tqdm import tqdm
-
-def main():
-    # Call the function to crawl building data and save to CSV
-    crawl_buildings_data()
-    crawl_landmarks_data()
-    crawl_and_process_landmarks_data()
-    
-
-    # Load and preprocess data
-    landmarks_dict = load_landmarks('./data/cleaned_landmarks.csv')
-    ktm_buildings = load_buildings('./data/kathmandu_buildings.csv').head(10) # For testing purposes, please remove head(10) for full data
-
-    # Initialize LandmarkPriority object
-    landmark_priority = LandmarkPriority()
-
-    # Initialize list to store the priority landmarks
-    landmark_tag = []
-
-    # Use tqdm for progress visualization
-    for lat, lon in tqdm(zip(ktm_buildings['latitude'], ktm_buildings['longitude']), total=len(ktm_buildings)):
-        priority_landmark = landmark_priority.get_priority_landmark_for_hex(lat, lon, landmarks_dict)
-        
-        if priority_landmark:
-            landmark_tag.append(priority_landmark)
-        else:
-            landmark_tag.append(None)
+from src.graph_cache import load_graph, graph_cache_path
+from src.checkpoint import StageCheckpoint
+from src.parallel import RouteHashPool
+from src.storage import read_table, write_table
+from src.hash_codec import save_route_hashes
+from src import instrumentation
+
+# Constants
+PLACE_NAME = 'Kathmandu, Nepal'
+NETWORK_TYPE = 'walk'
+BUILDINGS_FILE = Path('./data/kathmandu_buildings.parquet')
+POTENTIAL_LANDMARKS_FILE = Path('./data/potential_landmarks.parquet')
+BUILDINGS_WITH_LANDMARKS_FILE = Path('./data/ktm_buildings_with_landmarks.parquet')
+BUILDINGS_WITH_HASHES_FILE = Path('./data/ktm_buildings_with_hashes.parquet')
+BUILDINGS_WITH_HASHES_CSV = Path('./data/ktm_buildings_with_hashes.csv')
+BUILDINGS_WITH_HASHES_JSON = Path('./data/ktm_buildings_with_hashes.json')
+ROUTE_HASH_CODES_FILE = Path('./data/ktm_route_hashes.rhc')
+
+
+def assign_landmarks(ktm_buildings, landmarks_dict, landmark_priority):
+    """
+    Attach the priority landmark columns to a chunk of buildings.
+    """
+    ktm_buildings = ktm_buildings.reset_index(drop=True)
+    instrumentation.count("buildings", len(ktm_buildings))
+
+    # Select the priority landmark once per H3 cell and broadcast it to the buildings in that cell
+    landmark_tag = landmark_priority.assign_priority_landmarks(ktm_buildings, landmarks_dict)
 
     # Preprocess the landmark tag data into DataFrame
     landmark_tag_df = preprocess_landmark_tag(landmark_tag)
 
     # Concatenate the original buildings data with the landmark tag data
-    ktm_buildings = pd.concat([ktm_buildings, landmark_tag_df], axis=1)
-
-    # Save the final result
-    ktm_buildings.to_csv('./data/ktm_buildings_with_landmarks.csv', index=False, encoding='utf-8')
-    
-    
-    # Load the Kathmandu walkable graph
-    G = ox.graph_from_place('Kathmandu, Nepal', network_type='walk')
-
-    # Load and preprocess data
-    cleaned_ktm_buildings =  pd.read_csv('./data/ktm_buildings_with_landmarks.csv')
-    cleaned_ktm_buildings = preprocess_landmarks(cleaned_ktm_buildings)
-
-    # Initialize an empty list to store hashes
-    hashes = []
-
-    # Iterate over the rows of the ktm_buildings dataframe and generate the hash
-    for index, row in tqdm(cleaned_ktm_buildings.iterrows(), total=len(cleaned_ktm_buildings), desc="Generating Hashes"):
-        try:
-            # Extract landmark and destination locations
-            landmark_location = [row.landmark_lat, row.landmark_lon]
-            destination_location = (row.latitude, row.longitude)
-            
-            # Initialize the RouteOptimizer and generate the shortest path
-            optimizer = RouteOptimizer(G, landmark_location, destination_location)
-            path = optimizer.get_shortest_path()
-
-            # Generate the hash string for the route
-            hash_string = optimizer.generate_hash(row.landmark_tags_name, path)
-            hashes.append(hash_string)
-
-            # Print progress for debugging purposes
-            print(f"Index: {index} :: Building at ({row.latitude}, {row.longitude}) has hash: {hash_string}")
-        except Exception as e:
-            print(f"Error at index {index}: {e}")
-            hashes.append(None)  # In case of error, append None or handle accordingly
+    return pd.concat([ktm_buildings, landmark_tag_df], axis=1)
+
+
+def generate_route_hashes(cleaned_ktm_buildings, optimizer, pool):
+    """
+    Route a chunk of buildings from their landmarks and attach the route hashes.
+    """
+    cleaned_ktm_buildings = cleaned_ktm_buildings.copy()
+    instrumentation.count("buildings", len(cleaned_ktm_buildings))
+
+    # Snap all landmarks and buildings to graph nodes with one vectorized lookup each
+    with instrumentation.timer("snap"):
+        landmark_nodes, landmark_snap_distance = optimizer.find_nearest_nodes(
+            cleaned_ktm_buildings.landmark_lat, cleaned_ktm_buildings.landmark_lon
+        )
+        destination_nodes, destination_snap_distance = optimizer.find_nearest_nodes(
+            cleaned_ktm_buildings.latitude, cleaned_ktm_buildings.longitude
+        )
+    cleaned_ktm_buildings["landmark_snap_distance"] = landmark_snap_distance
+    cleaned_ktm_buildings["building_snap_distance"] = destination_snap_distance
+
+    far_snaps = optimizer.snapper.is_far(landmark_snap_distance) | optimizer.snapper.is_far(destination_snap_distance)
+    instrumentation.count("far_snaps", int(far_snaps.sum()))
+    if far_snaps.any():
+        print(f"Warning: {far_snaps.sum()} buildings have a landmark or location more than "
+              f"{optimizer.snapper.max_snap_distance:.0f}m from the nearest graph node.")
+
+    # Route and hash every building; failed rows get None and an error message
+    node_pairs = list(zip(landmark_nodes.tolist(), destination_nodes.tolist()))
+    hashes, errors = pool.route_and_hash(node_pairs, cleaned_ktm_buildings.landmark_tags_name.tolist())
+
+    for index, error in zip(cleaned_ktm_buildings.index, errors):
+        if error is not None:
+            print(f"Error at index {index}: {error}")
 
     # Add the generated hashes to the ktm_buildings DataFrame
     cleaned_ktm_buildings["route_hashes"] = hashes
+    return cleaned_ktm_buildings
+
+
+def run_stage(checkpoint, stage_fn):
+    """
+    Run a checkpointed stage and record its metrics under the stage name.
+    """
+    with instrumentation.stage(checkpoint.name):
+        if not checkpoint.run(stage_fn):
+            instrumentation.count("skipped")
+
+
+def main(batch_routing=False, offline=False, building_limit=10, chunk_size=10000, force=False, processes=1,
+         export_csv=True, binary_hashes=False, alt_anchors=0, metrics_file=None,
+         profile_stage=None, trace_memory=False, clustering="dbscan"):
+    """
+    Run the full pipeline: crawl, preprocess, assign landmarks and generate route hashes.
+
+    Every stage records a fingerprint of its inputs and parameters under
+    ./data/checkpoints and is skipped when a previous run already produced its
+    outputs with the same fingerprint. Landmark assignment and hash generation save
+    each chunk of chunk_size buildings, so an interrupted run resumes after the last
+    completed chunk. Pass force to rerun every stage; it also fetches the building
+    tiles again instead of reusing the tiles saved by an earlier run.
+
+    With batch_routing, buildings that share a landmark are routed from a single
+    Dijkstra search per landmark. Those are exact shortest travel-time paths, so they
+    can differ from the default per-building A* routes, whose great-circle heuristic
+    (in metres) is not a lower bound on travel time (in seconds).
+
+    With alt_anchors, ALT lower bounds from that many anchor nodes are precomputed and
+    saved with the cached graph, and per-building routes become exact shortest
+    travel-time paths found by A* over those bounds (see CSRGraph.alt_path). ALT is
+    only used when alt_anchors is set; anchors saved with the cached graph by an
+    earlier run are ignored otherwise, so the hashes always match the checkpoint.
+    ALT buys exactness, not speed: its searches run 2-3x slower than the default
+    great-circle A* (see benchmark_alt.py).
+
+    The street graph and the Overpass landmark responses are loaded from their local
+    caches when present; with offline, a missing cache entry is an error instead of a
+    download.
+
+    building_limit keeps only the first buildings for testing; set it to None for full data.
+    processes sets the size of the worker pool used for routing and hashing.
+
+    Intermediate datasets are stored as Parquet; export_csv also writes a CSV copy
+    of every stage output next to it. binary_hashes also writes the route hashes,
+    row for row, in the compact binary form of src.hash_codec.
+
+    clustering selects the LandmarkPriority backend: "dbscan" clusters the candidate
+    landmarks of every H3 cell, "grid" clusters the whole landmark set once (see
+    src.select_landmarks.grid_clusters); compare_clustering.py reports how far they agree.
+
+    Instrumentation is off unless metrics_file is given (e.g. instrumentation.METRICS_FILE):
+    every stage then appends a JSON line with its timings, counters (routes/sec,
+    failures by reason, cache hit rates) and peak memory to it. profile_stage names a
+    stage to run under cProfile, and trace_memory adds a tracemalloc snapshot of it.
+    """
+    if metrics_file is None and profile_stage is None:
+        instrumentation.disable()
+    else:
+        instrumentation.enable(metrics_file, profile_stages=[profile_stage] if profile_stage else [],
+                               trace_memory=trace_memory)
+
+    # Crawl building data, landmark data and clean the landmarks, unless already up to date
+    stages = [
+        (StageCheckpoint("crawl_buildings", params={"place": PLACE_NAME},
+                         outputs=[BUILDINGS_FILE, POTENTIAL_LANDMARKS_FILE]), lambda: crawl_buildings_data(refresh=force)),
+        (StageCheckpoint("crawl_landmarks", params={"amenities": AMENITIES, "bbox": construct_bbox()},
+                         outputs=[LANDMARKS_DIR]), lambda: crawl_landmarks_data(offline=offline)),
+        (StageCheckpoint("process_landmarks", params={"columns": REQUIRED_COLUMNS},
+                         inputs=[LANDMARKS_DIR], outputs=[OUTPUT_FILE]), crawl_and_process_landmarks_data),
+    ]
+    for checkpoint, stage_fn in stages:
+        if force:
+            checkpoint.invalidate()
+        run_stage(checkpoint, stage_fn)
+
+    # Initialize LandmarkPriority object
+    landmark_priority = LandmarkPriority(backend=clustering)
+
+    assign_params = {
+        "hex_resolution": landmark_priority.hex_resolution,
+        "eps": landmark_priority.eps,
+        "min_samples": landmark_priority.min_samples,
+        "priority_order": landmark_priority.priority_order,
+        "building_limit": building_limit,
+        "chunk_size": chunk_size,
+    }
+    # The default backend adds no parameters, so checkpoints saved before the grid backend stay valid
+    if landmark_priority.backend == "grid":
+        assign_params.update(backend=landmark_priority.backend, eps_meters=landmark_priority.eps_meters)
+    assign_checkpoint = StageCheckpoint(
+        "assign_landmarks",
+        params=assign_params,
+        inputs=[OUTPUT_FILE, BUILDINGS_FILE],
+        outputs=[BUILDINGS_WITH_LANDMARKS_FILE],
+    )
+    if force:
+        assign_checkpoint.invalidate()
+
+    def run_landmark_assignment():
+        # Load and preprocess data
+        landmarks_dict = load_landmarks(OUTPUT_FILE)
+        ktm_buildings = load_buildings(BUILDINGS_FILE)
+        if building_limit is not None:
+            ktm_buildings = ktm_buildings.head(building_limit)
+
+        ktm_buildings = assign_checkpoint.run_chunks(
+            ktm_buildings, chunk_size, lambda chunk: assign_landmarks(chunk, landmarks_dict, landmark_priority)
+        )
+
+        # Save the final result
+        write_table(ktm_buildings, BUILDINGS_WITH_LANDMARKS_FILE, export_csv=export_csv)
+
+    run_stage(assign_checkpoint, run_landmark_assignment)
+
+    # Load the prepared Kathmandu walkable graph from the local cache, downloading it on first use
+    with instrumentation.stage("load_graph"):
+        G = load_graph(PLACE_NAME, network_type=NETWORK_TYPE, offline=offline, alt_anchors=alt_anchors)
+
+    hash_checkpoint = StageCheckpoint(
+        "route_hashes",
+        params={"place": PLACE_NAME, "network_type": NETWORK_TYPE, "batch_routing": batch_routing,
+                "alt_anchors": alt_anchors, "chunk_size": chunk_size},
+        inputs=[BUILDINGS_WITH_LANDMARKS_FILE, graph_cache_path(PLACE_NAME, NETWORK_TYPE, hwy_speeds=None, fallback=None)],
+        outputs=[BUILDINGS_WITH_HASHES_FILE, BUILDINGS_WITH_HASHES_JSON]
+        + ([BUILDINGS_WITH_HASHES_CSV] if export_csv else [])
+        + ([ROUTE_HASH_CODES_FILE] if binary_hashes else []),
+    )
+    if force:
+        hash_checkpoint.invalidate()
+
+    def run_hash_generation():
+        optimizer = RouteOptimizer(G, use_alt=alt_anchors > 0)
+
+        # Load and preprocess data
+        cleaned_ktm_buildings = read_table(BUILDINGS_WITH_LANDMARKS_FILE)
+        if not cleaned_ktm_buildings.empty:
+            cleaned_ktm_buildings = preprocess_landmarks(cleaned_ktm_buildings)
+
+        if cleaned_ktm_buildings.empty:
+            # Nothing to route; an empty assignment has no landmark columns to read
+            print("No buildings with a landmark to route; saving empty route hash outputs.")
+            cleaned_ktm_buildings = cleaned_ktm_buildings.assign(route_hashes=pd.Series(dtype=object))
+        else:
+            # Workers share the read-only graph with this process instead of receiving copies
+            with RouteHashPool(G, processes=processes, batch_routing=batch_routing, use_alt=alt_anchors > 0) as pool:
+                cleaned_ktm_buildings = hash_checkpoint.run_chunks(
+                    cleaned_ktm_buildings, chunk_size, lambda chunk: generate_route_hashes(chunk, optimizer, pool)
+                )
+
+        # Save the DataFrame to Parquet format, with an optional CSV export
+        write_table(cleaned_ktm_buildings, BUILDINGS_WITH_HASHES_FILE, export_csv=export_csv)
+
+        # Save the DataFrame to JSON format
+        cleaned_ktm_buildings.to_json(BUILDINGS_WITH_HASHES_JSON, orient='records', lines=True)
 
-    # Save the DataFrame to CSV format
-    cleaned_ktm_buildings.to_csv('./data/ktm_buildings_with_hashes.csv', index=False)
+        # Save the route hashes in compact binary form
+        if binary_hashes:
+            save_route_hashes(ROUTE_HASH_CODES_FILE, cleaned_ktm_buildings["route_hashes"])
+            print(f"Binary route hashes saved to '{ROUTE_HASH_CODES_FILE.name}'.")
 
-    # Save the DataFrame to JSON format
-    cleaned_ktm_buildings.to_json('./data/ktm_buildings_with_hashes.json', orient='records', lines=True)
+        print(f"Data has been successfully saved to '{BUILDINGS_WITH_HASHES_FILE.name}' and '{BUILDINGS_WITH_HASHES_JSON.name}'.")
 
-    print("Data has been successfully saved to 'ktm_buildings_with_hashes.csv' and 'ktm_buildings_with_hashes.json'.")
+    run_stage(hash_checkpoint, run_hash_generation)
         
 
 # This ensures that the script is run only when executed directly, not when imported
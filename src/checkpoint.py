@@ -0,0 +1,214 @@
+import hashlib
+import json
+import logging
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from src.storage import read_table, write_table
+from src import instrumentation
+
+logger = logging.getLogger(__name__)
+
+# Constants
+CHECKPOINT_DIR = Path("./data/checkpoints")
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def fingerprint_path(path: Path) -> str:
+    """
+    Fingerprint a file or directory by content.
+
+    Args:
+        path (Path): File or directory to fingerprint. Directories are fingerprinted
+            from the names and contents of all files below them.
+
+    Returns:
+        str: Hex digest, or "missing" if the path does not exist.
+    """
+    path = Path(path)
+    if not path.exists():
+        return "missing"
+
+    digest = hashlib.sha1()
+    files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+    for file in files:
+        digest.update(str(file.relative_to(path) if path.is_dir() else file.name).encode("utf-8"))
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class StageCheckpoint:
+    """
+    Checkpoint for one pipeline stage.
+
+    A stage is identified by its name and version, the parameters it runs with and
+    the content of its input files. Together these form a fingerprint that is stored
+    in a manifest next to the stage's outputs once the stage completes; a later run
+    with the same fingerprint and all outputs present can skip the stage. Stages that
+    work through buildings in chunks can also save each finished chunk and resume
+    from the last one after a failure.
+    """
+    def __init__(self, name: str, params: Optional[Dict] = None, inputs: Iterable[Path] = (),
+                 outputs: Iterable[Path] = (), version: int = 1, checkpoint_dir: Path = CHECKPOINT_DIR):
+        self.name = name
+        self.params = params or {}
+        self.inputs = [Path(p) for p in inputs]
+        self.outputs = [Path(p) for p in outputs]
+        self.version = version
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self._fingerprint = None
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.checkpoint_dir / f"{self.name}.json"
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Fingerprint of the stage version, parameters and input contents, computed once.
+        """
+        if self._fingerprint is None:
+            key = {
+                "stage": self.name,
+                "version": self.version,
+                "params": self.params,
+                "inputs": {str(p): fingerprint_path(p) for p in self.inputs},
+            }
+            self._fingerprint = hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        return self._fingerprint
+
+    @property
+    def chunk_dir(self) -> Path:
+        return self.checkpoint_dir / f"{self.name}-{self.fingerprint[:12]}"
+
+    def is_complete(self) -> bool:
+        """
+        Check whether the stage already completed with the same fingerprint and its outputs still exist.
+        """
+        if not self.manifest_path.exists():
+            return False
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Ignoring unreadable manifest {self.manifest_path}: {e}")
+            return False
+        return manifest.get("fingerprint") == self.fingerprint and all(p.exists() for p in self.outputs)
+
+    def mark_complete(self) -> None:
+        """
+        Write the stage manifest and drop any saved chunks.
+        """
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        manifest = {
+            "stage": self.name,
+            "version": self.version,
+            "fingerprint": self.fingerprint,
+            "params": self.params,
+            "inputs": [str(p) for p in self.inputs],
+            "outputs": [str(p) for p in self.outputs],
+            "completed_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, default=str)
+        if self.chunk_dir.exists():
+            shutil.rmtree(self.chunk_dir)
+        logger.info(f"Stage '{self.name}' completed (fingerprint {self.fingerprint[:12]}).")
+
+    def run(self, stage_fn) -> bool:
+        """
+        Run a stage unless it already completed with the same fingerprint.
+
+        Args:
+            stage_fn (callable): Function that produces the stage outputs.
+
+        Returns:
+            bool: True if the stage ran, False if it was skipped.
+        """
+        if self.is_complete():
+            logger.info(f"Skipping stage '{self.name}': outputs are up to date.")
+            return False
+
+        stage_fn()
+
+        missing = [str(p) for p in self.outputs if not p.exists()]
+        if missing:
+            logger.warning(f"Stage '{self.name}' did not produce {missing}; it will run again next time.")
+        else:
+            self.mark_complete()
+        return True
+
+    def run_chunks(self, df: pd.DataFrame, chunk_size: int, process_chunk) -> pd.DataFrame:
+        """
+        Process a DataFrame in fixed-size chunks, saving each finished chunk.
+
+        Chunks saved by an earlier, interrupted run with the same fingerprint are
+        skipped, so the work resumes after the last completed chunk.
+
+        Args:
+            df (pd.DataFrame): Rows to process.
+            chunk_size (int): Number of rows per chunk. It should be part of the stage
+                parameters so saved chunks are never mixed across chunk sizes.
+            process_chunk (callable): Function taking and returning a DataFrame.
+
+        Returns:
+            pd.DataFrame: All processed chunks concatenated in order. If df is empty,
+            no chunk is processed and an empty frame with the columns of df is returned.
+        """
+        done = set(self.completed_chunks())
+        if done:
+            logger.info(f"Resuming stage '{self.name}' with {len(done)} completed chunk(s).")
+            instrumentation.count("chunks_resumed", len(done))
+
+        for chunk, start in enumerate(range(0, len(df), chunk_size)):
+            if chunk in done:
+                continue
+            self.save_chunk(chunk, process_chunk(df.iloc[start:start + chunk_size]))
+            instrumentation.count("chunks")
+
+        return self.load_chunks(columns=list(df.columns))
+
+    def invalidate(self) -> None:
+        """
+        Forget that the stage completed and drop its saved chunks.
+        """
+        if self.manifest_path.exists():
+            self.manifest_path.unlink()
+        if self.chunk_dir.exists():
+            shutil.rmtree(self.chunk_dir)
+
+    def chunk_path(self, chunk: int) -> Path:
+        return self.chunk_dir / f"chunk-{chunk:06d}.parquet"
+
+    def completed_chunks(self) -> List[int]:
+        """
+        Return the chunks already saved for the current fingerprint.
+        """
+        if not self.chunk_dir.exists():
+            return []
+        return sorted(int(p.stem.split("-")[1]) for p in self.chunk_dir.glob("chunk-*.parquet"))
+
+    def save_chunk(self, chunk: int, df: pd.DataFrame) -> None:
+        """
+        Save one finished chunk. The file is written under a temporary name and then
+        renamed, so an interrupted write never looks like a completed chunk.
+        """
+        self.chunk_dir.mkdir(parents=True, exist_ok=True)
+        path = self.chunk_path(chunk)
+        tmp_path = path.with_name(f"tmp-{path.name}")
+        write_table(df, tmp_path)
+        tmp_path.replace(path)
+
+    def load_chunks(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Concatenate all saved chunks in order, or return an empty frame with the
+        given columns if there are none.
+        """
+        chunks = [read_table(self.chunk_path(chunk)) for chunk in self.completed_chunks()]
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns)
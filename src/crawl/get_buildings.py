@@ -1,15 +1,33 @@
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+import geopandas as gpd
+import numpy as np
 import osmnx as ox
-from shapely.geometry import MultiPolygon
 import pandas as pd
-from typing import Optional
+import shapely
+from typing import Callable, List, Optional, Tuple
+
+from src.storage import read_table, write_table
+from src import instrumentation
 
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 EPSG_CODE = "EPSG:4326"
+PROCESS_CHUNK_SIZE = 50000
+SELECTED_COLUMNS = ["amenity", "building", "name", "geometry", "latitude", "longitude"]
+OSM_ID_COLUMNS = ["element_type", "osmid"]
+# Columns of the processed building data; the OSM ids identify buildings in every later dataset
+BUILDING_COLUMNS = OSM_ID_COLUMNS + SELECTED_COLUMNS
+BUILDING_TILES_DIR = Path(__file__).resolve().parent / "../../data/building_tiles"
+TILE_SIZE = 0.02  # degrees, about 2 km
+TILE_WORKERS = 4
+TILE_MAX_RETRIES = 3
+TILE_BACKOFF_FACTOR = 5.0  # seconds, doubled on every retry
+TILE_TTL = 30 * 24 * 3600  # seconds a saved tile is reused before it is fetched again
 
 
 def fetch_building_data(place_name: str) -> Optional[pd.DataFrame]:
@@ -32,45 +50,81 @@ def fetch_building_data(place_name: str) -> Optional[pd.DataFrame]:
         return None
 
 
-def process_building_data(building_data: pd.DataFrame) -> pd.DataFrame:
+def _process_chunk(chunk: gpd.GeoDataFrame, projected_crs) -> Tuple[gpd.GeoDataFrame, int]:
     """
-    Process building data by converting geometries and calculating centroids.
-    
+    Process one chunk of buildings with vectorized Shapely operations.
+
     Args:
-        building_data (pd.DataFrame): The raw building data DataFrame.
-    
+        chunk (gpd.GeoDataFrame): Raw building data in a geographic CRS.
+        projected_crs: Projected CRS in which the centroids are computed.
+
     Returns:
-        pd.DataFrame: The processed DataFrame with centroid and latitude/longitude columns.
+        Tuple[gpd.GeoDataFrame, int]: The processed chunk, with the OSM ids of its
+        (element_type, osmid) index as columns, and its number of invalid geometries.
     """
-    try:
-        logger.info("Preprocessing building data...")
+    geometries = chunk.geometry.to_numpy()
 
-        # Convert geometries to MultiPolygon if needed
-        building_data["geometry"] = building_data["geometry"].apply(
-            lambda x: MultiPolygon([x]) if x.geom_type == "Polygon" else x
-        )
+    # Convert polygons to single-part multipolygons in one call
+    polygons = shapely.get_type_id(geometries) == shapely.GeometryType.POLYGON
+    if polygons.any():
+        geometries = geometries.copy()
+        geometries[polygons] = shapely.multipolygons(geometries[polygons], indices=np.arange(polygons.sum()))
 
-        # Calculate centroids
-        building_data["centroid"] = building_data["geometry"].centroid
+    # Validate while the geometry array is at hand
+    invalid = int((~shapely.is_valid(geometries) & ~shapely.is_missing(geometries)).sum())
 
-        # Extract latitude and longitude
-        building_data["latitude"] = building_data["centroid"].y
-        building_data["longitude"] = building_data["centroid"].x
+    # Calculate centroids in a projected CRS and bring them back to EPSG:4326
+    geometry = gpd.GeoSeries(geometries, index=chunk.index, crs=chunk.crs)
+    centroids = geometry.to_crs(projected_crs).centroid.to_crs(EPSG_CODE)
 
-        # Reproject data to EPSG:4326
-        building_data = building_data.to_crs(EPSG_CODE)
+    processed = chunk.reindex(columns=["amenity", "building", "name"])
+    processed = gpd.GeoDataFrame(processed, geometry=geometry.to_crs(EPSG_CODE))
+    processed["latitude"] = centroids.y
+    processed["longitude"] = centroids.x
+    for column in OSM_ID_COLUMNS:
+        processed[column] = chunk.index.get_level_values(column) if column in chunk.index.names else None
+    return processed[BUILDING_COLUMNS], invalid
 
-        # Select relevant columns
-        selected_cols = ["amenity", "building", "name", "geometry", "latitude", "longitude"]
-        building_data = building_data[selected_cols]
 
-        # Drop rows with missing values
-        # building_data.dropna(inplace=True)
-        building_data.dropna(subset=["latitude", "longitude"], inplace=True)
+def process_building_data(building_data: gpd.GeoDataFrame, chunk_size: int = PROCESS_CHUNK_SIZE) -> gpd.GeoDataFrame:
+    """
+    Process building data by converting geometries and calculating centroids.
 
-        # Remove duplicates
-        building_data.drop_duplicates(subset=["latitude", "longitude"], inplace=True)
+    Buildings are processed in chunks of at most chunk_size rows with Shapely 2
+    array operations. Centroids are computed in the local UTM zone, so they are
+    true planar centroids, and geometries are validated in the same pass.
+    
+    Args:
+        building_data (gpd.GeoDataFrame): The raw building data GeoDataFrame.
+        chunk_size (int): Maximum number of buildings processed at once.
+    
+    Returns:
+        gpd.GeoDataFrame: The processed GeoDataFrame with element_type/osmid and latitude/longitude columns.
+    """
+    try:
+        logger.info("Preprocessing building data...")
 
+        projected_crs = building_data.estimate_utm_crs()
+
+        chunks, invalid = [], 0
+        for start in range(0, len(building_data), chunk_size):
+            chunk, chunk_invalid = _process_chunk(building_data.iloc[start:start + chunk_size], projected_crs)
+            chunks.append(chunk)
+            invalid += chunk_invalid
+        building_data = pd.concat(chunks) if chunks else building_data.reindex(columns=BUILDING_COLUMNS)
+
+        # Drop rows with missing coordinates and duplicate locations
+        rows = len(building_data)
+        building_data = building_data.dropna(subset=["latitude", "longitude"])
+        missing = rows - len(building_data)
+        rows = len(building_data)
+        building_data = building_data.drop_duplicates(subset=["latitude", "longitude"])
+        duplicates = rows - len(building_data)
+
+        if invalid:
+            logger.warning(f"Found {invalid} invalid geometries.")
+        if missing or duplicates:
+            logger.info(f"Dropped {missing} buildings without coordinates and {duplicates} duplicate locations.")
         logger.info("Preprocessing completed.")
         return building_data
     except Exception as e:
@@ -80,7 +134,7 @@ def process_building_data(building_data: pd.DataFrame) -> pd.DataFrame:
 
 def validate_data(building_data):
     """
-    Validate the integrity and quality of the processed data.
+    Validate the integrity and quality of the processed data in one pass over each column.
 
     Args:
         building_data (GeoDataFrame): Processed building data.
@@ -91,8 +145,8 @@ def validate_data(building_data):
     try:
         logger.info("Validating data...")
 
-        # Check for missing values
-        if building_data.isnull().sum().any():
+        # Check for missing values in every column
+        if building_data.isnull().to_numpy().any():
             logger.warning("Data contains missing values.")
 
         # Check for duplicate entries
@@ -100,9 +154,10 @@ def validate_data(building_data):
             logger.warning("Data contains duplicate entries.")
 
         # Ensure geometries are valid
-        invalid_geometries = building_data[~building_data["geometry"].is_valid]
-        if not invalid_geometries.empty:
-            logger.warning(f"Found {len(invalid_geometries)} invalid geometries.")
+        geometries = building_data.geometry.to_numpy()
+        invalid = int((~shapely.is_valid(geometries) & ~shapely.is_missing(geometries)).sum())
+        if invalid:
+            logger.warning(f"Found {invalid} invalid geometries.")
 
         logger.info("Validation completed.")
         return True
@@ -111,53 +166,230 @@ def validate_data(building_data):
         return False
 
 
-def save_building_data(building_data: pd.DataFrame, output_dir: Path) -> None:
+def save_building_data(building_data: pd.DataFrame, output_dir: Path, export_csv: bool = True) -> None:
     """
-    Save the processed building data to CSV files.
+    Save the processed building data to a GeoParquet file.
     
     Args:
         building_data (pd.DataFrame): The processed building data.
-        output_dir (Path): The directory where the CSV files will be saved.
+        output_dir (Path): The directory where the files will be saved.
+        export_csv (bool): Also export the data as CSV with WKT geometry.
     """
     # Ensure the output directory exists
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    # Save the data to CSV
-    building_data.to_csv(output_dir / "kathmandu_buildings.csv", index=False)
-    logger.info(f"Data saved to {output_dir / 'kathmandu_buildings.csv'}")
+    write_table(building_data, output_dir / "kathmandu_buildings.parquet", export_csv=export_csv)
 
 
-def save_landmarks(building_data: pd.DataFrame, output_dir: Path) -> None:
+def save_landmarks(building_data: pd.DataFrame, output_dir: Path, export_csv: bool = True) -> None:
     """
-    Save the data for potential landmarks (buildings with names) to a CSV file.
+    Save the data for potential landmarks (buildings with names) to a GeoParquet file.
     
     Args:
         building_data (pd.DataFrame): The processed building data.
-        output_dir (Path): The directory where the CSV file will be saved.
+        output_dir (Path): The directory where the files will be saved.
+        export_csv (bool): Also export the data as CSV with WKT geometry.
     """
     landmarks_data = building_data[building_data['name'].notnull()]
-    landmarks_data.to_csv(output_dir / "potential_landmarks.csv", index=False)
-    logger.info(f"Landmarks data saved to {output_dir / 'potential_landmarks.csv'}")
+    write_table(landmarks_data, output_dir / "potential_landmarks.parquet", export_csv=export_csv)
+
+
+def fetch_buildings_in_polygon(polygon) -> gpd.GeoDataFrame:
+    """
+    Fetch the buildings inside a polygon from OpenStreetMap.
+
+    Returns:
+        gpd.GeoDataFrame: Buildings indexed by (element_type, osmid); empty if the polygon has none.
+    """
+    try:
+        return ox.features_from_polygon(polygon, tags={'building': True})
+    except ValueError as e:
+        # osmnx reports an empty result with InsufficientResponseError, a ValueError
+        # subclass that it does not export publicly, so it is matched by name
+        if type(e).__name__ != "InsufficientResponseError":
+            raise
+        return gpd.GeoDataFrame(geometry=[], crs=EPSG_CODE)
 
 
-def crawl_buildings_data() -> None:
+def make_tiles(boundary, tile_size: float = TILE_SIZE) -> List[Tuple[str, object]]:
+    """
+    Split an area into a grid of square tiles clipped to its boundary.
+
+    Args:
+        boundary: Polygon or MultiPolygon of the area, in EPSG:4326.
+        tile_size (float): Tile edge length in degrees.
+
+    Returns:
+        List[Tuple[str, object]]: (tile key, clipped tile polygon) for every tile that overlaps the area.
+    """
+    min_x, min_y, max_x, max_y = boundary.bounds
+    tiles = []
+    for i, x in enumerate(np.arange(min_x, max_x, tile_size)):
+        for j, y in enumerate(np.arange(min_y, max_y, tile_size)):
+            tile = shapely.box(x, y, min(x + tile_size, max_x), min(y + tile_size, max_y)).intersection(boundary)
+            # Keep only the areal part of the clipped tile
+            parts = [part for part in shapely.get_parts(tile) if part.geom_type in ("Polygon", "MultiPolygon")]
+            if parts:
+                tiles.append((f"{i:03d}_{j:03d}", shapely.union_all(parts)))
+    return tiles
+
+
+def _fetch_tile(key: str, polygon, tile_dir: Path, fetch_tile: Callable, max_retries: int,
+                backoff_factor: float) -> Optional[Path]:
+    """
+    Fetch, process and save one tile, retrying failed fetches with exponential backoff.
+
+    Returns:
+        Optional[Path]: The saved tile, or None if the tile has no buildings.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            raw = fetch_tile(polygon)
+            break
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff_factor * (2 ** attempt)
+            logger.warning(f"Fetching tile {key} failed ({e}); retrying in {delay:.1f}s "
+                           f"(attempt {attempt + 1} of {max_retries}).")
+            time.sleep(delay)
+
+    if raw.empty:
+        (tile_dir / f"tile-{key}.parquet").unlink(missing_ok=True)
+        (tile_dir / f"tile-{key}.empty").touch()
+        return None
+
+    processed = process_building_data(raw)
+    if processed is None:
+        raise ValueError(f"Processing tile {key} failed.")
+
+    # The OSM ids are kept, so buildings on tile borders can be deduplicated
+    path = tile_dir / f"tile-{key}.parquet"
+    tmp_path = path.with_name(f"tmp-{path.name}")
+    write_table(processed, tmp_path)
+    tmp_path.replace(path)
+    (tile_dir / f"tile-{key}.empty").unlink(missing_ok=True)
+    return path
+
+
+def _tile_is_fresh(tile_dir: Path, key: str, max_age: Optional[float]) -> bool:
+    """
+    Return whether a tile was saved, with or without buildings, less than max_age seconds ago.
+    """
+    for path in (tile_dir / f"tile-{key}.parquet", tile_dir / f"tile-{key}.empty"):
+        if path.exists():
+            return max_age is None or time.time() - path.stat().st_mtime <= max_age
+    return False
+
+
+def fetch_building_tiles(place_name: str, tile_dir: Path = BUILDING_TILES_DIR, tile_size: float = TILE_SIZE,
+                         workers: int = TILE_WORKERS, max_retries: int = TILE_MAX_RETRIES,
+                         backoff_factor: float = TILE_BACKOFF_FACTOR, fetch_tile: Callable = fetch_buildings_in_polygon,
+                         boundary=None, max_age: Optional[float] = TILE_TTL, refresh: bool = False) -> List[Path]:
+    """
+    Fetch and process the buildings of a place tile by tile, writing each processed tile to disk.
+
+    Tiles are fetched concurrently and each one is retried on its own, so a failure
+    never loses the rest of the city. Tiles saved less than max_age seconds ago are
+    reused, so a rerun only fetches the tiles that are missing or stale.
+
+    Args:
+        place_name (str): The name of the place to fetch data for (e.g., "Kathmandu, Nepal").
+        tile_dir (Path): Directory holding the processed tiles of every place.
+        tile_size (float): Tile edge length in degrees.
+        workers (int): Number of tiles fetched at once.
+        max_retries (int): Retries per tile.
+        backoff_factor (float): Delay before the first retry, doubled on every retry.
+        fetch_tile (Callable): Function returning the raw buildings inside a polygon,
+            indexed by (element_type, osmid); replace it to fetch from a local data source.
+        boundary (optional): Area boundary in EPSG:4326; geocoded from place_name if omitted.
+        max_age (float, optional): Seconds a saved tile is reused; None reuses tiles forever.
+        refresh (bool): Fetch every tile again, ignoring the saved tiles.
+
+    Returns:
+        List[Path]: The saved tiles with buildings, in tile order.
+
+    Raises:
+        RuntimeError: If any tile still failed after all retries. Finished tiles stay on disk.
+    """
+    if boundary is None:
+        boundary = ox.geocode_to_gdf(place_name).to_crs(EPSG_CODE).unary_union
+
+    slug = "".join(ch if ch.isalnum() else "_" for ch in place_name.lower()).strip("_")
+    tile_dir = Path(tile_dir) / f"{slug}-{tile_size}"
+    tile_dir.mkdir(parents=True, exist_ok=True)
+
+    tiles = make_tiles(boundary, tile_size)
+    pending = [(key, polygon) for key, polygon in tiles if refresh or not _tile_is_fresh(tile_dir, key, max_age)]
+    logger.info(f"Fetching {len(pending)} of {len(tiles)} building tiles for {place_name}...")
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_fetch_tile, key, polygon, tile_dir, fetch_tile, max_retries, backoff_factor): key
+            for key, polygon in pending
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"Error fetching building tile {futures[future]}: {e}")
+                failed.append(futures[future])
+
+    instrumentation.count("tiles", len(tiles))
+    instrumentation.count("tiles_fetched", len(pending) - len(failed))
+    instrumentation.count("failed_tiles", len(failed))
+    if failed:
+        raise RuntimeError(f"{len(failed)} building tiles failed: {', '.join(sorted(failed))}")
+
+    return [tile_dir / f"tile-{key}.parquet" for key, _ in tiles if (tile_dir / f"tile-{key}.parquet").exists()]
+
+
+def merge_building_tiles(paths: List[Path]) -> gpd.GeoDataFrame:
+    """
+    Merge processed tiles, dropping buildings repeated on tile borders by OSM id
+    and then duplicate locations, as process_building_data does for a single fetch.
+    The OSM ids are kept, so the buildings can be looked up by id downstream.
+    """
+    tiles = [read_table(path, geometry="shapely") for path in paths]
+    if not tiles:
+        return gpd.GeoDataFrame(columns=BUILDING_COLUMNS, geometry="geometry", crs=EPSG_CODE)
+
+    building_data = pd.concat(tiles, ignore_index=True)
+    rows = len(building_data)
+    building_data = building_data.drop_duplicates(subset=OSM_ID_COLUMNS)
+    logger.info(f"Removed {rows - len(building_data)} buildings repeated on tile borders.")
+    building_data = building_data.drop_duplicates(subset=["latitude", "longitude"])
+    return building_data[BUILDING_COLUMNS].reset_index(drop=True)
+
+
+def crawl_buildings_data(tiled: bool = True, **tile_options) -> None:
     """
     Main function to crawl building data, process it, and save it to files.
+
+    Args:
+        tiled (bool): Fetch the city tile by tile instead of in one request.
+        **tile_options: Options passed to fetch_building_tiles, e.g. refresh to fetch
+            every tile again or max_age to bound how long saved tiles are reused.
     """
     place_name = "Kathmandu, Nepal"
     output_dir = Path(__file__).resolve().parent / "../../data"
 
-    # Step 1: Fetch the data
-    building_data = fetch_building_data(place_name)
-    if building_data is None:
-        logger.error("Failed to fetch building data. Exiting.")
-        return
-
-    # Step 2: Process the data
-    building_data = process_building_data(building_data)
-    
-    # Step 3: Validate the data
-    validate_data(building_data)
+    if tiled:
+        # Steps 1 and 2: Fetch and process the data tile by tile, then merge the tiles
+        building_data = merge_building_tiles(fetch_building_tiles(place_name, **tile_options))
+    else:
+        # Step 1: Fetch the data
+        building_data = fetch_building_data(place_name)
+        if building_data is None:
+            logger.error("Failed to fetch building data. Exiting.")
+            return
+
+        # Step 2: Process the data; geometries are validated in the same pass
+        building_data = process_building_data(building_data)
+        if building_data is None:
+            logger.error("Failed to process building data. Exiting.")
+            return
 
     # Step 3: Save the processed data
     save_building_data(building_data, output_dir)
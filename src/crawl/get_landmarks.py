@@ -1,8 +1,17 @@
 import requests
 import json
 import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+from requests.adapters import HTTPAdapter
+
+from src import instrumentation
+from src.crawl.response_cache import DEFAULT_TTL, RESPONSE_CACHE_DIR, ResponseCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -13,6 +22,12 @@ BASE_URL = "http://overpass-api.de/api/interpreter"
 BBOX_SOUTHWEST = (27.5748, 85.2066)
 BBOX_NORTHEAST = (27.8663, 85.5540)
 LANDMARKS_DIR = Path("./data/landmarks")
+DEFAULT_CONCURRENCY = 2
+DEFAULT_RATE_LIMIT = 1.0  # requests per second
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 1.0  # seconds, doubled on every retry
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+REQUEST_TIMEOUT = 120
 
 # Dictionary of categories and their associated amenities
 AMENITIES: Dict[str, List[str]] = {
@@ -64,33 +79,198 @@ def construct_bbox() -> str:
     return bbox
 
 
-def fetch_landmark_data(amenity: str, bbox: str) -> dict:
+class RateLimiter:
     """
-    Fetch landmark data for a given amenity and bounding box using the Overpass API.
-    
+    Thread-safe limiter that spaces requests evenly at a maximum rate.
+    """
+    def __init__(self, rate: Optional[float]):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self) -> None:
+        """
+        Block until the caller may send its next request.
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class OverpassClient:
+    """
+    Overpass API client with a pooled HTTP session, a shared rate limit and
+    exponential backoff on rate limiting (429), server errors (5xx) and dropped
+    connections. One client can be used from many threads.
+
+    With a ResponseCache, cached responses are returned without a request unless
+    refresh is set, and every downloaded response is cached. In offline mode a
+    query missing from the cache fails instead of being sent.
+    """
+    def __init__(self, base_url: str = BASE_URL, concurrency: int = DEFAULT_CONCURRENCY,
+                 rate_limit: Optional[float] = DEFAULT_RATE_LIMIT, max_retries: int = MAX_RETRIES,
+                 backoff_factor: float = BACKOFF_FACTOR, timeout: float = REQUEST_TIMEOUT,
+                 cache: Optional[ResponseCache] = None, refresh: bool = False, offline: bool = False):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.cache = cache
+        self.refresh = refresh
+        self.offline = offline
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self) -> None:
+        self.session.close()
+
+    def _retry_delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        """
+        Seconds to wait before the next attempt, honouring a numeric Retry-After header.
+        """
+        delay = self.backoff_factor * (2 ** attempt)
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        return delay
+
+    def fetch(self, query: str) -> dict:
+        """
+        Run an Overpass query, retrying transient failures.
+
+        Args:
+            query (str): Overpass QL query.
+
+        Returns:
+            dict: The decoded JSON response.
+
+        Raises:
+            requests.exceptions.RequestException: If the query still fails after all retries
+                or fails with a status code that is not worth retrying.
+            FileNotFoundError: In offline mode, if the query is not cached.
+        """
+        if self.cache is not None and not self.refresh:
+            cached = self.cache.get(self.base_url, query)
+            if cached is not None:
+                return cached
+        if self.offline:
+            raise FileNotFoundError(f"Query to {self.base_url} is not cached and offline mode is on.")
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            response = None
+            try:
+                response = self.session.get(self.base_url, params={"data": query}, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    data = response.json()
+                    if self.cache is not None:
+                        self.cache.put(self.base_url, query, data)
+                    return data
+                error = requests.exceptions.HTTPError(
+                    f"{response.status_code} response from {self.base_url}", response=response
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+
+            if attempt == self.max_retries:
+                raise error
+            delay = self._retry_delay(attempt, response)
+            logger.warning(f"Overpass request failed ({error}); retrying in {delay:.1f}s "
+                           f"(attempt {attempt + 1} of {self.max_retries}).")
+            time.sleep(delay)
+
+
+def build_query(amenities: List[str], bbox: str) -> str:
+    """
+    Build the Overpass query for one or more amenities in a bounding box.
+
     Args:
-        amenity (str): The amenity to query (e.g., "restaurant").
+        amenities (List[str]): Amenities to query. Several amenities are merged into
+            one union query matching any of them.
         bbox (str): The bounding box for the query.
-    
+
     Returns:
-        dict: JSON response from the API containing the queried data.
+        str: The Overpass QL query.
     """
-    query = f"""
+    if len(amenities) == 1:
+        selector = f'["amenity"="{amenities[0]}"]'
+    else:
+        selector = f'["amenity"~"^({"|".join(re.escape(amenity) for amenity in amenities)})$"]'
+
+    return f"""
     [out:json][timeout:60];
     (
-    node["amenity"="{amenity}"]({bbox});
-    way["amenity"="{amenity}"]({bbox});
-    relation["amenity"="{amenity}"]({bbox});
+    node{selector}({bbox});
+    way{selector}({bbox});
+    relation{selector}({bbox});
     );
     out body;
     >;
     out skel qt;
     """
 
+
+def split_union_response(data: dict, amenities: List[str]) -> Dict[str, dict]:
+    """
+    Split the response of a union query into one response per amenity.
+
+    Each amenity keeps its tagged elements and the untagged nodes its ways and
+    relations reference, as a single-amenity query would have returned.
+
+    Returns:
+        Dict[str, dict]: Response per amenity, omitting amenities without elements.
+    """
+    elements = data.get("elements", [])
+    skeleton = {element["id"]: element for element in elements if element.get("type") == "node" and "tags" not in element}
+
+    split = {}
+    for amenity in amenities:
+        tagged = [element for element in elements if element.get("tags", {}).get("amenity") == amenity]
+        if not tagged:
+            continue
+        referenced = set()
+        for element in tagged:
+            referenced.update(element.get("nodes", []))
+            referenced.update(member["ref"] for member in element.get("members", []) if member.get("type") == "node")
+        nodes = [skeleton[ref] for ref in sorted(referenced) if ref in skeleton]
+        split[amenity] = {**{key: value for key, value in data.items() if key != "elements"}, "elements": tagged + nodes}
+    return split
+
+
+def fetch_landmark_data(amenity: str, bbox: str, client: Optional[OverpassClient] = None) -> dict:
+    """
+    Fetch landmark data for a given amenity and bounding box using the Overpass API.
+    
+    Args:
+        amenity (str): The amenity to query (e.g., "restaurant").
+        bbox (str): The bounding box for the query.
+        client (OverpassClient, optional): Client to send the query with; if omitted, a
+            new one backed by the default response cache (RESPONSE_CACHE_DIR, DEFAULT_TTL) is used.
+    
+    Returns:
+        dict: JSON response from the API containing the queried data.
+    """
     try:
-        response = requests.get(BASE_URL, params={"data": query})
-        response.raise_for_status()
-        return response.json()
+        if client is not None:
+            return client.fetch(build_query([amenity], bbox))
+        with OverpassClient(cache=ResponseCache()) as client:
+            return client.fetch(build_query([amenity], bbox))
     except requests.exceptions.RequestException as e:
         logger.error(f"Error fetching data for amenity {amenity}: {e}")
         return {}
@@ -98,7 +278,7 @@ def fetch_landmark_data(amenity: str, bbox: str) -> dict:
 
 def save_landmark_data(category: str, amenity: str, data: dict) -> None:
     """
-    Save the landmark data to a JSON file.
+    Save the landmark data to a compact JSON file, leaving an identical existing file untouched.
     
     Args:
         category (str): The category of the amenity (e.g., "Food_and_Drink").
@@ -109,16 +289,46 @@ def save_landmark_data(category: str, amenity: str, data: dict) -> None:
     
     if data:
         try:
-            with open(file_path, "w") as outfile:
-                json.dump(data, outfile, indent=4)
+            content = json.dumps(data, separators=(",", ":"))
+            if file_path.exists() and file_path.read_text(encoding="utf-8") == content:
+                logger.info(f"Data for {category}: {amenity} is unchanged at {file_path}")
+                return
+            with open(file_path, "w", encoding="utf-8") as outfile:
+                outfile.write(content)
             logger.info(f"Saved data for {category}: {amenity} to {file_path}")
         except IOError as e:
             logger.error(f"Error saving data for {category}: {amenity}: {e}")
 
 
-def crawl_landmarks_data() -> None:
+def crawl_landmarks_data(base_url: str = BASE_URL, concurrency: int = DEFAULT_CONCURRENCY,
+                         rate_limit: Optional[float] = DEFAULT_RATE_LIMIT, union_queries: bool = False,
+                         max_retries: int = MAX_RETRIES, backoff_factor: float = BACKOFF_FACTOR,
+                         cache_dir: Optional[Path] = RESPONSE_CACHE_DIR, cache_ttl: Optional[float] = DEFAULT_TTL,
+                         refresh: bool = False, offline: bool = False) -> None:
     """
     Crawl landmarks data for all categories and amenities and save to JSON files.
+
+    Queries run concurrently on a pooled session, spaced by the rate limit and
+    retried with exponential backoff. With union_queries, all amenities of a
+    category are fetched in one query and split into per-amenity files.
+    Responses are cached on disk, so a repeat crawl only downloads queries whose
+    cache entries are missing or older than the TTL.
+
+    Args:
+        base_url (str): Overpass API endpoint, e.g. a local stand-in server for testing.
+        concurrency (int): Maximum number of queries in flight.
+        rate_limit (float, optional): Maximum requests per second; None disables the limit.
+        union_queries (bool): Send one query per category instead of one per amenity.
+        max_retries (int): Retries per query on 429, 5xx and connection errors.
+        backoff_factor (float): Delay before the first retry, doubled on every retry.
+        cache_dir (Path, optional): Directory of the response cache; None disables caching.
+        cache_ttl (float, optional): Seconds a cached response stays valid; None never expires.
+        refresh (bool): Download every query again and overwrite its cache entry.
+        offline (bool): Never download; queries missing from the cache fail.
+
+    Raises:
+        RuntimeError: If any query still failed after all retries. Data from the
+            successful queries is saved first.
     """
     logger.info("Starting landmark data crawl...")
 
@@ -128,14 +338,50 @@ def crawl_landmarks_data() -> None:
     # Step 2: Construct the bounding box for Kathmandu
     bbox = construct_bbox()
 
-    # Step 3: Iterate over all amenities and categories
-    for category, amenity_list in AMENITIES.items():
-        for amenity in amenity_list:
-            logger.info(f"Fetching data for {category}: {amenity}...")
-            data = fetch_landmark_data(amenity, bbox)
-            if data:
-                save_landmark_data(category, amenity, data)
-            else:
-                logger.warning(f"No data found for {category}: {amenity}")
+    # Step 3: Query every amenity, or every category as one union query
+    if union_queries:
+        jobs = [(category, amenity_list) for category, amenity_list in AMENITIES.items()]
+    else:
+        jobs = [(category, [amenity]) for category, amenity_list in AMENITIES.items() for amenity in amenity_list]
+
+    cache = ResponseCache(cache_dir, ttl=cache_ttl) if cache_dir is not None else None
+
+    failed = []
+    with OverpassClient(base_url, concurrency=concurrency, rate_limit=rate_limit,
+                        max_retries=max_retries, backoff_factor=backoff_factor,
+                        cache=cache, refresh=refresh, offline=offline) as client, \
+            ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(client.fetch, build_query(amenity_list, bbox)): (category, amenity_list)
+            for category, amenity_list in jobs
+        }
+        for future in as_completed(futures):
+            category, amenity_list = futures[future]
+            try:
+                data = future.result()
+            except (requests.exceptions.RequestException, FileNotFoundError) as e:
+                logger.error(f"Error fetching data for {category}: {', '.join(amenity_list)}: {e}")
+                failed.append((category, amenity_list))
+                continue
+
+            results = split_union_response(data, amenity_list) if union_queries else {amenity_list[0]: data}
+            for amenity in amenity_list:
+                if results.get(amenity):
+                    save_landmark_data(category, amenity, results[amenity])
+                else:
+                    logger.warning(f"No data found for {category}: {amenity}")
+
+    if cache is not None:
+        cache.log_stats()
+        instrumentation.count("response_cache_hits", cache.hits)
+        instrumentation.count("response_cache_misses", cache.misses)
+    instrumentation.count("queries", len(futures))
+    instrumentation.count("failed_queries", len(failed))
+
+    if failed:
+        raise RuntimeError(
+            f"{len(failed)} landmark queries failed: "
+            + "; ".join(f"{category}: {', '.join(amenity_list)}" for category, amenity_list in failed)
+        )
 
     logger.info("Landmark data crawl completed.")
@@ -0,0 +1,115 @@
+import argparse
+import json
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# Constants
+DEFAULT_HOST = "127.0.0.1"
+AMENITY_PATTERN = re.compile(r'"amenity"(?:="([^"]+)"|~"\^\(([^)]*)\)\$")')
+
+
+def stub_response(query: str) -> dict:
+    """
+    Build an Overpass-shaped response with one tagged node per amenity named in the query.
+    """
+    amenities = []
+    for single, union in AMENITY_PATTERN.findall(query):
+        amenities.extend([single] if single else [re.sub(r"\\(.)", r"\1", amenity) for amenity in union.split("|")])
+    elements = [
+        {"type": "node", "id": i + 1, "lat": 27.7 + i * 1e-4, "lon": 85.3 + i * 1e-4,
+         "tags": {"amenity": amenity, "name": f"Stub {amenity}"}}
+        for i, amenity in enumerate(dict.fromkeys(amenities))
+    ]
+    return {"version": 0.6, "generator": "overpass stub", "elements": elements}
+
+
+class StubOverpassServer:
+    """
+    Local stand-in for the Overpass API interpreter endpoint.
+
+    Every GET request is recorded with its arrival time and query. Scripted
+    responses, given as (status, headers, body) tuples, are served first, one per
+    request; after that every query is answered with stub_response. Runs in a
+    background thread; use it as a context manager and point an OverpassClient at url.
+    """
+    def __init__(self, responses: Iterable[Tuple[int, Dict[str, str], Optional[dict]]] = (),
+                 host: str = DEFAULT_HOST, port: int = 0):
+        self.responses = deque(responses)
+        self.requests: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/interpreter"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query).get("data", [""])[0]
+                with stub._lock:
+                    stub.requests.append((time.monotonic(), query))
+                    scripted = stub.responses.popleft() if stub.responses else None
+                status, headers, body = scripted if scripted else (200, {}, None)
+                if status == 200 and body is None:
+                    body = stub_response(query)
+
+                payload = json.dumps(body if body is not None else {"remark": f"stub status {status}"}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StubOverpassServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Overpass API.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    with StubOverpassServer(host=args.host, port=args.port) as server:
+        print(f"Stub Overpass API at {server.url}; pass it as base_url to crawl_landmarks_data. Ctrl+C to stop.")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Constants
+RESPONSE_CACHE_DIR = Path("./data/overpass_cache")
+DEFAULT_TTL = 7 * 24 * 3600  # seconds
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache of JSON API responses.
+
+    Entries are keyed by a hash of the endpoint and the exact query text and stored
+    as gzip-compressed JSON. An entry older than the TTL counts as a miss. Hits,
+    misses and expired entries are counted so a crawl can report how much it
+    actually downloaded. Safe to share between threads.
+    """
+    def __init__(self, cache_dir: Path = RESPONSE_CACHE_DIR, ttl: Optional[float] = DEFAULT_TTL):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url: str, query: str) -> str:
+        """
+        Return the cache key of a query sent to an endpoint.
+        """
+        return hashlib.sha256(f"{url}\n{query}".encode("utf-8")).hexdigest()
+
+    def path(self, url: str, query: str) -> Path:
+        key = self.key(url, query)
+        return self.cache_dir / key[:2] / f"{key}.json.gz"
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            setattr(self, stat, getattr(self, stat) + 1)
+
+    def get(self, url: str, query: str) -> Optional[dict]:
+        """
+        Return the cached response of a query, or None if it is missing, expired or unreadable.
+        """
+        path = self.path(url, query)
+        if not path.exists():
+            self._count("misses")
+            return None
+
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, EOFError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable cache entry {path}: {e}")
+            self._count("misses")
+            return None
+
+        if self.ttl is not None and time.time() - entry["created_at"] > self.ttl:
+            self._count("expired")
+            self._count("misses")
+            return None
+
+        self._count("hits")
+        return entry["response"]
+
+    def put(self, url: str, query: str, response: dict) -> None:
+        """
+        Store a response. The entry is written under a temporary name and then
+        renamed, so readers never see a partial file.
+        """
+        path = self.path(url, query)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"url": url, "query": query, "created_at": time.time(), "response": response}
+
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(entry, f, separators=(",", ":"))
+        tmp_path.replace(path)
+
+    def log_stats(self) -> None:
+        """
+        Log the hit/miss statistics collected so far.
+        """
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0.0
+        logger.info(f"Response cache: {self.hits} hits, {self.misses} misses "
+                    f"({self.expired} expired), hit rate {rate:.0%}.")
+
+    def clear(self) -> int:
+        """
+        Delete every cached response.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        removed = 0
+        for path in self.cache_dir.glob("*/*.json.gz"):
+            path.unlink()
+            removed += 1
+        logger.info(f"Removed {removed} cached response(s) from {self.cache_dir}")
+        return removed
@@ -0,0 +1,89 @@
+from typing import Optional
+
+import osmnx as ox
+import networkx as nx
+
+# Graph-level attribute marking a graph as ready for routing
+PREPARED_KEY = "prepared_for_routing"
+# Node attributes holding the strongly and weakly connected component labels
+SCC_KEY = "scc"
+WCC_KEY = "wcc"
+
+
+class UnreachableError(nx.NetworkXNoPath):
+    """
+    Raised when component labels show a destination cannot be reached from an origin.
+    """
+
+
+def is_prepared(G) -> bool:
+    """
+    Check whether a graph has already been through prepare_graph.
+    """
+    return bool(G.graph.get(PREPARED_KEY, False))
+
+
+def label_components(G) -> None:
+    """
+    Label every node with its strongly and weakly connected component.
+
+    The labels are written into G's node attributes (SCC_KEY, WCC_KEY) in place, like
+    the osmnx edge attribute functions; label a copy (G.copy()) to keep G unchanged.
+    """
+    for label, nodes in enumerate(nx.strongly_connected_components(G)):
+        for node in nodes:
+            G.nodes[node][SCC_KEY] = label
+    for label, nodes in enumerate(nx.weakly_connected_components(G)):
+        for node in nodes:
+            G.nodes[node][WCC_KEY] = label
+
+
+def can_reach(G, orig, dest) -> Optional[bool]:
+    """
+    Decide in constant time whether dest can be reached from orig, using the
+    component labels set by prepare_graph.
+
+    Returns:
+        Optional[bool]: True if both nodes share a strongly connected component,
+        False if they lie in different weakly connected components, and None when
+        only a search can tell (or the graph carries no labels).
+    """
+    for node in (orig, dest):
+        if node not in G:
+            raise nx.NodeNotFound(f"Node {node} is not in the graph")
+    orig_data, dest_data = G.nodes[orig], G.nodes[dest]
+    if SCC_KEY in orig_data and orig_data[SCC_KEY] == dest_data.get(SCC_KEY):
+        return True
+    if WCC_KEY in orig_data and WCC_KEY in dest_data and orig_data[WCC_KEY] != dest_data[WCC_KEY]:
+        return False
+    return None
+
+
+def prepare_graph(G, hwy_speeds=None, fallback=None):
+    """
+    Prepare a street graph for routing.
+
+    Edge speeds, travel times and connected component labels are computed once for
+    the whole graph, the graph is marked as prepared and then frozen, so it can be shared read-only between
+    any number of RouteOptimizer instances, threads and queries.
+
+    G itself is modified: osmnx adds the edge attributes in place and the component
+    labels are written into its nodes before the graph is frozen, so pass G.copy()
+    to keep an unprepared graph.
+
+    Args:
+        G (networkx.MultiDiGraph): Graph as returned by osmnx.
+        hwy_speeds (dict, optional): Speeds (km/h) per highway type, passed to osmnx.
+        fallback (float, optional): Speed (km/h) for highway types without data.
+
+    Returns:
+        networkx.MultiDiGraph: The prepared, frozen graph.
+    """
+    if is_prepared(G):
+        return G
+
+    G = ox.add_edge_speeds(G, hwy_speeds=hwy_speeds, fallback=fallback)
+    G = ox.add_edge_travel_times(G)
+    label_components(G)
+    G.graph[PREPARED_KEY] = True
+    return nx.freeze(G)
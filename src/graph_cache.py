@@ -0,0 +1,158 @@
+import hashlib
+import json
+import logging
+from pathlib import Path
+
+import osmnx as ox
+
+from src.graph import prepare_graph
+from src import instrumentation
+from src.routing_engine import CSRGraph, networkx_memory_usage
+
+logger = logging.getLogger(__name__)
+
+# Constants
+GRAPH_CACHE_DIR = Path("./data/graph_cache")
+
+
+def _place_slug(place: str) -> str:
+    """
+    Turn a place name into a file-name friendly slug.
+    """
+    return "".join(ch if ch.isalnum() else "_" for ch in place.lower()).strip("_")
+
+
+def graph_cache_key(place: str, network_type: str, **prepare_options) -> str:
+    """
+    Build the cache key for a place, network type and graph preparation options.
+
+    Returns:
+        str: A short hex digest identifying the cached graph.
+    """
+    key = {
+        "place": place,
+        "network_type": network_type,
+        "prepare_options": prepare_options,
+        "format_version": CSRGraph.FORMAT_VERSION,
+    }
+    return hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def graph_cache_path(place: str, network_type: str, cache_dir: Path = GRAPH_CACHE_DIR, **prepare_options) -> Path:
+    """
+    Return the cache file path for a place, network type and preparation options.
+    """
+    return Path(cache_dir) / f"{_place_slug(place)}-{network_type}-{graph_cache_key(place, network_type, **prepare_options)}.npz"
+
+
+def load_graph(place: str, network_type: str = "walk", cache_dir: Path = GRAPH_CACHE_DIR,
+               offline: bool = False, refresh: bool = False, hwy_speeds=None, fallback=None,
+               alt_anchors: int = 0, node_attributes=(), edge_attributes=()) -> CSRGraph:
+    """
+    Load the prepared routing graph for a place, downloading and caching it on first use.
+
+    Args:
+        place (str): Place name passed to osmnx (e.g., "Kathmandu, Nepal").
+        network_type (str): osmnx network type (e.g., "walk" or "drive").
+        cache_dir (Path): Directory holding the cached graphs.
+        offline (bool): Never download; fail if the graph is not cached.
+        refresh (bool): Ignore and overwrite an existing cache entry.
+        hwy_speeds (dict, optional): Speeds per highway type, passed to prepare_graph.
+        fallback (float, optional): Fallback speed, passed to prepare_graph.
+        alt_anchors (int): Number of ALT anchors to precompute for exact
+            point-to-point routing (see CSRGraph.build_alt); 0 for none. They are
+            added to the cached graph the first time they are requested. Anchors
+            saved with the cached graph are only returned when requested, so a
+            graph loaded with 0 never switches routing to ALT.
+        node_attributes (Iterable[str]): OSM node attributes to keep next to the
+            coordinates (e.g., "street_count"); all others are dropped.
+        edge_attributes (Iterable[str]): OSM edge attributes to keep next to the
+            travel time and length (e.g., "highway", "name"); all others are dropped.
+
+    Returns:
+        CSRGraph: The prepared graph in array form.
+    """
+    prepare_options = {"hwy_speeds": hwy_speeds, "fallback": fallback}
+    attributes = {"node_attributes": sorted(node_attributes), "edge_attributes": sorted(edge_attributes)}
+    # Whitelists only enter the cache key when set, so graphs cached without them stay valid
+    path = graph_cache_path(place, network_type, cache_dir, **prepare_options,
+                            **{name: values for name, values in attributes.items() if values})
+
+    if path.exists() and not refresh:
+        logger.info(f"Loading cached graph for {place} ({network_type}) from {path}")
+        instrumentation.count("graph_cache_hits")
+        graph = CSRGraph.load(path)
+        if alt_anchors and (not graph.has_alt or len(graph.alt_anchors) != alt_anchors):
+            _add_alt(graph, path, alt_anchors)
+        elif not alt_anchors:
+            # Saved anchors stay in the file for runs that request them
+            graph.drop_alt()
+        return graph
+
+    if offline:
+        reason = "refresh was requested" if path.exists() else f"no cached graph exists at {path}"
+        raise FileNotFoundError(
+            f"Cannot load the {network_type} graph for {place!r} in offline mode: {reason}. "
+            "Run once with network access to build the cache."
+        )
+
+    logger.info(f"Downloading {network_type} graph for {place}...")
+    instrumentation.count("graph_cache_misses")
+    G = prepare_graph(ox.graph_from_place(place, network_type=network_type), **prepare_options)
+    graph = CSRGraph.from_networkx(G, **attributes)
+    log_memory_report(G, graph)
+    del G
+
+    if alt_anchors:
+        graph.build_alt(alt_anchors)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    graph.save(path)
+    logger.info(f"Cached graph with {graph.num_nodes} nodes and {graph.num_edges} edges at {path}")
+    return graph
+
+
+def log_memory_report(G, graph: CSRGraph) -> None:
+    """
+    Log the memory of a networkx graph next to that of its compact array form.
+
+    The array figure covers the arrays as loaded from the cache; the reverse graph
+    and the heuristic coordinates built on first search add to it (see
+    CSRGraph.memory_usage), and the process holding it adds interpreter overhead.
+    """
+    before = networkx_memory_usage(G)
+    after = graph.memory_usage()["total"]
+    logger.info(f"Graph memory: {before / 2**20:.1f} MiB as networkx, {after / 2**20:.1f} MiB as arrays "
+                f"before search structures are built.")
+
+
+def _add_alt(graph: CSRGraph, path: Path, alt_anchors: int) -> None:
+    """
+    Precompute ALT anchor distances for a cached graph and save them with it.
+    """
+    logger.info(f"Precomputing {alt_anchors} ALT anchors for {path}")
+    graph.build_alt(alt_anchors)
+    tmp_path = path.with_name(f"tmp-{path.name}")
+    graph.save(tmp_path)
+    tmp_path.replace(path)
+
+
+def clear_graph_cache(place: str = None, network_type: str = None, cache_dir: Path = GRAPH_CACHE_DIR) -> int:
+    """
+    Delete cached graphs, optionally only those of one place and/or network type.
+
+    Returns:
+        int: The number of cache files removed.
+    """
+    cache_dir = Path(cache_dir)
+    if not cache_dir.exists():
+        return 0
+
+    pattern = f"{_place_slug(place) if place else '*'}-{network_type or '*'}-*.npz"
+
+    removed = 0
+    for path in cache_dir.glob(pattern):
+        path.unlink()
+        removed += 1
+    logger.info(f"Removed {removed} cached graph(s) matching {pattern}")
+    return removed
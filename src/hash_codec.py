@@ -0,0 +1,186 @@
+import re
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from src.utils import DIRECTIONS
+
+# Constants
+MAGIC = b"RHC1"
+SEGMENT_PATTERN = re.compile(r"([NESW])_(\d+)\.(\d\d)")
+# The landmark name runs up to the first "|" after which only segments follow;
+# a route without segments is written as "<landmark>|"
+HASH_PATTERN = re.compile(r"(.*?)\|((?:[NESW]_\d+\.\d\d\|)*[NESW]_\d+\.\d\d)?", re.DOTALL)
+DIRECTION_CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    """
+    Append an unsigned integer as a LEB128 varint.
+    """
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    """
+    Read a LEB128 varint, returning the value and the offset after it.
+    """
+    value, shift = 0, 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def parse_hash(hash_string: str) -> Tuple[str, List[Tuple[str, int]]]:
+    """
+    Split a route hash into its landmark name and (direction, centimetres) segments.
+
+    Distances are written with exactly two decimals by RouteOptimizer.generate_hash,
+    so whole centimetres hold them without loss.
+
+    Raises:
+        ValueError: If the string is not a route hash.
+    """
+    match = HASH_PATTERN.fullmatch(hash_string)
+    if match is None:
+        raise ValueError(f"Not a route hash: {hash_string!r}")
+    landmark, tail = match.groups()
+    segments = [(direction, int(metres + centimetres)) for direction, metres, centimetres in SEGMENT_PATTERN.findall(tail or "")]
+    return landmark, segments
+
+
+def format_hash(landmark: str, segments: Iterable[Tuple[str, int]]) -> str:
+    """
+    Write a landmark name and (direction, centimetres) segments in the text form of generate_hash.
+    """
+    return f"{landmark}|" + "|".join(f"{direction}_{centimetres // 100}.{centimetres % 100:02d}" for direction, centimetres in segments)
+
+
+class HashCodec:
+    """
+    Compact binary encoding of route hashes.
+
+    Landmark names are replaced by their index in a shared dictionary, directions
+    are packed four to a byte as 2-bit codes, and distances are stored as varints
+    of whole centimetres. A code is
+
+        varint(landmark index) varint(segment count) packed directions varint(centimetres)...
+
+    and decodes to exactly the original text.
+    """
+    def __init__(self, landmarks: Optional[List[str]] = None):
+        self.landmarks = list(landmarks or [])
+        self._landmark_ids = {landmark: i for i, landmark in enumerate(self.landmarks)}
+
+    def landmark_id(self, landmark: str) -> int:
+        """
+        Return the dictionary index of a landmark, adding it if it is new.
+        """
+        landmark_id = self._landmark_ids.get(landmark)
+        if landmark_id is None:
+            landmark_id = self._landmark_ids[landmark] = len(self.landmarks)
+            self.landmarks.append(landmark)
+        return landmark_id
+
+    def encode(self, hash_string: str) -> bytes:
+        """
+        Encode one route hash.
+        """
+        landmark, segments = parse_hash(hash_string)
+        out = bytearray()
+        _write_varint(out, self.landmark_id(landmark))
+        _write_varint(out, len(segments))
+
+        for start in range(0, len(segments), 4):
+            packed = 0
+            for shift, (direction, _) in enumerate(segments[start:start + 4]):
+                packed |= DIRECTION_CODES[direction] << (2 * shift)
+            out.append(packed)
+
+        for _, centimetres in segments:
+            _write_varint(out, centimetres)
+        return bytes(out)
+
+    def decode_segments(self, code: bytes) -> Tuple[str, List[Tuple[str, int]]]:
+        """
+        Decode a code into its landmark name and (direction, centimetres) segments,
+        without going through the text form.
+        """
+        landmark_id, offset = _read_varint(code, 0)
+        count, offset = _read_varint(code, offset)
+
+        directions = []
+        for i in range(count):
+            directions.append(DIRECTIONS[(code[offset + i // 4] >> (2 * (i % 4))) & 0b11])
+        offset += (count + 3) // 4
+
+        segments = []
+        for direction in directions:
+            centimetres, offset = _read_varint(code, offset)
+            segments.append((direction, centimetres))
+        return self.landmarks[landmark_id], segments
+
+    def decode(self, code: bytes) -> str:
+        """
+        Decode a code back to the text form of the route hash.
+        """
+        return format_hash(*self.decode_segments(code))
+
+
+def save_route_hashes(path: Path, hash_strings: Iterable[Optional[str]]) -> None:
+    """
+    Write route hashes to a compact binary file.
+
+    The file holds a magic number, the landmark dictionary and then one
+    length-prefixed code per hash, in order. Missing hashes are stored as empty codes.
+    """
+    codec = HashCodec()
+    codes = [codec.encode(hash_string) if isinstance(hash_string, str) else b"" for hash_string in hash_strings]
+
+    out = bytearray(MAGIC)
+    _write_varint(out, len(codec.landmarks))
+    for landmark in codec.landmarks:
+        encoded = landmark.encode("utf-8")
+        _write_varint(out, len(encoded))
+        out += encoded
+    _write_varint(out, len(codes))
+    for code in codes:
+        _write_varint(out, len(code))
+        out += code
+
+    Path(path).write_bytes(bytes(out))
+
+
+def load_route_hashes(path: Path) -> Tuple[HashCodec, List[Optional[bytes]]]:
+    """
+    Read a file written by save_route_hashes.
+
+    Returns:
+        Tuple[HashCodec, List[Optional[bytes]]]: The codec holding the landmark
+        dictionary and the code of every hash, None where the hash was missing.
+    """
+    data = Path(path).read_bytes()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a route hash file")
+
+    offset = len(MAGIC)
+    count, offset = _read_varint(data, offset)
+    landmarks = []
+    for _ in range(count):
+        length, offset = _read_varint(data, offset)
+        landmarks.append(data[offset:offset + length].decode("utf-8"))
+        offset += length
+
+    count, offset = _read_varint(data, offset)
+    codes = []
+    for _ in range(count):
+        length, offset = _read_varint(data, offset)
+        codes.append(data[offset:offset + length] if length else None)
+        offset += length
+    return HashCodec(landmarks), codes
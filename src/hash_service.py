@@ -0,0 +1,346 @@
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import h3
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from src.storage import read_table, table_columns
+
+logger = logging.getLogger(__name__)
+
+# Constants
+HASHES_FILE = Path("./data/ktm_buildings_with_hashes.parquet")
+EARTH_RADIUS_M = 6371009.0
+DEFAULT_CELL_RESOLUTION = 9
+MAX_CELL_BUILDINGS = 1000
+LATENCY_WINDOW = 10000
+MAX_REQUEST_LINE = 8192
+
+
+class StringColumn:
+    """
+    Immutable column of strings packed into one UTF-8 buffer with offsets, which
+    takes a fraction of the memory of a list of Python strings.
+    """
+    def __init__(self, values):
+        encoded = [b"" if value is None or value != value else str(value).encode("utf-8") for value in values]
+        self.offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum([len(value) for value in encoded])
+        self.buffer = b"".join(encoded)
+        self.missing = np.array([value is None or value != value for value in values], dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.missing)
+
+    def __getitem__(self, position: int) -> Optional[str]:
+        if self.missing[position]:
+            return None
+        return self.buffer[self.offsets[position]:self.offsets[position + 1]].decode("utf-8")
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.buffer) + self.offsets.nbytes + self.missing.nbytes
+
+
+class HashIndex:
+    """
+    In-memory index of the route hash dataset.
+
+    Coordinates are kept in NumPy arrays and the hashes and names in packed string
+    columns. Nearest-building queries use a KD-tree over unit-sphere coordinates
+    and cell queries use buildings sorted by H3 cell, so every lookup is a few
+    array operations. Buildings are identified by their OSM id (the osmid column,
+    which the dataset must have), never by row position.
+    """
+    def __init__(self, buildings: pd.DataFrame, cell_resolution: int = DEFAULT_CELL_RESOLUTION):
+        hash_column = "route_hashes" if "route_hashes" in buildings.columns else "hashes"
+        self.cell_resolution = cell_resolution
+        self.latitude = buildings["latitude"].to_numpy(dtype=np.float64)
+        self.longitude = buildings["longitude"].to_numpy(dtype=np.float64)
+        self.hashes = StringColumn(buildings[hash_column].tolist())
+        self.names = StringColumn(buildings["name"].tolist() if "name" in buildings.columns else [None] * len(buildings))
+
+        # Buildings are identified by their OSM id; row positions change whenever the data does
+        if "osmid" not in buildings.columns:
+            raise ValueError("The hash dataset has no osmid column, so buildings cannot be looked up by id.")
+        self.ids = buildings["osmid"].to_numpy()
+        self.positions = {building_id: position for position, building_id in enumerate(self.ids.tolist())}
+        if len(self.positions) < len(self.ids):
+            logger.warning(f"{len(self.ids) - len(self.positions)} buildings share an OSM id with another building; "
+                           f"/buildings/<id> returns the last of them.")
+
+        lat, lon = np.radians(self.latitude), np.radians(self.longitude)
+        self.tree = cKDTree(np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat))))
+
+        cells = np.array([h3.geo_to_h3(y, x, cell_resolution) for y, x in zip(self.latitude.tolist(), self.longitude.tolist())])
+        self.cell_order = np.argsort(cells, kind="stable")
+        self.sorted_cells = cells[self.cell_order]
+
+    @classmethod
+    def load(cls, path: Path = HASHES_FILE, cell_resolution: int = DEFAULT_CELL_RESOLUTION):
+        """
+        Load the hash dataset from Parquet, CSV or the JSON lines written by main.py.
+        """
+        path = Path(path)
+        if path.suffix == ".json":
+            buildings = pd.read_json(path, orient="records", lines=True)
+        else:
+            if "osmid" not in table_columns(path):
+                raise ValueError(f"{path} has no osmid column, so buildings cannot be looked up by id.")
+            buildings = read_table(path, columns=["osmid", "latitude", "longitude", "name", "route_hashes"])
+        return cls(buildings, cell_resolution=cell_resolution)
+
+    def __len__(self) -> int:
+        return len(self.latitude)
+
+    def position_of(self, building_id: str) -> Optional[int]:
+        """
+        Return the row of a building's OSM id, or None if there is no such building.
+        """
+        try:
+            return self.positions.get(int(building_id))
+        except ValueError:
+            return None
+
+    def record(self, position: int) -> Dict:
+        return {
+            "id": self.ids[position].item(),
+            "latitude": float(self.latitude[position]),
+            "longitude": float(self.longitude[position]),
+            "name": self.names[position],
+            "hash": self.hashes[position],
+        }
+
+    def nearest(self, lat: float, lon: float) -> Tuple[int, float]:
+        """
+        Return the row of the building nearest to a point and its great-circle distance in metres.
+        """
+        lat_r, lon_r = np.radians(lat), np.radians(lon)
+        chord, position = self.tree.query((np.cos(lat_r) * np.cos(lon_r), np.cos(lat_r) * np.sin(lon_r), np.sin(lat_r)))
+        return int(position), float(2 * np.arcsin(min(chord / 2, 1.0)) * EARTH_RADIUS_M)
+
+    def in_cell(self, cell: str) -> np.ndarray:
+        """
+        Return the rows of the buildings inside an H3 cell at or above the index resolution.
+        """
+        resolution = h3.h3_get_resolution(cell)
+        if resolution > self.cell_resolution:
+            raise ValueError(f"Cell resolution {resolution} is finer than the index resolution {self.cell_resolution}.")
+        cells = [cell] if resolution == self.cell_resolution else sorted(h3.h3_to_children(cell, self.cell_resolution))
+
+        starts = np.searchsorted(self.sorted_cells, cells, side="left")
+        ends = np.searchsorted(self.sorted_cells, cells, side="right")
+        return np.concatenate([self.cell_order[start:end] for start, end in zip(starts, ends)]) if cells else np.array([], dtype=np.int64)
+
+    @property
+    def nbytes(self) -> int:
+        return self.latitude.nbytes + self.longitude.nbytes + self.hashes.nbytes + self.names.nbytes
+
+
+class RequestStats:
+    """
+    Request counters and a rolling window of latencies per endpoint.
+    """
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.started = time.monotonic()
+        self.requests = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.latencies = defaultdict(lambda: deque(maxlen=window))
+        self.recent = deque()
+
+    def record(self, endpoint: str, status: int, seconds: float) -> None:
+        now = time.monotonic()
+        self.requests[endpoint] += 1
+        if status >= 400:
+            self.errors[endpoint] += 1
+        self.latencies[endpoint].append(seconds)
+
+        # Requests per second over the last minute, one bucket per second
+        second = int(now)
+        if self.recent and self.recent[-1][0] == second:
+            self.recent[-1][1] += 1
+        else:
+            self.recent.append([second, 1])
+        while self.recent[0][0] <= second - 60:
+            self.recent.popleft()
+
+    def snapshot(self) -> Dict:
+        uptime = time.monotonic() - self.started
+        endpoints = {}
+        for endpoint, count in self.requests.items():
+            latencies = np.array(self.latencies[endpoint]) * 1000
+            endpoints[endpoint] = {
+                "requests": count,
+                "errors": self.errors[endpoint],
+                "latency_ms": {
+                    "p50": round(float(np.percentile(latencies, 50)), 3),
+                    "p90": round(float(np.percentile(latencies, 90)), 3),
+                    "p99": round(float(np.percentile(latencies, 99)), 3),
+                    "max": round(float(latencies.max()), 3),
+                },
+            }
+        total = sum(self.requests.values())
+        return {
+            "uptime_s": round(uptime, 1),
+            "requests": total,
+            "requests_per_s": round(total / uptime, 2) if uptime else 0.0,
+            "requests_per_s_last_minute": round(sum(count for _, count in self.recent) / min(uptime, 60), 2) if uptime else 0.0,
+            "endpoints": endpoints,
+        }
+
+
+class HashService:
+    """
+    Minimal asyncio HTTP/1.1 server answering route hash lookups.
+
+    Endpoints:
+        GET /buildings/<osmid>         Hash of one building.
+        GET /nearest?lat=..&lon=..     Hash of the building nearest to a point.
+        GET /cells/<h3 cell>[?limit=]  Hashes of all buildings in an H3 cell.
+        GET /stats                     Request rate and latency counters.
+    """
+    def __init__(self, index: HashIndex, host: str = "127.0.0.1", port: int = 8000):
+        self.index = index
+        self.host = host
+        self.port = port
+        self.stats = RequestStats()
+        self._server = None
+
+    def route(self, path: str, query: Dict[str, List[str]]) -> Tuple[str, int, Dict]:
+        """
+        Answer one request.
+
+        Returns:
+            Tuple[str, int, Dict]: The endpoint name, HTTP status and JSON body.
+        """
+        parts = [part for part in path.split("/") if part]
+        if len(parts) == 2 and parts[0] == "buildings":
+            position = self.index.position_of(parts[1])
+            if position is None:
+                return "building", 404, {"error": f"Unknown building {parts[1]}"}
+            return "building", 200, self.index.record(position)
+
+        if parts == ["nearest"]:
+            try:
+                lat, lon = float(query["lat"][0]), float(query["lon"][0])
+            except (KeyError, ValueError):
+                return "nearest", 400, {"error": "lat and lon query parameters are required"}
+            position, distance = self.index.nearest(lat, lon)
+            return "nearest", 200, {**self.index.record(position), "distance_m": round(distance, 2)}
+
+        if len(parts) == 2 and parts[0] == "cells":
+            if not h3.h3_is_valid(parts[1]):
+                return "cell", 400, {"error": f"Invalid H3 cell {parts[1]}"}
+            try:
+                limit = int(query.get("limit", [MAX_CELL_BUILDINGS])[0])
+                positions = self.index.in_cell(parts[1])
+            except ValueError as e:
+                return "cell", 400, {"error": str(e)}
+            return "cell", 200, {
+                "cell": parts[1],
+                "count": int(len(positions)),
+                "buildings": [self.index.record(position) for position in positions[:limit].tolist()],
+            }
+
+        if parts == ["stats"]:
+            return "stats", 200, {**self.stats.snapshot(), "buildings": len(self.index), "index_bytes": self.index.nbytes}
+
+        return "unknown", 404, {"error": f"Unknown path {path}"}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                started = time.perf_counter()
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get("content-length", 0) or 0):
+                    await reader.readexactly(int(headers["content-length"]))
+
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    endpoint, status, body = "invalid", 400, {"error": "Malformed request line"}
+                    version = "HTTP/1.0"
+                else:
+                    if len(request_line) > MAX_REQUEST_LINE:
+                        endpoint, status, body = "invalid", 414, {"error": "Request line too long"}
+                    elif method != "GET":
+                        endpoint, status, body = "invalid", 405, {"error": "Only GET is supported"}
+                    else:
+                        url = urlsplit(target)
+                        endpoint, status, body = self.route(url.path, parse_qs(url.query))
+
+                keep_alive = (version == "HTTP/1.1" and headers.get("connection", "").lower() != "close") \
+                    or headers.get("connection", "").lower() == "keep-alive"
+                payload = json.dumps(body, separators=(",", ":")).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Access-Control-Allow-Origin: *\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + payload
+                )
+                await writer.drain()
+                self.stats.record(endpoint, status, time.perf_counter() - started)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Serving {len(self.index)} route hashes on http://{self.host}:{self.port}")
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+def main(path: Path = HASHES_FILE, host: str = "127.0.0.1", port: int = 8000,
+         cell_resolution: int = DEFAULT_CELL_RESOLUTION) -> None:
+    """
+    Load the hash dataset and serve it until interrupted.
+    """
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    index = HashIndex.load(path, cell_resolution=cell_resolution)
+    asyncio.run(HashService(index, host=host, port=port).serve_forever())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve route hash lookups over HTTP.")
+    parser.add_argument("--data", type=Path, default=HASHES_FILE)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cell-resolution", type=int, default=DEFAULT_CELL_RESOLUTION)
+    args = parser.parse_args()
+    main(args.data, args.host, args.port, args.cell_resolution)
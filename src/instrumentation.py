@@ -0,0 +1,298 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# Constants
+METRICS_FILE = Path("./data/metrics/metrics.jsonl")
+PROFILE_DIR = Path("./data/metrics/profiles")
+RSS_SAMPLE_INTERVAL = 0.1  # seconds
+TOP_ENTRIES = 15
+
+# Metrics of the current run; None while instrumentation is off
+_metrics = None
+
+
+def _workers_memory(process: psutil.Process) -> int:
+    """
+    Proportional set size (PSS) of the live children of a process (pool workers), in bytes.
+
+    Forked workers share most of their pages with the parent and with each other, so
+    their summed RSS would count those pages once per process; PSS charges a shared
+    page in equal parts to the processes that map it. Falls back to USS, then RSS,
+    where the platform does not report PSS.
+    """
+    total = 0
+    for child in process.children(recursive=True):
+        try:
+            memory = child.memory_full_info()
+        except psutil.Error:
+            continue
+        total += getattr(memory, "pss", getattr(memory, "uss", memory.rss))
+    return total
+
+
+class _PeakSampler(threading.Thread):
+    """
+    Background thread recording the peak resident memory of the process and,
+    separately, the peak PSS of its workers.
+    """
+    def __init__(self, interval: float):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak = self.process.memory_info().rss
+        self.peak_workers = _workers_memory(self.process)
+        self._stopped = threading.Event()
+
+    def _sample(self) -> None:
+        try:
+            self.peak = max(self.peak, self.process.memory_info().rss)
+            self.peak_workers = max(self.peak_workers, _workers_memory(self.process))
+        except psutil.Error:
+            pass
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self._sample()
+
+    def stop(self) -> Tuple[int, int]:
+        self._stopped.set()
+        self.join()
+        self._sample()
+        return self.peak, self.peak_workers
+
+
+def _hit_rates(counters: Dict[str, float]) -> Dict[str, float]:
+    """
+    Hit rate of every <name>_hits counter against its <name>_misses counter.
+    """
+    rates = {}
+    for key, hits in counters.items():
+        if key.endswith("_hits"):
+            name = key[:-len("_hits")]
+            lookups = hits + counters.get(f"{name}_misses", 0)
+            if lookups:
+                rates[name] = round(hits / lookups, 4)
+    return rates
+
+
+class _Stage:
+    """
+    Counters collected while one stage runs.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.counters = defaultdict(float)
+
+
+class Metrics:
+    """
+    Stage timers and counters written as JSON lines.
+
+    Every stage produces one record with its wall and CPU time, resident memory at
+    start and end, peak resident memory of the process, peak PSS of its pool workers
+    (reported apart, so pages shared with the parent are not counted twice), the counters
+    collected while it ran, a rate per second for every count and a hit rate for every
+    <name>_hits/<name>_misses pair. For the stages named in profile_stages, a cProfile
+    profile and, with trace_memory, a tracemalloc snapshot are saved and their top
+    entries added to the record. Only the main process is profiled.
+    """
+    def __init__(self, path: Optional[Path] = METRICS_FILE, profile_stages=(), trace_memory: bool = False,
+                 profile_dir: Path = PROFILE_DIR, sample_interval: float = RSS_SAMPLE_INTERVAL):
+        self.path = Path(path) if path is not None else None
+        self.profile_stages = set(profile_stages or ())
+        self.trace_memory = trace_memory
+        self.profile_dir = Path(profile_dir)
+        self.sample_interval = sample_interval
+        self.run_id = time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        self.records = []
+        self._stack = []
+        self._lock = threading.Lock()
+
+    def emit(self, record: Dict) -> None:
+        """
+        Append one record, tagged with the run id and a timestamp.
+        """
+        record = {"run_id": self.run_id, "time": time.strftime("%Y-%m-%dT%H:%M:%S"), **record}
+        with self._lock:
+            self.records.append(record)
+            if self.path is not None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, default=str) + "\n")
+
+    def count(self, name: str, value: float = 1) -> None:
+        """
+        Add to a counter of the innermost running stage.
+        """
+        if self._stack:
+            self._stack[-1].counters[name] += value
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time a stage and emit its record when it ends, also when it fails.
+        """
+        current = _Stage(name)
+        self._stack.append(current)
+        process = psutil.Process()
+        rss_start = process.memory_info().rss
+        sampler = _PeakSampler(self.sample_interval)
+        sampler.start()
+
+        profiler = None
+        tracing = False
+        if name in self.profile_stages:
+            profiler = cProfile.Profile()
+            if self.trace_memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                tracing = True
+            profiler.enable()
+
+        status = "ok"
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield current
+        except BaseException as e:
+            status = f"error: {type(e).__name__}"
+            raise
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            if profiler is not None:
+                profiler.disable()
+            peak, peak_workers = sampler.stop()
+            self._stack.pop()
+
+            counters = {
+                key: int(value) if float(value).is_integer() else round(value, 6) for key, value in current.counters.items()
+            }
+            record = {
+                "event": "stage",
+                "stage": name,
+                "status": status,
+                "wall_seconds": round(wall, 6),
+                "cpu_seconds": round(cpu, 6),
+                "rss_start_mib": round(rss_start / 2**20, 1),
+                "rss_end_mib": round(process.memory_info().rss / 2**20, 1),
+                "peak_rss_mib": round(peak / 2**20, 1),
+                "peak_workers_pss_mib": round(peak_workers / 2**20, 1),
+                "counters": counters,
+                "rates": {
+                    f"{key}_per_sec": round(value / wall, 3)
+                    for key, value in counters.items() if wall > 0 and not key.endswith("_seconds")
+                },
+                "hit_rates": _hit_rates(counters),
+            }
+            if profiler is not None:
+                record.update(self._save_profile(name, profiler))
+            if tracing:
+                record.update(self._save_snapshot(name))
+                tracemalloc.stop()
+            self.emit(record)
+
+    def _save_profile(self, name: str, profiler: cProfile.Profile) -> Dict:
+        """
+        Save a stage's cProfile data and return its top functions by cumulative time.
+        """
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        path = self.profile_dir / f"{self.run_id}-{name}.prof"
+        profiler.dump_stats(str(path))
+
+        stats = pstats.Stats(profiler, stream=io.StringIO()).sort_stats("cumulative")
+        top = []
+        for function in stats.fcn_list[:TOP_ENTRIES]:
+            calls, _, total, cumulative, _ = stats.stats[function]
+            filename, line, function_name = function
+            top.append({"function": f"{os.path.basename(filename)}:{line}({function_name})", "calls": calls,
+                        "total_seconds": round(total, 6), "cumulative_seconds": round(cumulative, 6)})
+        logger.info(f"Saved profile of stage '{name}' to {path}")
+        return {"profile_file": str(path), "top_functions": top}
+
+    def _save_snapshot(self, name: str) -> Dict:
+        """
+        Save a tracemalloc snapshot of a stage and return its largest allocation sites.
+        """
+        snapshot = tracemalloc.take_snapshot()
+        _, traced_peak = tracemalloc.get_traced_memory()
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        path = self.profile_dir / f"{self.run_id}-{name}.tracemalloc"
+        snapshot.dump(str(path))
+
+        top = [
+            {"location": f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+             "size_kib": round(stat.size / 1024, 1), "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:TOP_ENTRIES]
+        ]
+        logger.info(f"Saved memory snapshot of stage '{name}' to {path}")
+        return {"snapshot_file": str(path), "traced_peak_mib": round(traced_peak / 2**20, 1), "top_allocations": top}
+
+
+def enable(path: Optional[Path] = METRICS_FILE, profile_stages=(), trace_memory: bool = False,
+           profile_dir: Path = PROFILE_DIR) -> Metrics:
+    """
+    Turn instrumentation on for this process and return the collector.
+
+    Args:
+        path (Path, optional): JSONL file the records are appended to; None keeps
+            them in memory only (Metrics.records).
+        profile_stages (Iterable[str]): Stages to run under cProfile.
+        trace_memory (bool): Also trace allocations in those stages with tracemalloc.
+        profile_dir (Path): Directory for the profile and snapshot files.
+    """
+    global _metrics
+    _metrics = Metrics(path, profile_stages=profile_stages, trace_memory=trace_memory, profile_dir=profile_dir)
+    return _metrics
+
+
+def disable() -> None:
+    """
+    Turn instrumentation off; stage, timer and count become no-ops.
+    """
+    global _metrics
+    _metrics = None
+
+
+def stage(name: str):
+    """
+    Context manager recording a pipeline stage, or doing nothing while instrumentation is off.
+    """
+    return _metrics.stage(name) if _metrics is not None else nullcontext()
+
+
+def count(name: str, value: float = 1) -> None:
+    """
+    Add to a counter of the running stage, if instrumentation is on.
+    """
+    if _metrics is not None:
+        _metrics.count(name, value)
+
+
+@contextmanager
+def timer(name: str):
+    """
+    Add the time spent in the block to the <name>_seconds counter of the running stage.
+    """
+    if _metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _metrics.count(f"{name}_seconds", time.perf_counter() - started)
@@ -0,0 +1,196 @@
+import multiprocessing as mp
+import os
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from tqdm import tqdm
+
+from src import instrumentation
+from src.route_optimizer import RouteOptimizer
+
+# Optimizer used by the workers: built by the parent and inherited on fork, or built per worker on spawn
+_worker_optimizer = None
+
+
+def _init_worker(graph, use_alt=False) -> None:
+    """
+    Build a spawned worker's optimizer once, over the graph passed in by the pool.
+    """
+    global _worker_optimizer
+    _worker_optimizer = RouteOptimizer(graph, use_alt=use_alt)
+
+
+def _add(stats: Dict[str, float], key: str, value: float = 1) -> None:
+    """
+    Add to a routing statistic, starting it at zero.
+    """
+    stats[key] = stats.get(key, 0) + value
+
+
+def _route_and_hash_task(task) -> Tuple[List[Tuple[Optional[str], Optional[str]]], Dict[str, float]]:
+    """
+    Route and hash one task's node pairs, capturing errors per row.
+
+    Returns:
+        Tuple[List[Tuple[Optional[str], Optional[str]]], Dict[str, float]]: (hash, error)
+        per pair, in order, and the task's routing statistics.
+    """
+    stats = {}
+    return route_and_hash_pairs(_worker_optimizer, *task, stats=stats), stats
+
+
+def route_and_hash_pairs(optimizer, pairs, landmark_names, batch_routing=False, stats=None):
+    """
+    Route (landmark node, building node) pairs and hash the routes.
+
+    A failed row yields (None, error message) instead of failing the whole batch.
+    If a stats dict is given, the time spent routing and hashing, the number of
+    routes and hashes and the failures per exception type are added to it.
+    """
+    stats = {} if stats is None else stats
+    results = [(None, None)] * len(pairs)
+    paths = [None] * len(pairs)
+    started = time.perf_counter()
+
+    batch_paths = None
+    if batch_routing:
+        try:
+            batch_paths = optimizer.get_shortest_paths(pairs)
+        except Exception:
+            # Fall back to routing row by row to isolate the failing pairs
+            batch_paths = None
+
+    for position, pair in enumerate(pairs):
+        try:
+            if batch_paths is not None:
+                path = batch_paths[position]
+            elif batch_routing:
+                path = optimizer.get_shortest_paths([pair])[0]
+            else:
+                path = optimizer.get_shortest_path(*pair)
+            if path is None:
+                raise ValueError("building is not reachable from its landmark")
+            paths[position] = path
+        except Exception as e:
+            results[position] = (None, str(e))
+            _add(stats, f"route_failures.{type(e).__name__}")
+
+    routed = [position for position, path in enumerate(paths) if path is not None]
+    _add(stats, "routes", len(routed))
+    _add(stats, "route_seconds", time.perf_counter() - started)
+    started = time.perf_counter()
+    try:
+        hashes = optimizer.generate_hashes([landmark_names[i] for i in routed], [paths[i] for i in routed])
+        for position, hash_string in zip(routed, hashes):
+            results[position] = (hash_string, None)
+    except Exception:
+        # Fall back to hashing row by row to isolate the failing paths
+        for position in routed:
+            try:
+                results[position] = (optimizer.generate_hash(landmark_names[position], paths[position]), None)
+            except Exception as e:
+                results[position] = (None, str(e))
+                _add(stats, f"hash_failures.{type(e).__name__}")
+    _add(stats, "hashes", sum(hash_string is not None for hash_string, _ in results))
+    _add(stats, "hash_seconds", time.perf_counter() - started)
+    return results
+
+
+class RouteHashPool:
+    """
+    Process pool that routes and hashes buildings on one read-only graph.
+
+    On platforms with fork, the parent builds the RouteOptimizer and its search
+    structures once before forking, and the workers inherit them through
+    copy-on-write memory instead of each building their own; with spawn, the graph
+    is sent once per worker through the pool initializer. Tasks only
+    carry node ids and landmark names, and results come back in input order.
+    use_alt is passed on to every worker's RouteOptimizer.
+    """
+    def __init__(self, graph, processes: Optional[int] = None, batch_routing: bool = False, task_size: int = 256,
+                 use_alt: bool = False):
+        self.graph = graph
+        self.use_alt = use_alt
+        self.processes = processes or os.cpu_count() or 1
+        self.batch_routing = batch_routing
+        self.task_size = task_size
+        self._pool = None
+        self._optimizer = None
+        self.stats = defaultdict(float)
+
+    def __enter__(self):
+        global _worker_optimizer
+        if self.processes > 1 and "fork" not in mp.get_all_start_methods():
+            self._pool = mp.get_context("spawn").Pool(
+                self.processes, initializer=_init_worker, initargs=(self.graph, self.use_alt)
+            )
+            return self
+
+        self._optimizer = RouteOptimizer(self.graph, use_alt=self.use_alt)
+        if self.processes > 1:
+            _worker_optimizer = self._optimizer.build_search_structures()
+            self._pool = mp.get_context("fork").Pool(self.processes)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _worker_optimizer
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        _worker_optimizer = None
+        return False
+
+    def _tasks(self, pairs, landmark_names):
+        """
+        Split the rows into tasks, returning the tasks and the row positions of each.
+
+        In batch routing mode rows are grouped by landmark node so every shortest-path
+        tree is built in exactly one task.
+        """
+        if self.batch_routing:
+            groups = defaultdict(list)
+            for position, (orig, _) in enumerate(pairs):
+                groups[orig].append(position)
+            positions = list(groups.values())
+        else:
+            positions = [list(range(start, min(start + self.task_size, len(pairs))))
+                         for start in range(0, len(pairs), self.task_size)]
+
+        tasks = [
+            ([pairs[i] for i in group], [landmark_names[i] for i in group], self.batch_routing)
+            for group in positions
+        ]
+        return tasks, positions
+
+    def route_and_hash(self, pairs, landmark_names) -> Tuple[List[Optional[str]], List[Optional[str]]]:
+        """
+        Route and hash many (landmark node, building node) pairs.
+
+        Returns:
+            Tuple[List[Optional[str]], List[Optional[str]]]: The hash and the error
+            message of every pair, in input order.
+        """
+        pairs, landmark_names = list(pairs), list(landmark_names)
+        tasks, positions = self._tasks(pairs, landmark_names)
+
+        if self._pool is not None:
+            task_results = self._pool.imap(_route_and_hash_task, tasks, chunksize=1)
+        else:
+            task_results = (
+                (route_and_hash_pairs(self._optimizer, *task, stats=self.stats), None) for task in tasks
+            )
+
+        hashes, errors = [None] * len(pairs), [None] * len(pairs)
+        for group, (results, stats) in zip(positions, tqdm(task_results, total=len(tasks), desc="Generating Hashes")):
+            for position, (hash_string, error) in zip(group, results):
+                hashes[position], errors[position] = hash_string, error
+            for key, value in (stats or {}).items():
+                self.stats[key] += value
+
+        # Routing and hashing run in the workers, so their counters are reported from here
+        for key, value in self.stats.items():
+            instrumentation.count(key, value)
+        self.stats.clear()
+        return hashes, errors
@@ -1,11 +1,16 @@
 import json
+import os
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional
+
+from src.storage import write_table
+from src import instrumentation
 
 # Constants
 LANDMARKS_DIR = Path("./data/landmarks")
-OUTPUT_FILE = Path("./data/cleaned_landmarks.csv")
+OUTPUT_FILE = Path("./data/cleaned_landmarks.parquet")
 REQUIRED_COLUMNS = ["type", "id", "lat", "lon", "tags_name", "tags_amenity"]
 
 # Initialize logging
@@ -79,32 +84,129 @@ def process_landmark_data(json_data: List[dict]) -> pd.DataFrame:
 
     return df_selected
 
-def save_landmark_data(df: pd.DataFrame, output_path: Path) -> None:
+def extract_landmark_columns(path: Path) -> Optional[Dict[str, list]]:
+    """
+    Parse one Overpass JSON file and keep only the required fields of elements that
+    have a latitude, a longitude and a name.
+
+    Args:
+        path (Path): JSON file to parse.
+
+    Returns:
+        Optional[Dict[str, list]]: One list per required column, or None if the file
+        cannot be parsed or holds no elements.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = json.load(f)
+    except json.JSONDecodeError as e:
+        logger.error(f"Error parsing {path}: {e}")
+        return None
+    if 'elements' not in content:
+        return None
+
+    columns = {column: [] for column in REQUIRED_COLUMNS}
+    for element in content['elements']:
+        tags = element.get('tags') or {}
+        if element.get('lat') is None or element.get('lon') is None or tags.get('name') is None:
+            continue
+        columns['type'].append(element.get('type'))
+        columns['id'].append(element.get('id'))
+        columns['lat'].append(element['lat'])
+        columns['lon'].append(element['lon'])
+        columns['tags_name'].append(tags['name'])
+        columns['tags_amenity'].append(tags.get('amenity'))
+    return columns
+
+def load_landmark_data(directory: Path, workers: Optional[int] = None) -> pd.DataFrame:
     """
-    Save the cleaned DataFrame to a CSV file.
+    Load the cleaned landmark table straight from a directory of Overpass JSON files.
+
+    Files are parsed in parallel, only the required fields are extracted, and
+    duplicates on (tags_name, lat, lon) are dropped as each file arrives, so memory
+    grows with the number of unique landmarks rather than with the raw responses.
+    Files are merged in directory order, so the result matches
+    process_landmark_data(load_json_files_from_directory(directory)).
+
+    Args:
+        directory (Path): Directory to load files from.
+        workers (int, optional): Number of parser processes; defaults to the CPU count.
+
+    Returns:
+        pd.DataFrame: Cleaned DataFrame containing the landmark data.
+    """
+    if not directory.exists() or not any(directory.iterdir()):
+        raise FileNotFoundError(f"The directory {directory} is missing or empty.")
+
+    paths = [filename for filename in directory.iterdir() if filename.suffix == '.json']
+    workers = workers or os.cpu_count() or 1
+
+    seen = set()
+    columns = {column: [] for column in REQUIRED_COLUMNS}
+    found_elements = False
+
+    def merge(file_columns):
+        nonlocal found_elements
+        if file_columns is None:
+            return
+        found_elements = True
+        keys = zip(file_columns['tags_name'], file_columns['lat'], file_columns['lon'])
+        for i, key in enumerate(keys):
+            if key in seen:
+                continue
+            seen.add(key)
+            for column in REQUIRED_COLUMNS:
+                columns[column].append(file_columns[column][i])
+
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for file_columns in executor.map(extract_landmark_columns, paths):
+                merge(file_columns)
+    else:
+        for path in paths:
+            merge(extract_landmark_columns(path))
+
+    if not found_elements:
+        raise ValueError("No valid data frames to process.")
+
+    return pd.DataFrame(columns)
+
+def save_landmark_data(df: pd.DataFrame, output_path: Path, export_csv: bool = True) -> None:
+    """
+    Save the cleaned DataFrame to a Parquet file.
 
     Args:
         df (pd.DataFrame): DataFrame containing the cleaned data.
-        output_path (Path): Path where to save the CSV file.
+        output_path (Path): Path where to save the Parquet file.
+        export_csv (bool): Also export the data as CSV next to it.
     """
     try:
-        df.to_csv(output_path, index=False, encoding='utf-8')
-        logger.info(f"Data saved to {output_path}")
+        write_table(df, output_path, export_csv=export_csv)
     except Exception as e:
         logger.error(f"Error saving data to {output_path}: {e}")
 
-def crawl_and_process_landmarks_data() -> None:
+def crawl_and_process_landmarks_data(streaming: bool = True, workers: Optional[int] = None) -> None:
     """
     Main function to crawl and process landmarks data.
     It loads, processes, and saves the cleaned data.
+
+    Args:
+        streaming (bool): Parse the files in parallel straight into the required
+            columns instead of loading and normalizing every file in full.
+        workers (int, optional): Number of parser processes in streaming mode.
     """
     logger.info("Starting the landmark data crawl and processing...")
 
-    # Load the JSON files from the 'landmarks' directory
-    json_data = load_json_files_from_directory(LANDMARKS_DIR)
+    if streaming:
+        cleaned_df = load_landmark_data(LANDMARKS_DIR, workers=workers)
+    else:
+        # Load the JSON files from the 'landmarks' directory
+        json_data = load_json_files_from_directory(LANDMARKS_DIR)
+
+        # Process the JSON data into a cleaned DataFrame
+        cleaned_df = process_landmark_data(json_data)
 
-    # Process the JSON data into a cleaned DataFrame
-    cleaned_df = process_landmark_data(json_data)
+    instrumentation.count("landmarks", len(cleaned_df))
 
     # Save the cleaned DataFrame to a CSV file
     save_landmark_data(cleaned_df, OUTPUT_FILE)
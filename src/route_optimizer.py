@@ -1,6 +1,11 @@
 import osmnx as ox
 import networkx as nx
-from src.utils import haversine_distance, calculate_initial_compass_bearing
+import numpy as np
+from collections import defaultdict
+from src.graph import UnreachableError, can_reach, is_prepared
+from src.routing_engine import CSRGraph
+from src.snapping import NodeSnapper
+from src.utils import DIRECTIONS, haversine_distance, calculate_initial_compass_bearing, cardinal_direction
 
 
 # Function to calculate heuristic for A* algorithm
@@ -14,40 +19,179 @@ def heuristic(u, v, G):
         raise ValueError(f"Missing node attributes for {u} or {v}: {e}")
 
 class RouteOptimizer:
-    def __init__(self, G, landmark_location, destination_location):
+    def __init__(self, G, landmark_location=None, destination_location=None, snapper=None, backend='networkx',
+                 use_alt=False):
         """
-        Initialize the route optimizer with the graph and locations.
+        Initialize the route optimizer with a prepared graph and, optionally, default locations.
+
+        The graph must come from src.graph.prepare_graph. It is never modified here,
+        so a single optimizer can serve many queries and be shared across threads.
+        A NodeSnapper built for the same graph can be passed in to reuse its index.
+
+        The backend is 'networkx', 'csr' for the array-backed engine in
+        src.routing_engine, or a prebuilt CSRGraph to share one engine between
+        optimizers. Both backends return the same paths. G itself may also be a
+        CSRGraph, e.g. one loaded from the graph cache, which implies the array backend.
+
+        use_alt routes single pairs with the engine's ALT lower bounds (see
+        get_shortest_path); it requires an array engine with ALT anchor distances.
+        Anchors present on the engine are otherwise ignored, so routes never depend
+        on what an earlier run saved with the cached graph. ALT routes are exact but
+        2-3x slower than the default A* (see benchmark_alt.py).
         """
+        if isinstance(G, CSRGraph):
+            backend = G
+        elif not is_prepared(G):
+            raise ValueError("Graph is not prepared for routing; call src.graph.prepare_graph(G) first.")
+
         self.G = G
-        self.landmark_location = self.find_nearest_node(landmark_location)
-        self.destination_location = self.find_nearest_node(destination_location)
+        self._snapper = snapper
+
+        if isinstance(backend, CSRGraph):
+            self.engine = backend
+        elif backend == 'csr':
+            self.engine = CSRGraph.from_networkx(G)
+        elif backend == 'networkx':
+            self.engine = None
+        else:
+            raise ValueError(f"Unknown routing backend: {backend!r}")
+        if use_alt and (self.engine is None or not self.engine.has_alt):
+            raise ValueError("use_alt needs an array engine with ALT anchor distances; call CSRGraph.build_alt first.")
+        self.use_alt = use_alt
+        self._segment_engine = None
+
+        self.landmark_location = self.find_nearest_node(landmark_location) if landmark_location is not None else None
+        self.destination_location = self.find_nearest_node(destination_location) if destination_location is not None else None
         
+    @property
+    def snapper(self):
+        """
+        The NodeSnapper for this graph, built on first use.
+        """
+        if self._snapper is None:
+            self._snapper = NodeSnapper(self.G)
+        return self._snapper
+
     def find_nearest_node(self, point):
         """
         Find the nearest node in the graph to the given point (latitude, longitude).
         """
         lat, lon = point
-        return ox.distance.nearest_nodes(self.G, X=lon, Y=lat)
+        return self.snapper.snap_point(lat, lon)
+
+    def find_nearest_nodes(self, lats, lons):
+        """
+        Find the nearest nodes to arrays of latitudes and longitudes in one call.
+        Returns the node ids and the snap distances.
+        """
+        return self.snapper.snap(lats, lons)
 
-    def get_shortest_path(self):
+    def get_shortest_path(self, orig=None, dest=None):
         """
         Get the shortest path based on travel time using A*.
+        Defaults to the landmark and destination nodes given at construction.
+
+        Pairs that the graph's component labels prove unreachable raise
+        UnreachableError (a NetworkXNoPath) before any search is run.
+
+        With use_alt, the search uses the engine's ALT lower bounds (CSRGraph.build_alt)
+        instead of the great-circle heuristic. It then returns an exact shortest
+        travel-time path, which the great-circle heuristic (in metres, not a lower
+        bound on travel time in seconds) does not guarantee.
         """
-        # Add speed and travel time to edges
-        self.G = ox.add_edge_speeds(self.G)  # Adds edge speeds based on OSM data
-        self.G = ox.add_edge_travel_times(self.G)  # Calculate travel times
+        orig = self.landmark_location if orig is None else orig
+        dest = self.destination_location if dest is None else dest
+        if orig is None or dest is None:
+            raise ValueError("Both an origin and a destination node are required.")
+
+        if self.engine is not None:
+            engine = self.engine
+            search = engine.alt_path if self.use_alt else engine.astar_path
+            return engine.to_node_ids(search(engine.index_of(orig), engine.index_of(dest)))
+
+        if can_reach(self.G, orig, dest) is False:
+            raise UnreachableError(f"Node {dest} is in a different component than {orig}")
 
         # Compute shortest path based on travel time using A*
-        orig = self.landmark_location
-        dest = self.destination_location
-        self.path = nx.astar_path(self.G, orig, dest, heuristic=lambda u, v: heuristic(u, v, self.G), weight='travel_time')
-        return self.path
+        return nx.astar_path(self.G, orig, dest, heuristic=lambda u, v: heuristic(u, v, self.G), weight='travel_time')
+
+    def get_shortest_paths_from(self, source, targets):
+        """
+        Get the shortest travel-time paths from one source node to many target nodes.
+
+        A single Dijkstra search is run from the source and every path is read from
+        the resulting shortest-path tree, so each path is the one nx.dijkstra_path
+        returns for that pair. Unreachable targets map to None.
+        """
+        if self.engine is not None:
+            return self._engine_paths(self.engine, source, targets)
+
+        _, paths = nx.single_source_dijkstra(self.G, source, weight='travel_time')
+        return {target: paths.get(target) for target in targets}
+
+    def get_shortest_paths_to(self, target, sources):
+        """
+        Get the shortest travel-time paths from many source nodes to one target node.
+
+        A single Dijkstra search is run backwards from the target over a reversed view
+        of the graph. Unreachable sources map to None.
+
+        Every path has the same travel time as nx.dijkstra_path(G, source, target),
+        but where several paths are equally short it may be a different one, and
+        may have a different number of nodes. The forward search keeps the first
+        predecessor it settles at the shortest distance from the source, and that
+        order cannot be recovered from a search run from the target, whose
+        distances are also summed in the opposite order. Use get_shortest_paths_from
+        or get_shortest_path when the exact paths of the forward search are needed.
+        """
+        if self.engine is not None:
+            paths = self._engine_paths(self.engine.reverse(), target, sources)
+            return {source: path[::-1] if path is not None else None for source, path in paths.items()}
+
+        _, paths = nx.single_source_dijkstra(self.G.reverse(copy=False), target, weight='travel_time')
+        return {source: paths[source][::-1] if source in paths else None for source in sources}
+
+    @staticmethod
+    def _engine_paths(engine, source, targets):
+        """
+        Read the paths to many targets from one shortest-path tree of the array engine.
+        """
+        source_index = engine.index_of(source)
+        _, predecessors = engine.shortest_path_tree(source_index)
+
+        targets = list(targets)
+        paths = {}
+        for target, target_index in zip(targets, engine.indices_of(targets).tolist()):
+            path = engine.path_from_tree(predecessors, source_index, target_index)
+            paths[target] = engine.to_node_ids(path) if path is not None else None
+        return paths
+
+    def get_shortest_paths(self, pairs):
+        """
+        Get the shortest travel-time paths for many (origin, destination) node pairs.
+
+        Pairs are grouped by origin and each group is served by one single-source search.
+        Returns the paths in the order of the input pairs, with None for unreachable pairs.
+        """
+        pairs = list(pairs)
+        destinations_by_origin = defaultdict(list)
+        for orig, dest in pairs:
+            destinations_by_origin[orig].append(dest)
+
+        paths_by_origin = {
+            orig: self.get_shortest_paths_from(orig, dests)
+            for orig, dests in destinations_by_origin.items()
+        }
+        return [paths_by_origin[orig][dest] for orig, dest in pairs]
 
     def generate_hash(self, landmark_name, path):
         """
         Generate a hash string based on directions along the path.
         The directions are based on compass bearings and segment lengths.
         """
+        if self.engine is not None:
+            return self.generate_hashes([landmark_name], [path])[0]
+
         directions = []
         prev_dir = None
         sum_length = 0
@@ -61,14 +205,7 @@ class RouteOptimizer:
             bearing = calculate_initial_compass_bearing(pointA, pointB)
 
             # Determine cardinal direction based on bearing
-            if (bearing >= 0 and bearing < 45) or (bearing >= 315 and bearing < 360):
-                dir = "N"
-            elif bearing >= 45 and bearing < 135:
-                dir = "E"
-            elif bearing >= 135 and bearing < 225:
-                dir = "S"
-            else:
-                dir = "W"
+            dir = cardinal_direction(bearing)
 
             # Calculate the distance between points
             length = haversine_distance(pointA, pointB, round_to=2) if i == len(path) - 2 else haversine_distance(pointA, pointB)
@@ -89,3 +226,85 @@ class RouteOptimizer:
         # Generate the hash string
         hash_string = f"{landmark_name}|{'|'.join(directions)}"
         return hash_string
+
+    def generate_hashes(self, landmark_names, paths):
+        """
+        Generate hash strings for many paths at once.
+
+        Directions and segment lengths come from the per-edge arrays of the array
+        engine, and runs of the same direction are merged with NumPy. The output is
+        identical to calling generate_hash on each path.
+        """
+        engine = self.engine if self.engine is not None else self._get_segment_engine()
+        directions, segment_lengths = engine.segment_arrays()
+
+        landmark_names = list(landmark_names)
+        paths = [list(path) for path in paths]
+        all_indices = engine.indices_of([node for path in paths for node in path]).tolist()
+        bounds = np.cumsum([0] + [len(path) for path in paths]).tolist()
+        indexed_paths = [all_indices[bounds[i]:bounds[i + 1]] for i in range(len(paths))]
+        counts = np.array([max(len(path) - 1, 0) for path in indexed_paths], dtype=np.int64)
+        if not counts.any():
+            return [f"{landmark_name}|" for landmark_name in landmark_names]
+
+        # All segments of all paths, back to back
+        edges = engine.edge_positions(
+            np.concatenate([path[:-1] for path in indexed_paths if len(path) > 1]),
+            np.concatenate([path[1:] for path in indexed_paths if len(path) > 1]),
+        )
+        segment_directions = directions[edges]
+        raw_lengths = segment_lengths[edges]
+
+        path_ends = np.cumsum(counts)
+        path_starts = path_ends - counts
+        last_segments = path_ends[counts > 0] - 1
+
+        # Segments are truncated to whole metres except the last one of each path,
+        # which is rounded to centimetres and added after its run is summed
+        whole_lengths = np.trunc(raw_lengths).astype(np.int64)
+        whole_lengths[last_segments] = 0
+        last_lengths = dict(zip(np.flatnonzero(counts).tolist(), raw_lengths[last_segments].tolist()))
+
+        run_starts_mask = np.ones(len(edges), dtype=bool)
+        run_starts_mask[1:] = segment_directions[1:] != segment_directions[:-1]
+        run_starts_mask[path_starts[counts > 0]] = True
+        run_starts = np.flatnonzero(run_starts_mask)
+
+        run_directions = segment_directions[run_starts].tolist()
+        run_lengths = np.add.reduceat(whole_lengths, run_starts).tolist()
+        run_bounds = np.searchsorted(run_starts, np.concatenate([path_starts, path_ends[-1:]])).tolist()
+
+        hashes = []
+        for i, landmark_name in enumerate(landmark_names):
+            lo, hi = run_bounds[i], run_bounds[i + 1]
+            parts = []
+            # A single-node path has no runs; hi - 1 would then reach into the previous path
+            if hi > lo:
+                parts = [f"{DIRECTIONS[d]}_{length:.2f}" for d, length in zip(run_directions[lo:hi - 1], run_lengths[lo:hi - 1])]
+                final_length = run_lengths[hi - 1] + round(last_lengths[i], 2)
+                parts.append(f"{DIRECTIONS[run_directions[hi - 1]]}_{final_length:.2f}")
+            hashes.append(f"{landmark_name}|{'|'.join(parts)}")
+        return hashes
+
+    def build_search_structures(self, reverse: bool = False):
+        """
+        Build the structures that routing and hashing otherwise create on first use
+        (see CSRGraph.build_search_structures), on the routing engine or, when routing
+        runs on networkx, on the array engine used for hashing.
+
+        Call it before forking workers so they share one copy of them.
+
+        Returns:
+            RouteOptimizer: self.
+        """
+        engine = self.engine if self.engine is not None else self._get_segment_engine()
+        engine.build_search_structures(reverse=reverse)
+        return self
+
+    def _get_segment_engine(self):
+        """
+        Build the array engine used for batch hashing when routing runs on networkx.
+        """
+        if self._segment_engine is None:
+            self._segment_engine = CSRGraph.from_networkx(self.G)
+        return self._segment_engine
@@ -0,0 +1,773 @@
+import math
+import sys
+from heapq import heappush, heappop
+from itertools import count
+from typing import Dict, Iterable
+
+import numpy as np
+import networkx as nx
+import osmnx as ox
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+from src.graph import PREPARED_KEY, SCC_KEY, WCC_KEY, UnreachableError, is_prepared
+from src.utils import DIRECTIONS, calculate_initial_compass_bearing, cardinal_direction, haversine_meters
+
+
+def _index_dtype(size: int):
+    """
+    Smallest integer type able to hold array positions up to size.
+    """
+    return np.int32 if size < 2**31 else np.int64
+
+
+def _attribute_array(values):
+    """
+    Pack one attribute's values into a typed array with one entry per node or edge.
+
+    Attributes whose values are all numbers (missing ones as NaN) become float64.
+    Anything else, including numeric-looking strings such as maxspeed "50" and the
+    lists OSM uses for merged ways, becomes int32 codes into a sorted array of the
+    distinct values as strings, with -1 for missing values.
+
+    Returns:
+        Tuple[np.ndarray, Optional[np.ndarray]]: The values or codes, and the categories.
+    """
+    values = list(values)
+    if all(value is None or isinstance(value, (int, float, np.number)) for value in values):
+        return np.array([np.nan if value is None else value for value in values], dtype=np.float64), None
+
+    strings = [None if value is None else str(value) for value in values]
+    categories = np.array(sorted({value for value in strings if value is not None}), dtype=str)
+    lookup = {value: code for code, value in enumerate(categories.tolist())}
+    return np.array([lookup.get(value, -1) for value in strings], dtype=np.int32), categories
+
+
+def networkx_memory_usage(G) -> int:
+    """
+    Estimate the memory held by a networkx graph: its node and adjacency dicts and
+    every attribute value in them. Geometries count their WKB size.
+    """
+    seen = set()
+
+    def size(obj):
+        if id(obj) in seen:
+            return 0
+        seen.add(id(obj))
+        total = sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            total += sum(size(key) + size(value) for key, value in obj.items())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            total += sum(size(item) for item in obj)
+        elif hasattr(obj, 'wkb'):
+            total += len(obj.wkb)
+        return total
+
+    return size(G._node) + size(G._adj) + size(G.graph)
+
+
+class CSRGraph:
+    """
+    Array-backed copy of a prepared street graph for fast routing.
+
+    Node coordinates are kept in NumPy arrays and edges in a CSR adjacency
+    (indptr/indices) with one travel_time weight per (u, v) pair. Parallel edges are
+    collapsed to their minimum travel time, which is the weight networkx uses for a
+    MultiDiGraph, and neighbors keep the graph's adjacency order, so searches expand
+    nodes in the same order and return the same paths as networkx.
+
+    Every node also carries its strongly and weakly connected component label, so
+    many unreachable pairs are rejected without searching.
+
+    Optionally, build_alt precomputes travel times from and to a few anchor nodes
+    (ALT: A*, landmarks, triangle inequality). They give exact lower bounds on the
+    travel time between any two nodes, and alt_path uses them to find shortest paths
+    while expanding far fewer nodes than Dijkstra. It is still 2-3x slower than
+    astar_path, whose great-circle heuristic is not a lower bound and steers the
+    search almost straight to the target at the cost of exactness.
+    """
+    # Version of the on-disk layout written by save
+    FORMAT_VERSION = 2
+    # Stand-in for an infinite anchor distance in the ALT bounds, so that
+    # unreachable - unreachable cancels to 0 instead of NaN
+    ALT_UNREACHABLE = 1e15
+
+    def __init__(self, node_ids, x, y, indptr, indices, travel_time, length, crs="epsg:4326", scc=None, wcc=None,
+                 node_data=None, edge_data=None):
+        self.node_ids = np.asarray(node_ids)
+        index_dtype = _index_dtype(len(self.node_ids))
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=index_dtype)
+        self.travel_time = np.asarray(travel_time, dtype=np.float64)
+        self.length = np.asarray(length, dtype=np.float64)
+        self.crs = crs
+        self._scc = None if scc is None else np.asarray(scc, dtype=index_dtype)
+        self._wcc = None if wcc is None else np.asarray(wcc, dtype=index_dtype)
+        # Whitelisted extra attributes: name -> (values or codes, categories or None)
+        self.node_data = dict(node_data or {})
+        self.edge_data = dict(edge_data or {})
+
+        # OSM node id -> array index through a sorted copy of the ids, which takes a
+        # fraction of the memory of a dict and is shared by forked workers untouched
+        self._id_order = np.argsort(self.node_ids, kind='stable').astype(index_dtype)
+        self._sorted_ids = self.node_ids[self._id_order]
+        self._radians = None
+        self._reverse = None
+        self._segments = None
+        self._edge_keys = None
+        self.alt_anchors = None
+        self.alt_from = None
+        self.alt_to = None
+        self._alt_rows = None
+
+    @classmethod
+    def from_networkx(cls, G, weight='travel_time', node_attributes: Iterable[str] = (),
+                      edge_attributes: Iterable[str] = ()):
+        """
+        Build the array representation of a prepared networkx graph.
+
+        Only coordinates, component labels, travel times, lengths and the topology are
+        kept. Other OSM attributes are dropped unless whitelisted in node_attributes or
+        edge_attributes, in which case they are stored as typed arrays (see
+        _attribute_array); edge attributes come from the same cheapest parallel edge
+        as the travel time.
+        """
+        if not is_prepared(G):
+            raise ValueError("Graph is not prepared for routing; call src.graph.prepare_graph(G) first.")
+
+        nodes = list(G.nodes)
+        node_index = {node: i for i, node in enumerate(nodes)}
+        x = np.array([G.nodes[node]['x'] for node in nodes], dtype=np.float64)
+        y = np.array([G.nodes[node]['y'] for node in nodes], dtype=np.float64)
+        # Reuse the labels from prepare_graph; graphs prepared without them are labelled lazily
+        labels = {}
+        for key in (SCC_KEY, WCC_KEY):
+            if all(key in G.nodes[node] for node in nodes):
+                labels[key] = [G.nodes[node][key] for node in nodes]
+
+        edge_attributes = list(edge_attributes)
+        indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        indices, travel_time, length = [], [], []
+        edge_values = {name: [] for name in edge_attributes}
+        for i, node in enumerate(nodes):
+            for neighbor, edges in G._adj[node].items():
+                # Same weight networkx uses for a multigraph: the cheapest parallel edge
+                best = min(edges.values(), key=lambda attr: attr.get(weight, 1))
+                indices.append(node_index[neighbor])
+                travel_time.append(best.get(weight, 1))
+                length.append(best.get('length', np.nan))
+                for name in edge_attributes:
+                    edge_values[name].append(best.get(name))
+            indptr[i + 1] = len(indices)
+
+        return cls(
+            nodes, x, y, indptr, indices, travel_time, length, crs=G.graph.get('crs', "epsg:4326"),
+            scc=labels.get(SCC_KEY), wcc=labels.get(WCC_KEY),
+            node_data={name: _attribute_array([G.nodes[node].get(name) for node in nodes]) for name in node_attributes},
+            edge_data={name: _attribute_array(values) for name, values in edge_values.items()},
+        )
+
+    def save(self, path) -> None:
+        """
+        Save the arrays, including the per-edge hash segments and any ALT anchor
+        distances, to an uncompressed .npz file.
+        """
+        directions, segment_lengths = self.segment_arrays()
+        extra = {}
+        if self.has_alt:
+            extra.update(alt_anchors=self.alt_anchors, alt_from=self.alt_from, alt_to=self.alt_to)
+        for prefix, data in (("node_attr", self.node_data), ("edge_attr", self.edge_data)):
+            for name, (values, categories) in data.items():
+                extra[f"{prefix}:{name}"] = values
+                if categories is not None:
+                    extra[f"{prefix}_categories:{name}"] = categories
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                version=np.array(self.FORMAT_VERSION),
+                crs=np.array(str(self.crs)),
+                node_ids=self.node_ids,
+                x=self.x,
+                y=self.y,
+                indptr=self.indptr,
+                indices=self.indices,
+                travel_time=self.travel_time,
+                length=self.length,
+                scc=self.scc,
+                wcc=self.wcc,
+                directions=directions,
+                segment_lengths=segment_lengths,
+                **extra,
+            )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load arrays written by save.
+        """
+        with np.load(path) as data:
+            if int(data['version']) != cls.FORMAT_VERSION:
+                raise ValueError(f"Unsupported graph file version {int(data['version'])} in {path}")
+            attributes = {"node_attr": {}, "edge_attr": {}}
+            for key in data.files:
+                prefix, _, name = key.partition(":")
+                if prefix in attributes:
+                    categories = data[f"{prefix}_categories:{name}"] if f"{prefix}_categories:{name}" in data.files else None
+                    attributes[prefix][name] = (data[key], categories)
+            graph = cls(
+                data['node_ids'], data['x'], data['y'], data['indptr'], data['indices'],
+                data['travel_time'], data['length'], crs=str(data['crs']),
+                scc=data['scc'], wcc=data['wcc'],
+                node_data=attributes["node_attr"], edge_data=attributes["edge_attr"],
+            )
+            graph._segments = (data['directions'], data['segment_lengths'])
+            if 'alt_anchors' in data.files:
+                graph.alt_anchors, graph.alt_from, graph.alt_to = data['alt_anchors'], data['alt_from'], data['alt_to']
+        return graph
+
+    def to_networkx(self):
+        """
+        Rebuild a prepared, frozen MultiDiGraph holding only coordinates, component
+        labels, length and travel_time, for code that still needs networkx. Parallel
+        edges have already been collapsed to the cheapest one.
+        """
+        G = nx.MultiDiGraph(crs=self.crs)
+        G.add_nodes_from(
+            (node, {'x': x, 'y': y, SCC_KEY: scc, WCC_KEY: wcc})
+            for node, x, y, scc, wcc in zip(
+                self.node_ids.tolist(), self.x.tolist(), self.y.tolist(), self.scc.tolist(), self.wcc.tolist()
+            )
+        )
+        node_ids = self.node_ids.tolist()
+        G.add_edges_from(
+            (node_ids[u], node_ids[v], {'length': length, 'travel_time': travel_time})
+            for u, v, length, travel_time in zip(
+                self.edge_sources().tolist(), self.indices.tolist(), self.length.tolist(), self.travel_time.tolist()
+            )
+        )
+        G.graph[PREPARED_KEY] = True
+        return nx.freeze(G)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.indices)
+
+    def _component_labels(self, connection: str) -> np.ndarray:
+        """
+        Compute connected component labels from the CSR arrays.
+        """
+        matrix = csr_matrix(
+            (np.ones(self.num_edges, dtype=np.int8), self.indices, self.indptr), shape=(self.num_nodes, self.num_nodes)
+        )
+        _, labels = connected_components(matrix, directed=True, connection=connection)
+        return labels.astype(np.int64)
+
+    @property
+    def scc(self) -> np.ndarray:
+        """
+        Strongly connected component label of every node.
+        """
+        if self._scc is None:
+            self._scc = self._component_labels('strong')
+        return self._scc
+
+    @property
+    def wcc(self) -> np.ndarray:
+        """
+        Weakly connected component label of every node.
+        """
+        if self._wcc is None:
+            self._wcc = self._component_labels('weak')
+        return self._wcc
+
+    def can_reach(self, source: int, target: int):
+        """
+        Decide in constant time whether target can be reached from source.
+
+        Returns True for nodes in the same strongly connected component, False for
+        nodes in different weakly connected components and None when only a search
+        can tell.
+        """
+        if self.scc[source] == self.scc[target]:
+            return True
+        if self.wcc[source] != self.wcc[target]:
+            return False
+        return None
+
+    def index_of(self, node) -> int:
+        """
+        Return the array index of an OSM node id.
+        """
+        position = int(np.searchsorted(self._sorted_ids, node))
+        if position == self.num_nodes or self._sorted_ids[position] != node:
+            raise nx.NodeNotFound(f"Node {node} is not in the graph")
+        return int(self._id_order[position])
+
+    def indices_of(self, nodes) -> np.ndarray:
+        """
+        Return the array indices of many OSM node ids in one vectorized lookup.
+        """
+        nodes = np.asarray(nodes, dtype=self.node_ids.dtype)
+        positions = np.minimum(np.searchsorted(self._sorted_ids, nodes), max(self.num_nodes - 1, 0))
+        missing = self._sorted_ids[positions] != nodes if self.num_nodes else np.ones(len(nodes), dtype=bool)
+        if missing.any():
+            raise nx.NodeNotFound(f"Node {nodes[missing][0]} is not in the graph")
+        return self._id_order[positions].astype(np.int64)
+
+    def path_travel_time(self, path) -> float:
+        """
+        Total travel time along a path of array indices, summed edge by edge.
+        """
+        if len(path) < 2:
+            return 0
+        return sum(self.travel_time[self.edge_positions(path[:-1], path[1:])].tolist())
+
+    def _edge_arrays(self) -> Dict[str, tuple]:
+        """
+        The arrays describing the edges, which a reversed graph does not share.
+        """
+        arrays = {"indptr": (self.indptr,), "indices": (self.indices,), "travel_time": (self.travel_time,),
+                  "length": (self.length,)}
+        for name, (values, categories) in self.edge_data.items():
+            arrays[f"edge_attr:{name}"] = (values,) if categories is None else (values, categories)
+        if self._edge_keys is not None:
+            arrays["edge_keys"] = self._edge_keys
+        return arrays
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Bytes held by the graph, per array, with the total under "total".
+
+        Structures built lazily for searching and hashing (heuristic coordinates,
+        ALT rows, edge lookup keys, hash segments and the cached reverse graph) are
+        included once built, so the total is what a worker holds after routing.
+        """
+        arrays = {
+            "node_ids": (self.node_ids,), "x": (self.x,), "y": (self.y,), "scc": (self.scc,), "wcc": (self.wcc,),
+            "node_id_index": (self._id_order, self._sorted_ids),
+            **self._edge_arrays(),
+        }
+        for name, (values, categories) in self.node_data.items():
+            arrays[f"node_attr:{name}"] = (values,) if categories is None else (values, categories)
+        if self._radians is not None:
+            arrays["radians"] = self._radians
+        if self._segments is not None:
+            arrays["segments"] = self._segments
+        if self.has_alt:
+            arrays["alt"] = (self.alt_anchors, self.alt_from, self.alt_to)
+        if self._alt_rows is not None:
+            arrays["alt_rows"] = self._alt_rows
+        if self._reverse is not None:
+            # The reverse graph shares the node arrays and only adds its own edges
+            arrays["reverse"] = tuple(array for value in self._reverse._edge_arrays().values() for array in value)
+
+        usage = {name: sum(array.nbytes for array in value) for name, value in arrays.items()}
+        usage["total"] = sum(usage.values())
+        return usage
+
+    def to_node_ids(self, path):
+        """
+        Convert a path of array indices back to OSM node ids.
+        """
+        return self.node_ids[path].tolist()
+
+    def search_arrays(self):
+        """
+        Memoryviews of indptr, indices and travel_time for the search loops.
+
+        Indexing a memoryview yields plain Python numbers without copying the arrays,
+        so every search runs on the CSR arrays themselves and forked workers keep
+        sharing them instead of each building its own Python adjacency lists.
+        """
+        return memoryview(self.indptr), memoryview(self.indices), memoryview(self.travel_time)
+
+    def radians(self):
+        """
+        Node latitudes and longitudes in radians and the cosine of each latitude, as
+        memoryviews of arrays built once for the A* heuristic.
+        """
+        if self._radians is None:
+            # Same scalar math as before, so the heuristic and thus the paths are unchanged
+            y_rad = [math.radians(value) for value in self.y.tolist()]
+            x_rad = [math.radians(value) for value in self.x.tolist()]
+            self._radians = tuple(np.array(values) for values in (y_rad, x_rad, [math.cos(value) for value in y_rad]))
+        return tuple(memoryview(array) for array in self._radians)
+
+    def edge_sources(self) -> np.ndarray:
+        """
+        Source node index of every edge, aligned with indices.
+        """
+        return np.repeat(np.arange(self.num_nodes, dtype=np.int64), np.diff(self.indptr))
+
+    def segment_arrays(self):
+        """
+        Per-edge cardinal direction code (an index into src.utils.DIRECTIONS) and
+        unrounded great-circle length in metres, computed once for route hashing.
+
+        The values come from the same scalar functions RouteOptimizer.generate_hash
+        uses, so hashes built from these arrays are byte-identical to it.
+        """
+        if self._segments is None:
+            ys, xs = self.y.tolist(), self.x.tolist()
+            direction_codes, lengths = [], []
+            for u, v in zip(self.edge_sources().tolist(), self.indices.tolist()):
+                pointA, pointB = (ys[u], xs[u]), (ys[v], xs[v])
+                bearing = calculate_initial_compass_bearing(pointA, pointB)
+                direction_codes.append(DIRECTIONS.index(cardinal_direction(bearing)))
+                lengths.append(haversine_meters(pointA, pointB))
+            self._segments = (np.array(direction_codes, dtype=np.uint8), np.array(lengths, dtype=np.float64))
+        return self._segments
+
+    def _edge_lookup(self):
+        """
+        Sorted source * num_nodes + target keys of all edges and their edge positions, built once.
+        """
+        if self._edge_keys is None:
+            keys = self.edge_sources() * self.num_nodes + self.indices
+            order = np.argsort(keys, kind='stable')
+            self._edge_keys = (keys[order], order)
+        return self._edge_keys
+
+    def build_search_structures(self, reverse: bool = True):
+        """
+        Build the structures otherwise created on first use: heuristic coordinates,
+        edge lookup keys, hash segments, ALT rows and, optionally, the reverse graph.
+
+        Calling this in a parent process before forking lets the workers share them
+        through copy-on-write memory instead of each building its own copy.
+
+        Returns:
+            CSRGraph: self.
+        """
+        self.radians()
+        self._edge_lookup()
+        self.segment_arrays()
+        if self.has_alt:
+            self._alt_node_rows()
+        if reverse:
+            self.reverse()
+        return self
+
+    def edge_positions(self, sources, targets) -> np.ndarray:
+        """
+        Look up the edge positions of many (source, target) index pairs at once.
+        """
+        sorted_keys, order = self._edge_lookup()
+
+        query = np.asarray(sources, dtype=np.int64) * self.num_nodes + np.asarray(targets, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(sorted_keys, query), len(sorted_keys) - 1)
+        if len(query) and not np.array_equal(sorted_keys[positions], query):
+            raise ValueError("Path contains consecutive nodes that are not joined by an edge.")
+        return order[positions]
+
+    def reverse(self):
+        """
+        Return the graph with every edge reversed, built once and cached.
+        Incoming edges of each node are ordered by their source index.
+        """
+        if self._reverse is None:
+            sources = self.edge_sources()
+            order = np.argsort(self.indices, kind='stable')
+            indptr = np.zeros(self.num_nodes + 1, dtype=np.int64)
+            indptr[1:] = np.cumsum(np.bincount(self.indices, minlength=self.num_nodes))
+            self._reverse = CSRGraph(
+                self.node_ids, self.x, self.y, indptr, sources[order],
+                self.travel_time[order], self.length[order], crs=self.crs,
+                scc=self.scc, wcc=self.wcc, node_data=self.node_data,
+                edge_data={name: (values[order], categories) for name, (values, categories) in self.edge_data.items()},
+            )
+            self._reverse._id_order, self._reverse._sorted_ids = self._id_order, self._sorted_ids
+            self._reverse._reverse = self
+        return self._reverse
+
+    def astar_path(self, source: int, target: int):
+        """
+        A* over array indices using the great-circle heuristic of src.route_optimizer.
+
+        Mirrors networkx.astar_path step for step, including its tie-breaking, and
+        returns a list of array indices. Raises UnreachableError without searching
+        when the nodes lie in different weakly connected components.
+        """
+        if self.can_reach(source, target) is False:
+            raise UnreachableError(
+                f"Node {self.node_ids[target]} is in a different component than {self.node_ids[source]}"
+            )
+
+        indptr, indices, weights = self.search_arrays()
+        y_rad, x_rad, cos_y = self.radians()
+        target_y, target_x, target_cos_y = y_rad[target], x_rad[target], cos_y[target]
+        earth_radius = ox.distance.EARTH_RADIUS_M
+
+        def heuristic(node):
+            # Same haversine formula as osmnx.distance.great_circle_vec, in scalar math
+            h = (math.sin((target_y - y_rad[node]) / 2) ** 2
+                 + cos_y[node] * target_cos_y * math.sin((target_x - x_rad[node]) / 2) ** 2)
+            return 2 * math.asin(math.sqrt(min(1, h))) * earth_radius
+
+        c = count()
+        queue = [(0, next(c), source, 0, -1)]
+        enqueued = {}
+        explored = {}
+
+        while queue:
+            _, __, node, dist, parent = heappop(queue)
+
+            if node == target:
+                path = [node]
+                node = parent
+                while node != -1:
+                    path.append(node)
+                    node = explored[node]
+                path.reverse()
+                return path
+
+            if node in explored:
+                # Do not override the parent of the starting node
+                if explored[node] == -1:
+                    continue
+                # Skip stale entries enqueued before a better path was found
+                qcost, _ = enqueued[node]
+                if qcost < dist:
+                    continue
+
+            explored[node] = parent
+
+            for position in range(indptr[node], indptr[node + 1]):
+                neighbor = indices[position]
+                ncost = dist + weights[position]
+                if neighbor in enqueued:
+                    qcost, h = enqueued[neighbor]
+                    if qcost <= ncost:
+                        continue
+                else:
+                    h = heuristic(neighbor)
+                enqueued[neighbor] = ncost, h
+                heappush(queue, (ncost + h, next(c), neighbor, ncost, node))
+
+        raise nx.NetworkXNoPath(f"Node {self.node_ids[target]} not reachable from {self.node_ids[source]}")
+
+    @property
+    def has_alt(self) -> bool:
+        """
+        Whether ALT anchor distances are available for alt_path.
+        """
+        return self.alt_anchors is not None
+
+    def build_alt(self, num_anchors: int = 8, seed: int = 0):
+        """
+        Precompute the ALT anchor distances used by alt_path.
+
+        Anchors are picked by farthest-point selection inside the largest strongly
+        connected component, so they lie on the edges of the network and every node
+        of that component both reaches and is reached by all of them. Each anchor
+        costs one forward and one backward Dijkstra search.
+
+        Args:
+            num_anchors (int): Number of anchor nodes.
+            seed (int): Seed for the choice of the first anchor.
+
+        Returns:
+            CSRGraph: self, with alt_anchors, alt_from and alt_to set.
+        """
+        largest = np.bincount(self.scc).argmax()
+        candidates = np.flatnonzero(self.scc == largest)
+        num_anchors = min(num_anchors, len(candidates))
+        rng = np.random.default_rng(seed)
+
+        # Start from the node farthest from a random one, then repeatedly add the
+        # node farthest from all anchors chosen so far
+        start, _ = self.shortest_path_tree(int(rng.choice(candidates)))
+        next_anchor = int(candidates[np.argmax(start[candidates])])
+        anchors, from_anchor, to_anchor = [], [], []
+        closest = np.full(len(candidates), np.inf)
+        for _ in range(num_anchors):
+            anchors.append(next_anchor)
+            forward, _ = self.shortest_path_tree(next_anchor)
+            backward, _ = self.reverse().shortest_path_tree(next_anchor)
+            from_anchor.append(forward)
+            to_anchor.append(backward)
+            closest = np.minimum(closest, forward[candidates])
+            next_anchor = int(candidates[np.argmax(closest)])
+
+        self.alt_anchors = np.array(anchors, dtype=np.int64)
+        self.alt_from = np.vstack(from_anchor)
+        self.alt_to = np.vstack(to_anchor)
+        self._alt_rows = None
+        return self
+
+    def drop_alt(self):
+        """
+        Forget the ALT anchor distances, e.g. ones loaded with a cached graph but not asked for.
+
+        Returns:
+            CSRGraph: self, without ALT anchors.
+        """
+        self.alt_anchors = self.alt_from = self.alt_to = None
+        self._alt_rows = None
+        return self
+
+    def _alt_node_rows(self):
+        """
+        Distances from and to every anchor laid out node by node (the distance of
+        node v and anchor i at v * anchors + i), built once for the ALT bounds with
+        infinities replaced by ALT_UNREACHABLE, as memoryviews.
+        """
+        if self._alt_rows is None:
+            self._alt_rows = tuple(
+                np.ascontiguousarray(np.minimum(distances, self.ALT_UNREACHABLE).T).ravel()
+                for distances in (self.alt_from, self.alt_to)
+            )
+        return tuple(memoryview(rows) for rows in self._alt_rows)
+
+    def _active_anchors(self, source: int, target: int, active_anchors: int):
+        """
+        Indices of the anchors whose bounds on d(source, target) are largest.
+        """
+        from_anchor, to_anchor = self._alt_node_rows()
+        k = len(self.alt_anchors)
+        bounds = [
+            max(from_anchor[target * k + i] - from_anchor[source * k + i],
+                to_anchor[source * k + i] - to_anchor[target * k + i])
+            for i in range(k)
+        ]
+        return sorted(range(len(bounds)), key=lambda i: -bounds[i])[:active_anchors]
+
+    def alt_path(self, source: int, target: int, active_anchors: int = 4):
+        """
+        Exact shortest travel-time path by A* with ALT lower bounds.
+
+        For every anchor L, d(L, t) - d(L, v) and d(v, L) - d(t, L) are lower bounds on
+        d(v, t) by the triangle inequality, and their maximum is a consistent heuristic,
+        so the returned path has the same travel time as a Dijkstra search. Among
+        several equally short paths it may pick a different one. A bound that involves
+        an anchor reachable from v but not from t proves t unreachable from v, so such
+        nodes are never enqueued. Any subset of the anchors still gives a consistent
+        heuristic, so only the active_anchors best ones for this pair are evaluated.
+        Requires build_alt.
+        """
+        if not self.has_alt:
+            raise ValueError("No ALT anchor distances; call build_alt first.")
+        if self.can_reach(source, target) is False:
+            raise UnreachableError(
+                f"Node {self.node_ids[target]} is in a different component than {self.node_ids[source]}"
+            )
+
+        indptr, indices, weights = self.search_arrays()
+        from_anchor, to_anchor = self._alt_node_rows()
+        k = len(self.alt_anchors)
+        cutoff = self.ALT_UNREACHABLE / 2
+
+        # Only the anchors giving the tightest bounds at the source are consulted
+        active = self._active_anchors(source, target, active_anchors)
+        target_from = [(i, from_anchor[target * k + i]) for i in active]
+        target_to = [(i, to_anchor[target * k + i]) for i in active]
+
+        def heuristic(node):
+            bound = 0.0
+            row = node * k
+            for i, anchor_to_target in target_from:
+                if anchor_to_target - from_anchor[row + i] > bound:
+                    bound = anchor_to_target - from_anchor[row + i]
+            for i, target_to_anchor in target_to:
+                if to_anchor[row + i] - target_to_anchor > bound:
+                    bound = to_anchor[row + i] - target_to_anchor
+            return bound
+
+        c = count()
+        queue = [(heuristic(source), next(c), source, 0, -1)]
+        enqueued = {}
+        explored = {}
+
+        while queue:
+            _, __, node, dist, parent = heappop(queue)
+
+            if node == target:
+                path = [node]
+                node = parent
+                while node != -1:
+                    path.append(node)
+                    node = explored[node]
+                path.reverse()
+                return path
+
+            if node in explored:
+                continue
+            explored[node] = parent
+
+            for position in range(indptr[node], indptr[node + 1]):
+                neighbor = indices[position]
+                if neighbor in explored:
+                    continue
+                ncost = dist + weights[position]
+                if neighbor in enqueued:
+                    qcost, h = enqueued[neighbor]
+                    if qcost <= ncost:
+                        continue
+                else:
+                    h = heuristic(neighbor)
+                    if h >= cutoff:
+                        continue
+                enqueued[neighbor] = ncost, h
+                heappush(queue, (ncost + h, next(c), neighbor, ncost, node))
+
+        raise nx.NetworkXNoPath(f"Node {self.node_ids[target]} not reachable from {self.node_ids[source]}")
+
+    def shortest_path_tree(self, source: int):
+        """
+        Single-source Dijkstra over array indices.
+
+        Mirrors networkx's Dijkstra, so the tree holds the same paths nx.dijkstra_path
+        returns. Returns the distance and predecessor arrays; unreachable nodes have an
+        infinite distance and a predecessor of -1.
+        """
+        indptr, indices, weights = self.search_arrays()
+        dist = {}
+        seen = {source: 0}
+        predecessors = np.full(self.num_nodes, -1, dtype=np.int64)
+        pred = {}
+
+        c = count()
+        fringe = [(0, next(c), source)]
+        while fringe:
+            d, _, node = heappop(fringe)
+            if node in dist:
+                continue
+            dist[node] = d
+            for position in range(indptr[node], indptr[node + 1]):
+                neighbor = indices[position]
+                nd = d + weights[position]
+                if neighbor in dist:
+                    continue
+                if neighbor not in seen or nd < seen[neighbor]:
+                    seen[neighbor] = nd
+                    pred[neighbor] = node
+                    heappush(fringe, (nd, next(c), neighbor))
+
+        distances = np.full(self.num_nodes, np.inf)
+        if dist:
+            reached = np.fromiter(dist.keys(), dtype=np.int64, count=len(dist))
+            distances[reached] = np.fromiter(dist.values(), dtype=np.float64, count=len(dist))
+        if pred:
+            predecessors[np.fromiter(pred.keys(), dtype=np.int64, count=len(pred))] = np.fromiter(
+                pred.values(), dtype=np.int64, count=len(pred)
+            )
+        return distances, predecessors
+
+    @staticmethod
+    def path_from_tree(predecessors, source: int, target: int):
+        """
+        Read the path from source to target out of a predecessor array, or None.
+        """
+        if target != source and predecessors[target] == -1:
+            return None
+        path = [target]
+        while path[-1] != source:
+            path.append(int(predecessors[path[-1]]))
+        path.reverse()
+        return path
@@ -1,16 +1,251 @@
 import h3
+import time
+from collections import defaultdict, OrderedDict
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 from sklearn.cluster import DBSCAN
+from sklearn.metrics import adjusted_rand_score
 import numpy as np
-from typing import List, Dict
+import pandas as pd
+from typing import List, Dict, Iterable, Optional, Tuple
+
+from src import instrumentation
+
+# Constants
+EARTH_RADIUS = 6371008.8  # metres
+CLUSTERING_BACKENDS = ("dbscan", "grid")
+# Area of a circle of radius eps over that of the 3x3 cells of diagonal eps around a point
+DENSITY_SCALE = np.pi / 4.5
+
+
+def project_to_meters(lats, lons) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Project coordinates onto a local equirectangular plane in metres, centred on
+    their mean. Distortion stays negligible over the extent of a city.
+    """
+    lats = np.radians(np.asarray(lats, dtype=float))
+    lons = np.radians(np.asarray(lons, dtype=float))
+    if len(lats) == 0:
+        return lats, lons
+    lat0 = lats.mean()
+    return EARTH_RADIUS * (lons - lons.mean()) * np.cos(lat0), EARTH_RADIUS * (lats - lat0)
+
+
+def grid_clusters(x: np.ndarray, y: np.ndarray, eps: float, min_samples: int) -> np.ndarray:
+    """
+    Density clusters of planar points on a grid, in time linear in the number of points.
+
+    The points are binned into square cells with a diagonal of eps. A cell is
+    dense when it holds min_samples points, which makes all of them DBSCAN core
+    points, or when its 3x3 block of cells, scaled to the area of a circle of
+    radius eps, does. Neighbouring dense cells form one cluster, and the points of
+    a sparse cell join the cluster of its most populated dense neighbour or are
+    noise. This approximates DBSCAN with the same eps and min_samples; see
+    compare_clustering_backends for how closely.
+
+    Args:
+        x, y (np.ndarray): Coordinates in metres (see project_to_meters).
+        eps (float): Neighbourhood radius in metres.
+        min_samples (int): Points a cell needs to be dense.
+
+    Returns:
+        np.ndarray: A cluster id per point, numbered from 0 in order of each
+        cluster's first point, and -1 for noise.
+    """
+    n = len(x)
+    labels = np.full(n, -1, dtype=np.int64)
+    if n == 0:
+        return labels
+
+    side = eps / np.sqrt(2)
+    columns = np.floor((x - x.min()) / side).astype(np.int64)
+    rows = np.floor((y - y.min()) / side).astype(np.int64)
+    # One code per cell, with a margin so neighbouring codes never wrap to another column
+    width = rows.max() + 3
+    cells, cell_of, counts = np.unique((columns + 1) * width + rows + 1, return_inverse=True, return_counts=True)
+
+    # Pairs of occupied neighbouring cells, each pair once
+    sources, targets = [], []
+    for dx, dy in ((0, 1), (1, -1), (1, 0), (1, 1)):
+        neighbours = cells + dx * width + dy
+        found = np.minimum(np.searchsorted(cells, neighbours), len(cells) - 1)
+        occupied = cells[found] == neighbours
+        sources.append(np.flatnonzero(occupied))
+        targets.append(found[occupied])
+    sources, targets = np.concatenate(sources), np.concatenate(targets)
+
+    block = (counts + np.bincount(sources, weights=counts[targets], minlength=len(cells))
+             + np.bincount(targets, weights=counts[sources], minlength=len(cells)))
+    dense = (counts >= min_samples) | (block * DENSITY_SCALE >= min_samples)
+
+    cell_labels = np.full(len(cells), -1, dtype=np.int64)
+    linked = dense[sources] & dense[targets]
+    graph = coo_matrix((np.ones(linked.sum(), dtype=np.int8), (sources[linked], targets[linked])),
+                       shape=(len(cells), len(cells)))
+    _, components = connected_components(graph, directed=False)
+    cell_labels[dense] = components[dense]
+
+    # Sparse cells join their most populated dense neighbour
+    sparse_cells = np.concatenate([sources[~dense[sources] & dense[targets]], targets[dense[sources] & ~dense[targets]]])
+    dense_cells = np.concatenate([targets[~dense[sources] & dense[targets]], sources[dense[sources] & ~dense[targets]]])
+    order = np.lexsort((-counts[dense_cells], sparse_cells))
+    sparse_cells, first = np.unique(sparse_cells[order], return_index=True)
+    cell_labels[sparse_cells] = cell_labels[dense_cells[order][first]]
+
+    labels = cell_labels[cell_of.ravel()]
+    clustered = np.flatnonzero(labels >= 0)
+    if len(clustered):
+        _, first, inverse = np.unique(labels[clustered], return_index=True, return_inverse=True)
+        labels[clustered] = np.argsort(np.argsort(first))[inverse]
+    return labels
+
+
+class LandmarkIndex:
+    """
+    Index of landmarks keyed by their H3 cell at a fixed resolution.
+
+    The index keeps a reference to the landmark list it was built from, so it
+    can tell whether it is still valid for a later call with the same list.
+    Validity is checked by identity and length only, so the list and its landmark
+    dicts must not be modified in place while the index is in use: an edited
+    coordinate or a replaced item goes unnoticed. Pass a new list instead.
+    """
+    def __init__(self, landmarks: List[Dict], hex_resolution: int):
+        self.landmarks = landmarks
+        self.hex_resolution = hex_resolution
+        self.size = len(landmarks)
+
+        # Positions of the landmarks in each cell, in the original list order
+        self.cells = defaultdict(list)
+        for position, landmark in enumerate(landmarks):
+            cell = h3.geo_to_h3(landmark['lat'], landmark['lon'], hex_resolution)
+            self.cells[cell].append(position)
+
+    def is_valid_for(self, landmarks: List[Dict], hex_resolution: int) -> bool:
+        """
+        Check whether the index was built from this landmark list and resolution.
+
+        The check is by identity and length, not content; see the class docstring.
+        """
+        return (
+            landmarks is self.landmarks
+            and len(landmarks) == self.size
+            and hex_resolution == self.hex_resolution
+        )
+
+    def query_positions(self, hexagons: Iterable[str]) -> List[int]:
+        """
+        Return the list positions of the landmarks located in any of the given hexagons, in ascending order.
+        """
+        positions = []
+        for cell in hexagons:
+            positions.extend(self.cells.get(cell, ()))
+        positions.sort()
+        return positions
+
+    def query(self, hexagons: Iterable[str]) -> List[Dict]:
+        """
+        Return the landmarks located in any of the given hexagons, in their original order.
+        """
+        return [self.landmarks[i] for i in self.query_positions(hexagons)]
+
+
+class LandmarkClusters:
+    """
+    Density clusters of a whole landmark list, computed once with grid_clusters on
+    coordinates projected to metres.
+
+    Like LandmarkIndex, it keeps a reference to the landmark list it was built from
+    and the list must not be modified in place while the clusters are in use.
+    """
+    def __init__(self, landmarks: List[Dict], eps_meters: float, min_samples: int):
+        self.landmarks = landmarks
+        self.eps_meters = eps_meters
+        self.min_samples = min_samples
+        self.size = len(landmarks)
+
+        x, y = project_to_meters([landmark['lat'] for landmark in landmarks],
+                                 [landmark['lon'] for landmark in landmarks])
+        self.labels = grid_clusters(x, y, eps_meters, min_samples)
+        # Number of landmarks in each cluster, indexed by cluster id
+        self.sizes = np.bincount(self.labels[self.labels >= 0])
+
+    def is_valid_for(self, landmarks: List[Dict], eps_meters: float, min_samples: int) -> bool:
+        """
+        Check whether the clusters were computed from this landmark list and parameters.
+
+        The check is by identity and length, not content; see LandmarkIndex.
+        """
+        return (
+            landmarks is self.landmarks
+            and len(landmarks) == self.size
+            and eps_meters == self.eps_meters
+            and min_samples == self.min_samples
+        )
+
 
 class LandmarkPriority:
-    def __init__(self, hex_resolution=7, eps=0.005, min_samples=5, priority_order=None):
+    """
+    Selects the landmark that describes the neighbourhood of a location.
+
+    The candidates are the landmarks in the location's H3 cell and its neighbours;
+    the pick comes from their largest density cluster. With backend "dbscan", the
+    candidates of every cell are clustered with DBSCAN on raw degrees (eps). With
+    backend "grid", the whole landmark list is clustered once in metres
+    (eps_meters, see grid_clusters) and clusters are ranked by their total size.
+    """
+    def __init__(self, hex_resolution=7, eps=0.005, min_samples=5, priority_order=None, cache_size=4096,
+                 backend="dbscan", eps_meters=500.0):
+        if backend not in CLUSTERING_BACKENDS:
+            raise ValueError(f"Unknown clustering backend {backend!r}; expected one of {CLUSTERING_BACKENDS}.")
         self.hex_resolution = hex_resolution
         self.eps = eps
         self.min_samples = min_samples
+        self.backend = backend
+        self.eps_meters = eps_meters
         self.priority_order = priority_order if priority_order else [
             "temple", "tourist_spot", "bus_stop", "government_building", "market", "school"
         ]
+        self.cache_size = cache_size
+        self._landmark_index = None
+        self._landmark_clusters = None
+
+        # Least-recently-used cache of selected landmarks keyed by H3 cell
+        self._cell_cache = OrderedDict()
+        self._cell_cache_params = None
+
+    def get_landmark_index(self, landmarks: List[Dict]) -> LandmarkIndex:
+        """
+        Return the H3 index for the given landmarks, rebuilding it only when a
+        different landmark list or hex resolution is passed than in the last call.
+
+        Edits made in place to the same list are not detected (see LandmarkIndex);
+        pass a new list, or call clear_cache, after changing landmarks.
+        """
+        if self._landmark_index is None or not self._landmark_index.is_valid_for(landmarks, self.hex_resolution):
+            self._landmark_index = LandmarkIndex(landmarks, self.hex_resolution)
+            self._cell_cache.clear()
+        return self._landmark_index
+
+    def get_landmark_clusters(self, landmarks: List[Dict]) -> LandmarkClusters:
+        """
+        Return the whole-set clusters of the given landmarks, recomputing them only
+        when the landmark list or the clustering parameters have changed.
+        """
+        clusters = self._landmark_clusters
+        if clusters is None or not clusters.is_valid_for(landmarks, self.eps_meters, self.min_samples):
+            with instrumentation.timer("landmark_clustering"):
+                clusters = self._landmark_clusters = LandmarkClusters(landmarks, self.eps_meters, self.min_samples)
+        return clusters
+
+    def clear_cache(self) -> None:
+        """
+        Drop all cached per-cell selections and the landmark index and clusters, so
+        they are rebuilt on the next call, e.g. after the landmark list was edited in place.
+        """
+        self._cell_cache.clear()
+        self._landmark_index = None
+        self._landmark_clusters = None
 
     def get_hexagons(self, lat: float, lon: float) -> List[str]:
         """
@@ -27,11 +262,16 @@ class LandmarkPriority:
         clustering = DBSCAN(eps=self.eps, min_samples=self.min_samples).fit(coords)
         return clustering.labels_
 
-    def rank_clusters(self, labels: np.ndarray) -> List[tuple]:
+    def rank_clusters(self, labels: np.ndarray, cluster_sizes: Optional[np.ndarray] = None) -> List[tuple]:
         """
         Rank clusters by size, prioritizing larger clusters.
+
+        By default a cluster's size is its number of labels. With cluster_sizes
+        (indexed by cluster id), whole-set sizes are used instead and noise ranks last.
         """
         unique, counts = np.unique(labels, return_counts=True)
+        if cluster_sizes is not None:
+            counts = [cluster_sizes[label] if label >= 0 else 0 for label in unique]
         cluster_counts = dict(zip(unique, counts))
         return sorted(cluster_counts.items(), key=lambda x: x[1], reverse=True)
 
@@ -41,11 +281,14 @@ class LandmarkPriority:
         """
         return [landmarks[i] for i in range(len(labels)) if labels[i] == -1]
 
-    def select_priority_landmark(self, landmarks: List[Dict], labels: np.ndarray) -> Dict:
+    def select_priority_landmark(self, landmarks: List[Dict], labels: np.ndarray,
+                                 cluster_sizes: Optional[np.ndarray] = None) -> Dict:
         """
         Select the priority landmark from the largest cluster based on a predefined or custom priority order.
+
+        cluster_sizes ranks the clusters by precomputed whole-set sizes (see rank_clusters).
         """
-        sorted_clusters = self.rank_clusters(labels)
+        sorted_clusters = self.rank_clusters(labels, cluster_sizes)
         top_cluster_label = sorted_clusters[0][0]  # Largest cluster's label
 
         if top_cluster_label == -1:
@@ -62,15 +305,115 @@ class LandmarkPriority:
 
         return top_cluster_landmarks[0]  # Fallback to first landmark in the largest cluster
 
+    def get_priority_landmark_for_cell(self, h3_index: str, landmarks: List[Dict]) -> Optional[Dict]:
+        """
+        Identify the priority landmark for every location inside the given H3 cell.
+
+        The k-ring and the candidate landmarks are the same for every location in a
+        cell, so the result is cached per cell and evicted least-recently-used first.
+        """
+        index = self.get_landmark_index(landmarks)
+
+        # Cached selections are only valid for the parameters they were made with
+        params = (self.backend, self.eps, self.eps_meters, self.min_samples, tuple(self.priority_order))
+        if params != self._cell_cache_params:
+            self._cell_cache.clear()
+            self._cell_cache_params = params
+
+        if h3_index in self._cell_cache:
+            self._cell_cache.move_to_end(h3_index)
+            instrumentation.count("cell_cache_hits")
+            return self._cell_cache[h3_index]
+        instrumentation.count("cell_cache_misses")
+
+        positions = index.query_positions(h3.k_ring(h3_index, 1))
+        landmarks_in_hex = [landmarks[i] for i in positions]
+        if not landmarks_in_hex:
+            priority_landmark = None
+        elif self.backend == "grid":
+            clusters = self.get_landmark_clusters(landmarks)
+            priority_landmark = self.select_priority_landmark(
+                landmarks_in_hex, clusters.labels[positions], cluster_sizes=clusters.sizes
+            )
+        else:
+            labels = self.cluster_landmarks(landmarks_in_hex)
+            priority_landmark = self.select_priority_landmark(landmarks_in_hex, labels)
+
+        if self.cache_size > 0:
+            self._cell_cache[h3_index] = priority_landmark
+            if len(self._cell_cache) > self.cache_size:
+                self._cell_cache.popitem(last=False)
+        return priority_landmark
+
     def get_priority_landmark_for_hex(self, lat: float, lon: float, landmarks: List[Dict]) -> Dict:
         """
         Identify the priority landmark for a given latitude and longitude by clustering landmarks in hexagons.
         """
-        hexagons = self.get_hexagons(lat, lon)
-        landmarks_in_hex = [landmark for landmark in landmarks if h3.geo_to_h3(landmark['lat'], landmark['lon'], self.hex_resolution) in hexagons]
+        h3_index = h3.geo_to_h3(lat, lon, self.hex_resolution)
+        return self.get_priority_landmark_for_cell(h3_index, landmarks)
 
-        if not landmarks_in_hex:
-            return None
+    def assign_priority_landmarks(self, buildings: pd.DataFrame, landmarks: List[Dict],
+                                  lat_col: str = 'latitude', lon_col: str = 'longitude') -> List[Optional[Dict]]:
+        """
+        Identify the priority landmark for every row of a buildings DataFrame.
+
+        Rows are grouped by H3 cell so clustering and selection run once per distinct
+        cell; the result is broadcast back to the rows in their original order.
+        """
+        cells = pd.Series(
+            [h3.geo_to_h3(lat, lon, self.hex_resolution) for lat, lon in zip(buildings[lat_col], buildings[lon_col])],
+            index=buildings.index,
+        )
+
+        selected = {cell: self.get_priority_landmark_for_cell(cell, landmarks) for cell in cells.unique()}
+        return [selected[cell] for cell in cells]
+
+
+def compare_clustering_backends(buildings: pd.DataFrame, landmarks: List[Dict], lat_col: str = 'latitude',
+                                lon_col: str = 'longitude', **params) -> Dict:
+    """
+    Assign landmarks to the same buildings with the per-query "dbscan" backend and
+    the whole-set "grid" backend and report how far they agree.
+
+    Args:
+        buildings (pd.DataFrame): Buildings with latitude and longitude columns.
+        landmarks (List[Dict]): Landmark records as returned by load_landmarks.
+        **params: LandmarkPriority arguments shared by both backends.
+
+    Returns:
+        Dict: The number of buildings and cells, the fraction of buildings and of
+        cells given the same landmark, the mean adjusted Rand index between the
+        per-query DBSCAN labels and the grid labels of every cell's candidates,
+        and the assignment time of each backend.
+    """
+    selectors = {backend: LandmarkPriority(backend=backend, **params) for backend in CLUSTERING_BACKENDS}
+    assigned, seconds = {}, {}
+    for backend, selector in selectors.items():
+        started = time.perf_counter()
+        assigned[backend] = selector.assign_priority_landmarks(buildings, landmarks, lat_col, lon_col)
+        seconds[backend] = time.perf_counter() - started
+
+    same = [a is b for a, b in zip(assigned["dbscan"], assigned["grid"])]
+
+    dbscan, grid = selectors["dbscan"], selectors["grid"]
+    index, clusters = grid.get_landmark_index(landmarks), grid.get_landmark_clusters(landmarks)
+    cells = {h3.geo_to_h3(lat, lon, grid.hex_resolution) for lat, lon in zip(buildings[lat_col], buildings[lon_col])}
+    same_cells, rand_scores = 0, []
+    for cell in cells:
+        same_cells += grid.get_priority_landmark_for_cell(cell, landmarks) is dbscan.get_priority_landmark_for_cell(cell, landmarks)
+        positions = index.query_positions(h3.k_ring(cell, 1))
+        if positions:
+            candidates = [landmarks[i] for i in positions]
+            rand_scores.append(adjusted_rand_score(dbscan.cluster_landmarks(candidates), clusters.labels[positions]))
 
-        labels = self.cluster_landmarks(landmarks_in_hex)
-        return self.select_priority_landmark(landmarks_in_hex, labels)
+    return {
+        "buildings": len(same),
+        "cells": len(cells),
+        "same_landmark": float(np.mean(same)) if same else 1.0,
+        "same_landmark_cells": same_cells / len(cells) if cells else 1.0,
+        "mean_adjusted_rand": float(np.mean(rand_scores)) if rand_scores else 1.0,
+        "clusters": len(clusters.sizes),
+        "noise": int((clusters.labels == -1).sum()),
+        "dbscan_seconds": seconds["dbscan"],
+        "grid_seconds": seconds["grid"],
+    }
@@ -0,0 +1,75 @@
+import numpy as np
+import osmnx as ox
+from scipy.spatial import cKDTree
+from sklearn.neighbors import BallTree
+from typing import Tuple
+
+from src.routing_engine import CSRGraph
+
+# Snaps farther than this many metres from any graph node are considered suspect
+DEFAULT_MAX_SNAP_DISTANCE = 250.0
+
+
+class NodeSnapper:
+    """
+    Snap coordinates to their nearest graph node.
+
+    The spatial index over the graph nodes is built once: a k-d tree for projected
+    graphs and a haversine ball tree for unprojected ones, the same as
+    osmnx.distance.nearest_nodes, so results match it. The snapper can then be reused
+    for any number of vectorized lookups across pipeline stages.
+    """
+    def __init__(self, G, max_snap_distance: float = DEFAULT_MAX_SNAP_DISTANCE):
+        self.max_snap_distance = max_snap_distance
+        if isinstance(G, CSRGraph):
+            self.node_ids = G.node_ids
+            coords = np.column_stack([G.y, G.x])
+            crs = G.crs
+        else:
+            self.node_ids = np.array(list(G.nodes))
+            coords = np.array([(data['y'], data['x']) for _, data in G.nodes(data=True)], dtype=float)
+            crs = G.graph['crs']
+
+        self.projected = ox.projection.is_projected(crs)
+        if self.projected:
+            # k-d tree on (x, y) for euclidean search
+            self.tree = cKDTree(coords[:, ::-1])
+        else:
+            # Ball tree on (lat, lon) in radians for haversine search
+            self.tree = BallTree(np.deg2rad(coords), metric='haversine')
+
+    def snap(self, lats, lons) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Snap arrays of latitudes and longitudes to their nearest nodes.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Nearest node ids and snap distances, in the
+            graph's units (metres for unprojected graphs).
+        """
+        lats = np.asarray(lats, dtype=float).reshape(-1)
+        lons = np.asarray(lons, dtype=float).reshape(-1)
+        if np.isnan(lats).any() or np.isnan(lons).any():
+            raise ValueError("Coordinates to snap cannot contain nulls.")
+        if len(lats) == 0:
+            return self.node_ids[:0], np.empty(0)
+
+        if self.projected:
+            dist, pos = self.tree.query(np.column_stack([lons, lats]), k=1)
+        else:
+            dist, pos = self.tree.query(np.deg2rad(np.column_stack([lats, lons])), k=1)
+            dist = dist[:, 0] * ox.distance.EARTH_RADIUS_M
+            pos = pos[:, 0]
+        return self.node_ids[pos], dist
+
+    def snap_point(self, lat: float, lon: float):
+        """
+        Snap a single latitude and longitude to its nearest node id.
+        """
+        nodes, _ = self.snap([lat], [lon])
+        return nodes[0].item()
+
+    def is_far(self, distances) -> np.ndarray:
+        """
+        Flag snap distances beyond the configured maximum.
+        """
+        return np.asarray(distances) > self.max_snap_distance
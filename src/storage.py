@@ -0,0 +1,122 @@
+import json
+import logging
+from pathlib import Path
+from typing import List, Optional
+
+import geopandas as gpd
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import shapely
+
+logger = logging.getLogger(__name__)
+
+# Suffixes of the supported columnar formats
+PARQUET_SUFFIXES = {".parquet"}
+ARROW_SUFFIXES = {".arrow", ".feather"}
+
+
+def _geometry_columns(schema: pa.Schema) -> List[str]:
+    """
+    Return the geometry column names recorded in GeoParquet metadata.
+    """
+    metadata = schema.metadata or {}
+    if b"geo" not in metadata:
+        return []
+    return list(json.loads(metadata[b"geo"]).get("columns", {}))
+
+
+def read_table(path: Path, columns: Optional[List[str]] = None, memory_map: bool = True,
+               geometry: str = "wkt") -> pd.DataFrame:
+    """
+    Read a dataset written by write_table, or a CSV file.
+
+    Parquet and Arrow files are read column by column, so requesting only a few
+    columns skips the rest of the file, and are memory-mapped instead of copied
+    into memory first.
+
+    Args:
+        path (Path): .parquet, .arrow/.feather or .csv file.
+        columns (List[str], optional): Columns to read; all columns if omitted.
+        memory_map (bool): Memory-map Parquet and Arrow files.
+        geometry (str): How to return GeoParquet geometry columns: "wkt" for WKT
+            strings (as they appear in the CSV files), "shapely" for a GeoDataFrame,
+            or "wkb" for the raw bytes.
+
+    Returns:
+        pd.DataFrame: The requested columns.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+
+    if suffix == ".csv":
+        return pd.read_csv(path, usecols=columns)
+    if suffix in ARROW_SUFFIXES:
+        return feather.read_table(path, columns=columns, memory_map=memory_map).to_pandas()
+    if suffix not in PARQUET_SUFFIXES:
+        raise ValueError(f"Unsupported table format: {path}")
+
+    table = pq.read_table(path, columns=columns, memory_map=memory_map)
+    df = table.to_pandas()
+
+    geometry_columns = [column for column in _geometry_columns(table.schema) if column in df.columns]
+    if not geometry_columns or geometry == "wkb":
+        return df
+    if geometry == "shapely":
+        for column in geometry_columns:
+            df[column] = gpd.GeoSeries(shapely.from_wkb(df[column].to_numpy()), index=df.index)
+        return gpd.GeoDataFrame(df, geometry=geometry_columns[0])
+    if geometry == "wkt":
+        for column in geometry_columns:
+            df[column] = shapely.to_wkt(shapely.from_wkb(df[column].to_numpy()), rounding_precision=-1)
+        return df
+    raise ValueError(f"Unknown geometry mode: {geometry!r}")
+
+
+def table_columns(path: Path) -> List[str]:
+    """
+    Return the column names of a dataset written by write_table, or of a CSV file,
+    without reading its rows.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        return pd.read_csv(path, nrows=0).columns.tolist()
+    if suffix in ARROW_SUFFIXES:
+        with pa.memory_map(str(path)) as source:
+            return pa.ipc.open_file(source).schema.names
+    if suffix not in PARQUET_SUFFIXES:
+        raise ValueError(f"Unsupported table format: {path}")
+    return pq.read_schema(path).names
+
+
+def write_table(df: pd.DataFrame, path: Path, export_csv: bool = False) -> None:
+    """
+    Write a DataFrame as a Parquet (GeoParquet for GeoDataFrames) or Arrow file.
+
+    Args:
+        df (pd.DataFrame): Data to write. The index is not stored.
+        path (Path): Target .parquet or .arrow/.feather file.
+        export_csv (bool): Also write a CSV copy next to it, with the same name and a .csv suffix.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    if suffix in PARQUET_SUFFIXES:
+        if isinstance(df, gpd.GeoDataFrame):
+            df.to_parquet(path, index=False)
+        else:
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path)
+    elif suffix in ARROW_SUFFIXES:
+        # Uncompressed, so the file can be memory-mapped without decoding
+        feather.write_feather(df.reset_index(drop=True), path, compression="uncompressed")
+    else:
+        raise ValueError(f"Unsupported table format: {path}")
+    logger.info(f"Data saved to {path}")
+
+    if export_csv:
+        csv_path = path.with_suffix(".csv")
+        df.to_csv(csv_path, index=False, encoding="utf-8")
+        logger.info(f"Data exported to {csv_path}")
@@ -0,0 +1,130 @@
+import random
+from typing import Dict, List, Tuple
+
+import networkx as nx
+import numpy as np
+import osmnx as ox
+import pandas as pd
+
+# Constants
+ORIGIN = (27.66, 85.28)  # South-west corner of the synthetic city (lat, lon)
+SPACING = 1e-3  # Degrees between neighbouring grid intersections
+HIGHWAY_TYPES = ["residential", "footway", "primary", "service", "path"]
+# Speeds (km/h) for prepare_graph, since synthetic edges carry no maxspeed
+HIGHWAY_SPEEDS = {"residential": 20, "footway": 5, "primary": 40, "service": 15, "path": 4}
+AMENITIES = ["place_of_worship", "school", "bus_station", "marketplace", "townhall", "restaurant", "bank"]
+
+
+def synthetic_graph(size: int, seed: int = 0, one_way: float = 0.3, missing: float = 0.1) -> nx.MultiDiGraph:
+    """
+    Generate a deterministic street graph shaped like osmnx.graph_from_place output.
+
+    Nodes lie on a size x size grid around Kathmandu with jittered coordinates.
+    Each block edge is dropped with probability missing. Kept edges are two-way
+    streets, except a one_way fraction, and carry osmid, highway, oneway, reversed
+    and length (the great-circle length stretched by up to 30%). A few streets get
+    a longer parallel edge, as OSM graphs do.
+
+    Args:
+        size (int): Number of intersections along each side.
+        seed (int): Random seed; the same arguments always give the same graph.
+        one_way (float): Fraction of one-way streets.
+        missing (float): Fraction of missing blocks.
+
+    Returns:
+        networkx.MultiDiGraph: The unprepared graph; pass HIGHWAY_SPEEDS to prepare_graph.
+    """
+    rng = random.Random(seed)
+    G = nx.MultiDiGraph(crs="epsg:4326")
+    lat0, lon0 = ORIGIN
+    for i in range(size):
+        for j in range(size):
+            G.add_node(
+                i * size + j,
+                y=lat0 + i * SPACING + rng.uniform(-0.3, 0.3) * SPACING,
+                x=lon0 + j * SPACING + rng.uniform(-0.3, 0.3) * SPACING,
+                street_count=0,
+            )
+
+    osmid = 0
+    for i in range(size):
+        for j in range(size):
+            for di, dj in ((0, 1), (1, 0)):
+                if i + di >= size or j + dj >= size or rng.random() < missing:
+                    continue
+                u, v = i * size + j, (i + di) * size + j + dj
+                osmid += 1
+                length = ox.distance.great_circle_vec(
+                    G.nodes[u]['y'], G.nodes[u]['x'], G.nodes[v]['y'], G.nodes[v]['x']
+                ) * rng.uniform(1.0, 1.3)
+                oneway = rng.random() < one_way
+                attributes = {"osmid": osmid, "highway": rng.choice(HIGHWAY_TYPES), "oneway": oneway, "length": length}
+
+                G.add_edge(u, v, reversed=False, **attributes)
+                if not oneway:
+                    G.add_edge(v, u, reversed=True, **attributes)
+                if rng.random() < 0.02:
+                    G.add_edge(u, v, reversed=False, **dict(attributes, osmid=-osmid, length=length * 1.2))
+                G.nodes[u]['street_count'] += 1
+                G.nodes[v]['street_count'] += 1
+    return G
+
+
+def graph_bounds(G) -> Tuple[float, float, float, float]:
+    """
+    Return the (south, west, north, east) bounds of a graph's nodes.
+    """
+    ys = [data['y'] for _, data in G.nodes(data=True)]
+    xs = [data['x'] for _, data in G.nodes(data=True)]
+    return min(ys), min(xs), max(ys), max(xs)
+
+
+def synthetic_buildings(bounds: Tuple[float, float, float, float], count: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Generate buildings with the columns of the crawled building dataset, spread
+    uniformly over the given (south, west, north, east) bounds.
+    """
+    rng = np.random.default_rng(seed)
+    south, west, north, east = bounds
+    latitude = south + rng.random(count) * (north - south)
+    longitude = west + rng.random(count) * (east - west)
+    named = rng.random(count) < 0.1
+    return pd.DataFrame({
+        "element_type": "way",
+        "osmid": np.arange(1, count + 1),
+        "amenity": None,
+        "building": "yes",
+        "name": [f"Building {i}" if is_named else None for i, is_named in enumerate(named)],
+        "geometry": [f"POINT ({lon} {lat})" for lat, lon in zip(latitude, longitude)],
+        "latitude": latitude,
+        "longitude": longitude,
+    })
+
+
+def synthetic_landmarks(bounds: Tuple[float, float, float, float], count: int, seed: int = 0,
+                        clusters: int = 20) -> List[Dict]:
+    """
+    Generate landmarks in the record format of load_landmarks.
+
+    Most landmarks are grouped around a few centres, like the amenities of a real
+    city, so the DBSCAN clustering in LandmarkPriority has clusters to find.
+    """
+    rng = np.random.default_rng(seed)
+    south, west, north, east = bounds
+    centres = np.column_stack([
+        south + rng.random(clusters) * (north - south),
+        west + rng.random(clusters) * (east - west),
+    ])
+    clustered = rng.random(count) < 0.7
+    lat = np.where(clustered, 0, south + rng.random(count) * (north - south))
+    lon = np.where(clustered, 0, west + rng.random(count) * (east - west))
+    centre = centres[rng.integers(clusters, size=count)]
+    lat = np.where(clustered, centre[:, 0] + rng.normal(0, 0.002, count), lat)
+    lon = np.where(clustered, centre[:, 1] + rng.normal(0, 0.002, count), lon)
+    amenities = rng.choice(AMENITIES, count)
+
+    return [
+        {"type": "node", "id": i + 1, "lat": float(lat[i]), "lon": float(lon[i]),
+         "tags_name": f"Landmark {i}", "tags_amenity": str(amenities[i])}
+        for i in range(count)
+    ]
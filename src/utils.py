@@ -1,25 +1,29 @@
 import pandas as pd
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 from tqdm import tqdm
 from math import radians, cos, sin, sqrt, atan2, degrees
 
+from src.storage import read_table
 
-def load_landmarks(file_path: str) -> List[Dict]:
+
+def load_landmarks(file_path: str, columns: Optional[List[str]] = None) -> List[Dict]:
     """
-    Load landmarks data from a CSV file and convert to dictionary format.
+    Load landmarks data from a Parquet or CSV file and convert to dictionary format.
     """
-    landmarks = pd.read_csv(file_path)
+    landmarks = read_table(file_path, columns=columns)
     return landmarks.to_dict('records')
 
-def load_buildings(file_path: str) -> pd.DataFrame:
+def load_buildings(file_path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
     """
-    Load building data and ensure latitude and longitude are of float type.
+    Load building data from a Parquet or CSV file, optionally only some columns,
+    and ensure latitude and longitude are of float type.
     """
-    buildings = pd.read_csv(file_path)
-    buildings['latitude'] = buildings['latitude'].astype(float)
-    buildings['longitude'] = buildings['longitude'].astype(float)
+    buildings = read_table(file_path, columns=columns)
+    for column in ('latitude', 'longitude'):
+        if column in buildings.columns and buildings[column].dtype != np.float64:
+            buildings[column] = buildings[column].astype(float)
     return buildings
 
 def preprocess_landmark_tag(landmark_tag: List[Dict]) -> pd.DataFrame:
@@ -39,9 +43,13 @@ def preprocess_landmark_tag(landmark_tag: List[Dict]) -> pd.DataFrame:
     return landmark_tag_df
 
 
-def haversine_distance(coord1, coord2, round_to=0):
+# Cardinal directions used in route hashes, indexed by their direction code
+DIRECTIONS = ("N", "E", "S", "W")
+
+
+def haversine_meters(coord1, coord2):
     """
-    Calculate the Haversine distance between two coordinates (lat/lon).
+    Calculate the unrounded Haversine distance between two coordinates (lat/lon).
     Returns distance in meters.
     """
     R = 6371000  # Radius of Earth in meters
@@ -53,8 +61,15 @@ def haversine_distance(coord1, coord2, round_to=0):
     dlambda = radians(lon2 - lon1)
     
     a = sin(dphi/2)**2 + cos(phi1) * cos(phi2) * sin(dlambda/2)**2
-    distance = 2 * R * atan2(sqrt(a), sqrt(1 - a))
-    
+    return 2 * R * atan2(sqrt(a), sqrt(1 - a))
+
+
+def haversine_distance(coord1, coord2, round_to=0):
+    """
+    Calculate the Haversine distance between two coordinates (lat/lon).
+    Returns distance in meters, rounded to round_to decimals or truncated to an int.
+    """
+    distance = haversine_meters(coord1, coord2)
     return round(distance, round_to) if round_to else int(distance)
 
 
@@ -77,6 +92,20 @@ def calculate_initial_compass_bearing(pointA, pointB):
     return compass_bearing
 
 
+def cardinal_direction(bearing):
+    """
+    Map a compass bearing in degrees to its cardinal direction (N, E, S or W).
+    """
+    if (bearing >= 0 and bearing < 45) or (bearing >= 315 and bearing < 360):
+        return "N"
+    elif bearing >= 45 and bearing < 135:
+        return "E"
+    elif bearing >= 135 and bearing < 225:
+        return "S"
+    else:
+        return "W"
+
+
 def preprocess_landmarks(ktm_buildings):
     """
     Preprocess the ktm_buildings DataFrame by removing rows where 'landmark_tags_name' is null.
@@ -1,14 +1,28 @@
-import osmnx as ox
 import networkx as nx
 import pandas as pd
 from tqdm import tqdm
-from joblib import Parallel, delayed
 import h3
 from sklearn.cluster import DBSCAN
 import numpy as np
 from typing import List, Dict
+import argparse
 import logging
-import gc
+import multiprocessing as mp
+import os
+import pickle
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import psutil
+
+from src import instrumentation
+from src.graph_cache import load_graph
+from src.route_optimizer import RouteOptimizer
+from src.routing_engine import CSRGraph
+from src.select_landmarks import LandmarkIndex
+from src.snapping import NodeSnapper
+from src.storage import read_table
 
 import warnings
 warnings.filterwarnings("ignore", category=RuntimeWarning, module="networkx.utils.backends")
@@ -29,6 +43,17 @@ class LandmarkPriority:
         self.priority_order = priority_order if priority_order else [
             "temple", "tourist_spot", "bus_stop", "government_building", "market", "school"
         ]
+        self._landmark_index = None
+
+    def get_landmark_index(self, landmarks: List[Dict]) -> LandmarkIndex:
+        """
+        Return the H3 index for the given landmarks, rebuilding it only when a
+        different landmark list or hex resolution is passed than in the last call;
+        the list must not be edited in place (see LandmarkIndex).
+        """
+        if self._landmark_index is None or not self._landmark_index.is_valid_for(landmarks, self.hex_resolution):
+            self._landmark_index = LandmarkIndex(landmarks, self.hex_resolution)
+        return self._landmark_index
 
     def get_hexagons(self, lat: float, lon: float) -> List[str]:
         """
@@ -84,7 +109,7 @@ class LandmarkPriority:
         Identify the priority landmark for a given latitude and longitude by clustering landmarks in hexagons.
         """
         hexagons = self.get_hexagons(lat, lon)
-        landmarks_in_hex = [landmark for landmark in landmarks if h3.geo_to_h3(landmark['lat'], landmark['lon'], self.hex_resolution) in hexagons]
+        landmarks_in_hex = self.get_landmark_index(landmarks).query(hexagons)
 
         if not landmarks_in_hex:
             return None
@@ -92,17 +117,18 @@ class LandmarkPriority:
         labels = self.cluster_landmarks(landmarks_in_hex)
         return self.select_priority_landmark(landmarks_in_hex, labels)
 
-# Function to calculate heuristic for A* algorithm
-def heuristic(u, v, G):
-    """Custom heuristic function for A* algorithm that calculates great-circle distance."""
-    u_lat, u_lon = G.nodes[u]['y'], G.nodes[u]['x']
-    v_lat, v_lon = G.nodes[v]['y'], G.nodes[v]['x']
-    return ox.distance.great_circle_vec(u_lat, u_lon, v_lat, v_lon)
+def path_travel_time(G, path):
+    """Total travel time along a path of node ids, on a CSRGraph or a networkx graph."""
+    if isinstance(G, CSRGraph):
+        return G.path_travel_time(G.indices_of(path).tolist())
+    return sum(
+        G.get_edge_data(path[i], path[i+1])[0].get('travel_time', 0)
+        for i in range(len(path)-1)
+    )
 
 # Function to process scenarios for landmark-based routing
-def process_landmark_scenario(building, landmarks, G, landmark_selector):
+def process_landmark_scenario(building, landmarks, optimizer, landmark_selector):
     """Process a single routing scenario for landmark-based systems."""
-    building_coords = (building['latitude'], building['longitude'])
     priority_landmark = landmark_selector.get_priority_landmark_for_hex(
         building['latitude'], building['longitude'], landmarks
     )
@@ -110,81 +136,209 @@ def process_landmark_scenario(building, landmarks, G, landmark_selector):
     if not priority_landmark:
         return {'Path Length': None, 'Travel Time': None, 'Status': 'Failed'}
 
-    building_node = ox.distance.nearest_nodes(G, building_coords[1], building_coords[0])
-    landmark_node = ox.distance.nearest_nodes(G, priority_landmark['lon'], priority_landmark['lat'])
+    building_node = optimizer.find_nearest_node((building['latitude'], building['longitude']))
+    landmark_node = optimizer.find_nearest_node((priority_landmark['lat'], priority_landmark['lon']))
 
-    if not nx.has_path(G, building_node, landmark_node):
-        return {'Path Length': None, 'Travel Time': None, 'Status': 'Failed'}
-
-    path = nx.astar_path(G, building_node, landmark_node, heuristic=lambda u, v: heuristic(u, v, G), weight='travel_time')
-    path_length = len(path)
-    travel_time = sum(
-        G.get_edge_data(path[i], path[i+1])[0].get('travel_time', 0)
-        for i in range(len(path)-1)
-    )
+    # Component labels settle most unreachable pairs (UnreachableError); the search itself catches the rest
+    try:
+        path = optimizer.get_shortest_path(building_node, landmark_node)
+    except nx.NetworkXNoPath:
+        return {'Path Length': None, 'Travel Time': None, 'Status': 'Unreachable'}
 
-    return {'Path Length': path_length, 'Travel Time': travel_time, 'Status': 'Success'}
+    return {'Path Length': len(path), 'Travel Time': path_travel_time(optimizer.G, path), 'Status': 'Success'}
 
-def process_traditional_scenario(building, landmark, G):
+def process_traditional_scenario(building, landmark, optimizer):
     """Process a single routing scenario for traditional systems."""
-    building_coords = (building['latitude'], building['longitude'])
-    landmark_coords = (landmark['lat'], landmark['lon'])
-
-    building_node = ox.distance.nearest_nodes(G, building_coords[1], building_coords[0])
-    landmark_node = ox.distance.nearest_nodes(G, landmark_coords[1], landmark_coords[0])
-
-    if not nx.has_path(G, building_node, landmark_node):
-        return {'Path Length': None, 'Travel Time': None, 'Status': 'Failed'}
-
-    path = nx.dijkstra_path(G, building_node, landmark_node, weight='travel_time')
-    path_length = len(path)
-    travel_time = sum(
-        G.get_edge_data(path[i], path[i+1])[0].get('travel_time', 0)
-        for i in range(len(path)-1)
+    building_node = optimizer.find_nearest_node((building['latitude'], building['longitude']))
+    landmark_node = optimizer.find_nearest_node((landmark['lat'], landmark['lon']))
+
+    path = optimizer.get_shortest_paths_from(building_node, [landmark_node])[landmark_node]
+    if path is None:
+        return {'Path Length': None, 'Travel Time': None, 'Status': 'Unreachable'}
+
+    return {'Path Length': len(path), 'Travel Time': path_travel_time(optimizer.G, path), 'Status': 'Success'}
+
+def process_traditional_chunk(buildings, landmark, optimizer):
+    """
+    Process traditional routing scenarios for many buildings sharing one landmark.
+
+    Paths come from one backward search (see RouteOptimizer.get_shortest_paths_to),
+    so travel times equal those of per-building searches, but on equally short paths
+    the path length in nodes can differ.
+    """
+    snapper = optimizer.snapper
+    landmark_node = snapper.snap_point(landmark['lat'], landmark['lon'])
+    building_nodes, snap_distances = snapper.snap(
+        [building['latitude'] for building in buildings], [building['longitude'] for building in buildings]
     )
-
-    return {'Path Length': path_length, 'Travel Time': travel_time, 'Status': 'Success'}
-
-def simulate_routing(buildings_df, landmarks_df, G, algorithm='A*', num_scenarios=1000, landmark_selector=None, chunk_size=10000):
-    """Simulate routing scenarios and calculate metrics in chunks."""
+    building_nodes = building_nodes.tolist()
+
+    far_snaps = snapper.is_far(snap_distances).sum()
+    if far_snaps:
+        logging.warning(f"{far_snaps} buildings snapped more than {snapper.max_snap_distance:.0f}m from the graph.")
+
+    # One Dijkstra search from the landmark over the reversed graph yields every building's path
+    paths = optimizer.get_shortest_paths_to(landmark_node, building_nodes)
+
+    results = []
+    for building_node in building_nodes:
+        path = paths[building_node]
+        if path is None:
+            results.append({'Path Length': None, 'Travel Time': None, 'Status': 'Unreachable'})
+            continue
+        results.append({'Path Length': len(path), 'Travel Time': path_travel_time(optimizer.G, path), 'Status': 'Success'})
+
+    return results
+
+# State shared with forked workers through copy-on-write, and each worker's own state
+_shared_state = None
+_worker_state = None
+
+class SimulationState:
+    """
+    Graph, snapping index and landmarks that every simulation process loads once.
+
+    Each chunk draws its own landmark sample with a seed derived from the chunk
+    number, so workers rebuild the same sample locally instead of receiving it with
+    every task, and the landmark selector's H3 index is built once per chunk.
+    """
+    def __init__(self, G, landmarks_df, landmark_selector=None, seed=0):
+        if isinstance(G, CSRGraph):
+            # Built here, before forking, so workers share them instead of building copies
+            G.build_search_structures()
+            logging.info(f"Graph memory with search structures: {G.memory_usage()['total'] / 2**20:.1f} MiB.")
+        self.G = G
+        self.snapper = NodeSnapper(G)
+        self.optimizer = RouteOptimizer(G, snapper=self.snapper)
+        self.landmarks_df = landmarks_df
+        self.landmark_selector = landmark_selector
+        self.seed = seed
+        self._chunk = None
+        self._chunk_landmarks = None
+
+    def landmarks_for_chunk(self, chunk, sample_size):
+        """Return the landmark records sampled for a chunk."""
+        if self._chunk != chunk:
+            sample = self.landmarks_df.sample(min(sample_size, len(self.landmarks_df)), random_state=self.seed + chunk)
+            self._chunk_landmarks = sample.to_dict('records')
+            self._chunk = chunk
+        return self._chunk_landmarks
+
+def _init_simulation_worker(state=None):
+    """Keep the state inherited from the parent on fork, or passed in once per worker on spawn."""
+    global _worker_state
+    _worker_state = state if state is not None else _shared_state
+
+def _worker_usage(started):
+    """Return this process's id, its resident memory in bytes now, at the end of a task, and the seconds since started."""
+    return os.getpid(), psutil.Process().memory_info().rss, time.perf_counter() - started
+
+def _simulate_landmark_task(task):
+    """Run landmark scenarios for one task of building ids and coordinates."""
+    started = time.perf_counter()
+    chunk, sample_size, building_ids, lats, lons = task
+    state = _worker_state
+    landmarks = state.landmarks_for_chunk(chunk, sample_size)
+    results = [
+        process_landmark_scenario(
+            {'latitude': lat, 'longitude': lon}, landmarks, state.optimizer, state.landmark_selector
+        )
+        for lat, lon in zip(lats, lons)
+    ]
+    return building_ids, results, _worker_usage(started)
+
+def simulate_routing(buildings_df, landmarks_df, G, algorithm='A*', num_scenarios=1000, landmark_selector=None,
+                     chunk_size=10000, n_jobs=48, task_size=100, seed=0, measure_payload=False):
+    """
+    Simulate routing scenarios and calculate metrics in chunks.
+
+    measure_payload is a debugging aid: it pickles every task a second time to log
+    the bytes sent to the workers per chunk, so it is off by default.
+    """
+    global _shared_state
     total_results_file = f'{algorithm}_results.csv'
-    with open(total_results_file, 'w') as output_file:
-        # Write headers
-        output_file.write("Path Length,Travel Time,Status\n")
-
-        # Process in chunks
-        for chunk_start in tqdm(range(0, num_scenarios, chunk_size), desc="Processing Chunks"):
-            chunk_end = min(chunk_start + chunk_size, num_scenarios)
-            building_sample = buildings_df.iloc[chunk_start:chunk_end]
-            landmark_sample = landmarks_df.sample(min(len(building_sample), len(landmarks_df)))
-
-            if algorithm == 'Landmark':
-                args = [
-                    (building, landmark_sample.to_dict('records'), G, landmark_selector)
-                    for building in building_sample.to_dict('records')
-                ]
-            else:
-                args = [
-                    (building, landmark_sample.iloc[0].to_dict(), G)
-                    for building in building_sample.to_dict('records')
-                ]
-
-            results = Parallel(n_jobs=48, backend="loky", batch_size=10)(
-                delayed(process_landmark_scenario if algorithm == 'Landmark' else process_traditional_scenario)(*arg)
-                for arg in args
-            )
-
-            # Write results
-            for result in results:
-                output_file.write(f"{result['Path Length']},{result['Travel Time']},{result['Status']}\n")
-
-            # Clean up memory
-            del building_sample
-            del landmark_sample
-            del results
-            gc.collect()
-
-            logging.info(f"Processed chunk {chunk_start} to {chunk_end}.")
+    processes = n_jobs if algorithm == 'Landmark' and n_jobs > 1 else 1
+
+    # Build the graph, node index and landmark state once; workers inherit or receive it once
+    state = SimulationState(G, landmarks_df, landmark_selector, seed=seed)
+    pool = None
+    if processes > 1:
+        if "fork" in mp.get_all_start_methods():
+            _shared_state = state
+            pool = mp.get_context("fork").Pool(processes, initializer=_init_simulation_worker)
+        else:
+            pool = mp.get_context("spawn").Pool(processes, initializer=_init_simulation_worker, initargs=(state,))
+    else:
+        _init_simulation_worker(state)
+
+    worker_memory = defaultdict(int)
+    try:
+        with instrumentation.stage(f"simulate_{algorithm.lower()}"), open(total_results_file, 'w') as output_file:
+            # Write headers
+            output_file.write("Path Length,Travel Time,Status\n")
+
+            # Process in chunks
+            for chunk, chunk_start in enumerate(tqdm(range(0, num_scenarios, chunk_size), desc="Processing Chunks")):
+                started = time.perf_counter()
+                payload = 0
+                chunk_end = min(chunk_start + chunk_size, num_scenarios)
+                building_sample = buildings_df.iloc[chunk_start:chunk_end]
+                lats = building_sample['latitude'].tolist()
+                lons = building_sample['longitude'].tolist()
+
+                if algorithm == 'Landmark':
+                    # Tasks carry only building positions and coordinates
+                    tasks = [
+                        (chunk, len(building_sample), list(range(start, min(start + task_size, len(lats)))),
+                         lats[start:start + task_size], lons[start:start + task_size])
+                        for start in range(0, len(lats), task_size)
+                    ]
+                    if measure_payload:
+                        payload = sum(len(pickle.dumps(task)) for task in tasks)
+
+                    task_results = (
+                        pool.imap_unordered(_simulate_landmark_task, tasks) if pool is not None
+                        else map(_simulate_landmark_task, tasks)
+                    )
+                    results = [None] * len(lats)
+                    compute = 0.0
+                    for building_ids, task_result, (pid, rss, elapsed) in task_results:
+                        for building_id, result in zip(building_ids, task_result):
+                            results[building_id] = result
+                        worker_memory[pid] = max(worker_memory[pid], rss)
+                        compute += elapsed
+                else:
+                    # Every building in the chunk is routed to the same landmark, so one
+                    # backward search from that landmark serves the whole chunk
+                    landmark = state.landmarks_for_chunk(chunk, len(building_sample))[0]
+                    results = process_traditional_chunk(
+                        [{'latitude': lat, 'longitude': lon} for lat, lon in zip(lats, lons)], landmark, state.optimizer
+                    )
+                    compute = time.perf_counter() - started
+
+                # Write results
+                for result in results:
+                    output_file.write(f"{result['Path Length']},{result['Travel Time']},{result['Status']}\n")
+                    instrumentation.count(f"status.{result['Status']}")
+                instrumentation.count("scenarios", len(results))
+                instrumentation.count("compute_seconds", compute)
+
+                wall = time.perf_counter() - started
+                logging.info(
+                    f"Processed chunk {chunk_start} to {chunk_end} in {wall:.2f}s "
+                    f"(compute {compute:.2f}s over {processes} process(es), "
+                    f"overhead {max(wall - compute / processes, 0):.2f}s"
+                    + (f", task payload {payload / 1024:.1f} KiB)." if measure_payload else ").")
+                )
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        _shared_state = None
+
+    logging.info(f"Main process memory: {psutil.Process().memory_info().rss / 2**20:.1f} MiB.")
+    for pid, rss in sorted(worker_memory.items()) if processes > 1 else ():
+        logging.info(f"Worker {pid} RSS at task end, highest sample: {rss / 2**20:.1f} MiB.")
 
 
 def calculate_metrics(landmark_file, traditional_file, output_file):
@@ -211,17 +365,29 @@ def calculate_metrics(landmark_file, traditional_file, output_file):
     logging.info(f"Comparison metrics saved to {output_file}.")
 
 def main():
+    parser = argparse.ArgumentParser(description="Compare landmark-based and traditional routing on the Kathmandu graph.")
+    parser.add_argument("--metrics-file", type=Path,
+                        help=f"Append per-stage timings, counters and memory to this JSON lines file "
+                             f"(e.g. {instrumentation.METRICS_FILE}); instrumentation is off without it.")
+    args = parser.parse_args()
+
     setup_logging()
+    if args.metrics_file is not None:
+        instrumentation.enable(args.metrics_file)
+    else:
+        instrumentation.disable()
     logging.info("Starting the routing simulation program.")
 
     # Load road network and datasets
     logging.info("Loading road network and datasets.")
-    G = ox.graph_from_place("Kathmandu, Nepal", network_type="drive")
-    G = ox.add_edge_speeds(G)
-    G = ox.add_edge_travel_times(G)
-
-    buildings = pd.read_csv('./data/kathmandu_buildings.csv')
-    landmarks = pd.read_csv('./data/cleaned_landmarks.csv')
+    with instrumentation.stage("load_data"):
+        # The compact array graph is what every worker holds; it is never converted to networkx
+        G = load_graph("Kathmandu, Nepal", network_type="drive")
+        logging.info(f"Graph arrays: {G.memory_usage()['total'] / 2**20:.1f} MiB for {G.num_nodes} nodes and {G.num_edges} edges.")
+
+        # Only the coordinates of the buildings are needed, so only those columns are read
+        buildings = read_table('./data/kathmandu_buildings.parquet', columns=['latitude', 'longitude'])
+        landmarks = read_table('./data/cleaned_landmarks.parquet')
 
     # Initialize LandmarkPriority
     landmark_selector = LandmarkPriority()
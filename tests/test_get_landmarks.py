@@ -0,0 +1,109 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import requests
+
+from src.crawl import get_landmarks
+from src.crawl.get_landmarks import OverpassClient, build_query, crawl_landmarks_data
+from src.crawl.overpass_stub import StubOverpassServer
+from src.crawl.response_cache import ResponseCache
+
+BBOX = "27.70,85.30,27.71,85.31"
+
+
+def gaps(server):
+    """
+    Seconds between consecutive requests received by the stub server.
+    """
+    times = [arrival for arrival, _ in server.requests]
+    return [later - earlier for earlier, later in zip(times, times[1:])]
+
+
+class OverpassClientTest(unittest.TestCase):
+    def test_rate_limit_spaces_requests(self):
+        with StubOverpassServer() as server, \
+                OverpassClient(server.url, rate_limit=20, max_retries=0) as client:
+            for amenity in ("school", "bank", "cafe", "bar"):
+                client.fetch(build_query([amenity], BBOX))
+
+        self.assertEqual(len(server.requests), 4)
+        for gap in gaps(server):
+            self.assertGreaterEqual(gap, 0.045)
+
+    def test_backoff_on_429_and_5xx(self):
+        responses = [(429, {}, None), (503, {}, None), (200, {}, None)]
+        with StubOverpassServer(responses) as server, \
+                OverpassClient(server.url, rate_limit=None, backoff_factor=0.1) as client:
+            data = client.fetch(build_query(["school"], BBOX))
+
+        self.assertEqual(data["elements"][0]["tags"]["amenity"], "school")
+        self.assertEqual(len(server.requests), 3)
+        first, second = gaps(server)
+        self.assertGreaterEqual(first, 0.1)
+        self.assertGreaterEqual(second, 0.2)
+
+    def test_retry_after_header_is_honoured(self):
+        responses = [(429, {"Retry-After": "1"}, None)]
+        with StubOverpassServer(responses) as server, \
+                OverpassClient(server.url, rate_limit=None, backoff_factor=0.01) as client:
+            client.fetch(build_query(["school"], BBOX))
+
+        self.assertGreaterEqual(gaps(server)[0], 1.0)
+
+    def test_gives_up_after_max_retries(self):
+        responses = [(500, {}, None)] * 3
+        with StubOverpassServer(responses) as server, \
+                OverpassClient(server.url, rate_limit=None, max_retries=2, backoff_factor=0.01) as client:
+            with self.assertRaises(requests.exceptions.HTTPError):
+                client.fetch(build_query(["school"], BBOX))
+        self.assertEqual(len(server.requests), 3)
+
+    def test_client_errors_are_not_retried(self):
+        with StubOverpassServer([(400, {}, None)]) as server, \
+                OverpassClient(server.url, rate_limit=None, backoff_factor=0.01) as client:
+            with self.assertRaises(requests.exceptions.HTTPError):
+                client.fetch(build_query(["school"], BBOX))
+        self.assertEqual(len(server.requests), 1)
+
+    def test_cache_reuse(self):
+        query = build_query(["school"], BBOX)
+        with tempfile.TemporaryDirectory() as cache_dir, StubOverpassServer() as server:
+            cache = ResponseCache(Path(cache_dir))
+            with OverpassClient(server.url, rate_limit=None, cache=cache) as client:
+                downloaded = client.fetch(query)
+            with OverpassClient(server.url, rate_limit=None, cache=cache) as client:
+                self.assertEqual(client.fetch(query), downloaded)
+            self.assertEqual(len(server.requests), 1)
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+            with OverpassClient(server.url, cache=cache, offline=True) as client:
+                with self.assertRaises(FileNotFoundError):
+                    client.fetch(build_query(["bank"], BBOX))
+            with OverpassClient(server.url, rate_limit=None, cache=cache, refresh=True) as client:
+                client.fetch(query)
+            self.assertEqual(len(server.requests), 2)
+
+
+class CrawlLandmarksTest(unittest.TestCase):
+    def test_second_crawl_is_served_from_cache(self):
+        with tempfile.TemporaryDirectory() as tmp, StubOverpassServer() as server, \
+                mock.patch.object(get_landmarks, "LANDMARKS_DIR", Path(tmp) / "landmarks"):
+            cache_dir = Path(tmp) / "cache"
+            crawl_landmarks_data(server.url, rate_limit=None, union_queries=True, cache_dir=cache_dir)
+            queries = len(server.requests)
+            self.assertEqual(queries, len(get_landmarks.AMENITIES))
+            saved = sorted(path.name for path in (Path(tmp) / "landmarks").glob("*.json"))
+            self.assertIn("Education_school.json", saved)
+
+            started = time.monotonic()
+            crawl_landmarks_data(server.url, union_queries=True, cache_dir=cache_dir)
+            self.assertEqual(len(server.requests), queries)
+            # The default rate limit is not spent on cached queries
+            self.assertLess(time.monotonic() - started, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
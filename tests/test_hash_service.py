@@ -0,0 +1,92 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import geopandas as gpd
+import pandas as pd
+import shapely
+
+from src.crawl.get_buildings import EPSG_CODE, fetch_building_tiles, merge_building_tiles
+from src.hash_service import HashIndex
+from src.storage import write_table
+
+BUILDINGS = pd.DataFrame({
+    "osmid": [9001, 42, 777],
+    "latitude": [27.700, 27.701, 27.702],
+    "longitude": [85.300, 85.301, 85.302],
+    "name": ["A", None, "C"],
+    "route_hashes": ["N-10", "E-20", "S-30"],
+    "building": ["yes", "house", "yes"],
+})
+# A building on the border of the two tiles below, returned by both
+BORDER_BUILDING = ("way", 500, 85.32, 27.71)
+
+
+def fetch_tile(polygon) -> gpd.GeoDataFrame:
+    """
+    Stand-in for the Overpass fetch: three buildings per tile plus the border building.
+    """
+    min_x, min_y, _, _ = polygon.bounds
+    first_id = 1000 + int(round((min_x - 85.30) / 0.02)) * 10
+    rows = [("way", first_id + i, min_x + 0.004 * (i + 1), min_y + 0.005) for i in range(3)] + [BORDER_BUILDING]
+    return gpd.GeoDataFrame(
+        {"building": "yes", "name": [f"Building {osmid}" for _, osmid, _, _ in rows], "amenity": None},
+        geometry=[shapely.Point(x, y).buffer(1e-4) for _, _, x, y in rows],
+        index=pd.MultiIndex.from_tuples([(kind, osmid) for kind, osmid, _, _ in rows], names=["element_type", "osmid"]),
+        crs=EPSG_CODE,
+    )
+
+
+class HashIndexLoadTest(unittest.TestCase):
+    def test_lookup_by_building_id(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for suffix in (".parquet", ".arrow", ".csv"):
+                path = Path(tmp) / f"hashes{suffix}"
+                if suffix == ".csv":
+                    BUILDINGS.to_csv(path, index=False)
+                else:
+                    write_table(BUILDINGS, path)
+                index = HashIndex.load(path)
+
+                with self.subTest(suffix=suffix):
+                    position = index.position_of("42")
+                    self.assertEqual(position, 1)
+                    self.assertEqual(index.record(position), {
+                        "id": 42, "latitude": 27.701, "longitude": 85.301, "name": None, "hash": "E-20",
+                    })
+                    self.assertEqual(index.record(index.position_of("777"))["hash"], "S-30")
+                    # Row positions are not building ids
+                    self.assertIsNone(index.position_of("0"))
+
+    def test_dataset_without_osmid_is_rejected(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "hashes.parquet"
+            write_table(BUILDINGS.drop(columns="osmid"), path)
+            with self.assertRaises(ValueError):
+                HashIndex.load(path)
+        with self.assertRaises(ValueError):
+            HashIndex(BUILDINGS.drop(columns="osmid"))
+
+    def test_lookup_in_merged_building_tiles(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            boundary = shapely.box(85.30, 27.70, 85.339, 27.719)
+            paths = fetch_building_tiles("Test", Path(tmp) / "tiles", boundary=boundary, fetch_tile=fetch_tile)
+            buildings = merge_building_tiles(paths)
+            self.assertEqual(len(paths), 2)
+            self.assertEqual(sorted(buildings["osmid"]), [500, 1000, 1001, 1002, 1010, 1011, 1012])
+
+            # Landmark assignment and hashing add columns and keep the building columns
+            buildings["route_hashes"] = [f"Hash of {osmid}" for osmid in buildings["osmid"]]
+            path = Path(tmp) / "hashes.parquet"
+            write_table(buildings, path)
+            index = HashIndex.load(path)
+
+        for osmid in (500, 1002, 1010):
+            record = index.record(index.position_of(str(osmid)))
+            self.assertEqual((record["id"], record["name"], record["hash"]),
+                             (osmid, f"Building {osmid}", f"Hash of {osmid}"))
+        self.assertIsNone(index.position_of("3"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import unittest
+from unittest import mock
+
+import networkx as nx
+
+from src.graph import prepare_graph
+from src.parallel import route_and_hash_pairs
+from src.route_optimizer import RouteOptimizer
+from src.routing_engine import CSRGraph
+from src.synthetic import HIGHWAY_SPEEDS, synthetic_graph
+
+
+class GenerateHashesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.G = prepare_graph(synthetic_graph(12, seed=1), hwy_speeds=HIGHWAY_SPEEDS)
+        cls.nodes = list(cls.G.nodes)
+
+    def routed_paths(self, optimizer, count):
+        """
+        Return count multi-node shortest paths between nodes spread over the grid.
+        """
+        paths = []
+        for orig in self.nodes:
+            for dest in reversed(self.nodes):
+                try:
+                    path = optimizer.get_shortest_path(orig, dest)
+                except nx.NetworkXNoPath:
+                    continue
+                if len(path) > 2:
+                    paths.append(path)
+                    break
+            if len(paths) == count:
+                return paths
+        self.fail("synthetic graph has too few routable pairs")
+
+    def test_batch_matches_single_with_single_node_paths(self):
+        for backend in ("networkx", "csr"):
+            optimizer = RouteOptimizer(self.G, backend=backend)
+            first, second, third = self.routed_paths(optimizer, 3)
+            single = [self.nodes[0]]
+            batches = [
+                [single, first, second],  # leading
+                [first, single, second],  # middle
+                [first, second, single],  # trailing
+                [single, first, single, single, second, third, single],
+                [single, single],
+            ]
+            for paths in batches:
+                names = [f"Landmark_{i}" for i in range(len(paths))]
+                with self.subTest(backend=backend, lengths=[len(path) for path in paths]):
+                    self.assertEqual(
+                        optimizer.generate_hashes(names, paths),
+                        [optimizer.generate_hash(name, path) for name, path in zip(names, paths)],
+                    )
+
+    def test_route_and_hash_pairs_with_origin_equal_to_destination(self):
+        optimizer = RouteOptimizer(self.G, backend="csr")
+        path = self.routed_paths(optimizer, 1)[0]
+        origin, destination = path[0], path[-1]
+        results = route_and_hash_pairs(optimizer, [(origin, origin), (origin, destination)], ["Same", "Far"])
+        self.assertEqual(results[0], ("Same|", None))
+        self.assertEqual(results[1], (optimizer.generate_hash("Far", path), None))
+
+
+class AltRoutingTest(unittest.TestCase):
+    def test_alt_is_used_only_when_asked_for(self):
+        G = prepare_graph(synthetic_graph(12, seed=1), hwy_speeds=HIGHWAY_SPEEDS)
+        engine = CSRGraph.from_networkx(G).build_alt(4)
+        orig, dest = engine.node_ids[0].item(), engine.node_ids[-1].item()
+
+        with mock.patch.object(engine, "alt_path", wraps=engine.alt_path) as alt_path:
+            default = RouteOptimizer(engine).get_shortest_path(orig, dest)
+            self.assertEqual(alt_path.call_count, 0)
+            exact = RouteOptimizer(engine, use_alt=True).get_shortest_path(orig, dest)
+            self.assertEqual(alt_path.call_count, 1)
+
+        self.assertEqual(default, engine.to_node_ids(engine.astar_path(engine.index_of(orig), engine.index_of(dest))))
+        distances, _ = engine.shortest_path_tree(engine.index_of(orig))
+        self.assertAlmostEqual(engine.path_travel_time(engine.indices_of(exact).tolist()),
+                               distances[engine.index_of(dest)])
+
+
+def uniform_grid(size: int) -> nx.MultiDiGraph:
+    """
+    Two-way street grid with equal edge lengths, so most pairs have many equally short paths.
+    """
+    G = nx.MultiDiGraph(crs="epsg:4326")
+    for i in range(size):
+        for j in range(size):
+            G.add_node(i * size + j, y=27.7 + i * 1e-3, x=85.3 + j * 1e-3)
+    for i in range(size):
+        for j in range(size):
+            for di, dj in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+                if 0 <= i + di < size and 0 <= j + dj < size:
+                    G.add_edge(i * size + j, (i + di) * size + j + dj, length=100.0, highway="residential")
+    return prepare_graph(G, hwy_speeds={"residential": 20})
+
+
+class ShortestPathsToTest(unittest.TestCase):
+    def path_cost(self, G, path):
+        for u, v in zip(path, path[1:]):
+            self.assertIn(v, G[u])
+        return sum(min(data["travel_time"] for data in G[u][v].values()) for u, v in zip(path, path[1:]))
+
+    def test_costs_match_point_to_point_paths(self):
+        # Paths may differ from nx.dijkstra_path on ties; their travel times may not
+        for G in (uniform_grid(6), prepare_graph(synthetic_graph(12, seed=1), hwy_speeds=HIGHWAY_SPEEDS)):
+            nodes = list(G.nodes)
+            for backend in ("networkx", "csr"):
+                optimizer = RouteOptimizer(G, backend=backend)
+                for target in nodes[::11]:
+                    paths = optimizer.get_shortest_paths_to(target, nodes)
+                    for source in nodes:
+                        with self.subTest(backend=backend, source=source, target=target):
+                            try:
+                                expected = nx.dijkstra_path_length(G, source, target, weight="travel_time")
+                            except nx.NetworkXNoPath:
+                                self.assertIsNone(paths[source])
+                                continue
+                            path = paths[source]
+                            self.assertEqual((path[0], path[-1]), (source, target))
+                            self.assertAlmostEqual(self.path_cost(G, path), expected, places=6)
+
+
+if __name__ == "__main__":
+    unittest.main()